@@ -1,13 +1,26 @@
 #ifndef UTOPIA_MODELS_OPDISC_HH
 #define UTOPIA_MODELS_OPDISC_HH
 
-#include <utopia/core/graph.hh>
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <limits>
+#include <thread>
+#include <type_traits>
+
+#include <boost/multi_array.hpp>
+#include <boost/range/irange.hpp>
+
 #include <utopia/core/model.hh>
-#include <utopia/data_io/graph_utils.hh>
 
 #include "aging.hh"
+#include "convergence.hh"
 #include "modes.hh"
+#include "parallel.hh"
+#include "population.hh"
 #include "revision.hh"
+#include "schedule.hh"
+#include "stats.hh"
 #include "utils.hh"
 
 namespace Utopia::Models::OpDisc {
@@ -21,25 +34,23 @@ using modes::Mode::isolated_2;
 using modes::Mode::reduced_int_prob;
 using modes::Mode::reduced_s;
 
-/*! Each user is a member of a group, may or may not discriminate in some wa
-against members of other groups, holds and opinion, has a certain tolerance, and
-is susceptible to other opinions. The discrimination may for some modes take the
-form of reduced susceptibility to opinions from other groups (susceptibility_2)*/
-struct User {
-    double group;
-    bool discriminates;
-    double opinion;
-    double tolerance;
-    double susceptibility_1;  //same group interactions
-    double susceptibility_2;  //inter-group interactions
+/// A change of a user's state, recorded in the 'events' write mode
+struct Event {
+    std::size_t step;
+    std::size_t vertex;
+    float opinion;
+    float group;
 };
 
-/// The directed network type for the OpDisc Model:
-using Network = boost::adjacency_list<
-                boost::setS,        // edges
-                boost::vecS,        // vertices
-                boost::bidirectionalS,
-                User>;               // vertex property
+/*! Each user is a member of a group, may or may not discriminate in some way
+against members of other groups, holds an opinion, has a certain tolerance, and
+is susceptible to other opinions. The discrimination may for some modes take the
+form of reduced susceptibility to opinions from other groups (susceptibility_2).
+The group labels are compact integers, except in the ageing mode, where the
+group of a user is its (continuous) age. */
+template<Mode model_mode>
+using Users = Population<std::conditional_t<model_mode==ageing,
+                                            double, std::uint16_t>>;
 
 using OpDiscTypes = ModelTypes<>;
 
@@ -65,13 +76,27 @@ public:
     using RNG = typename Base::RNG;
 
 private:
+    /// The state of one replica: its slice of the users, its random number
+    /// generator, and its indices and summary statistics
+    struct Replica {
+        PopulationView<Users<model_mode>> nw;
+        std::shared_ptr<RNG> rng;
+        GroupIndex group_index;
+        aging::ParentIndex parent_index;
+        stats::GroupStats stats;
+    };
+
     // Base members: _time, _name, _cfg, _hdfgrp, _rng, _monitor
 
     std::uniform_real_distribution<double> _uniform_distr_prob_val;
 
     // User properties
     const Config _cfg_nw;
-    Network _nw;
+    // the number of replicas run in lockstep, and the number of users of each
+    const std::size_t _num_replicas;
+    const std::size_t _num_users;
+    // the users of all replicas, stored one replica after another
+    Users<model_mode> _nw;
     const double _discriminators;
     const bool _extremism;
     const double _homophily_parameter;
@@ -82,12 +107,65 @@ private:
     const double _time_scale;
     const double _tolerance;
 
+    // update scheme: if true, all users are revised in disjoint random pairs
+    // in each step, distributed over several threads
+    const bool _parallel_matching;
+    parallel::RandomMatching<RNG> _matching;
+
+    // output mode: if true, only the users revised in each step are recorded,
+    // together with a snapshot of all users at every keyframe_every-th write
+    const bool _write_events;
+    const unsigned _keyframe_every;
+    std::size_t _num_writes;
+    std::vector<Event> _events;
+    // if false, neither snapshots nor events are written
+    const bool _write_raw;
+    // storage of the user datasets: the compression level, the chunk shape
+    // (time, vertex; chosen automatically if empty), and whether the opinions
+    // are stored as 16-bit fixed-point numbers
+    const std::size_t _compression;
+    const std::vector<hsize_t> _chunksize;
+    const bool _quantize_opinions;
+    // the schedule of the writes among the write times; unless it is fixed,
+    // the written times are recorded in the write_times dataset, to which the
+    // time coordinates of the time series are linked
+    schedule::WriteSchedule _schedule;
+    std::shared_ptr<DataSet> _dset_write_times;
+
+    // running summary statistics, written to the 'stats' group
+    const bool _write_stats;
+    std::shared_ptr<DataGroup> _grp_stats;
+    std::map<std::string, std::shared_ptr<DataSet>> _dsets_stats;
+
     // datasets and groups
     std::shared_ptr<DataGroup> _grp_nw;
     std::shared_ptr<DataSet> _dset_discriminators;
     std::shared_ptr<DataSet> _dset_group_label;
     std::shared_ptr<DataSet> _dset_opinion;
     std::shared_ptr<DataSet> _dset_users;
+    std::shared_ptr<DataGroup> _grp_events;
+    std::map<std::string, std::shared_ptr<DataSet>> _dsets_events;
+
+    // the replicas, the seeds of their generators (if there are several),
+    // and the number of steps by which the replicas lag behind the model time;
+    // the members of each group are indexed for sampling same-group partners,
+    // and the users in the parent age band for reinitialising users as children
+    std::vector<Replica> _replicas;
+    std::vector<typename RNG::result_type> _seeds;
+    std::size_t _pending_steps;
+
+    // the worker threads advancing the replicas, or revising the pairs of the
+    // parallel_matching scheme; created once and reused in every step
+    std::shared_ptr<parallel::ThreadPool> _pool;
+
+    // early termination: the remaining steps and writes are skipped once the
+    // opinions of all replicas are frozen up to the given precision; the time
+    // at which each replica converged is recorded (NaN if it did not)
+    bool _check_convergence;
+    const double _convergence_epsilon;
+    std::vector<double> _convergence_time;
+    std::shared_ptr<DataSet> _dset_convergence_time;
+    bool _converged;
 
 public:
     // Constructs the OpDisc model
@@ -100,7 +178,9 @@ public:
         Base(name, parent),
         _uniform_distr_prob_val(std::uniform_real_distribution<double>(0., 1.)),
         _cfg_nw(this->_cfg["nw"]),
-        // initialize network
+        _num_replicas(get_as<std::size_t>("num_replicas", this->_cfg)),
+        _num_users(get_as<std::size_t>("num_vertices", _cfg_nw)),
+        // initialize the users
         _nw(this->init_nw()),
         // model parameters
         _discriminators(get_as<double>("discriminators", this->_cfg)),
@@ -112,34 +192,90 @@ public:
         _susceptibility(get_as<double>("susceptibility", this->_cfg)),
         _time_scale(get_as<double>("time_scale", this->_cfg["ageing"])),
         _tolerance(get_as<double>("tolerance", this->_cfg)),
+        _parallel_matching(get_as<std::string>("update_scheme", this->_cfg)
+                           == "parallel_matching"),
+        _matching{},
+        _write_events(get_as<std::string>("write_mode", this->_cfg) == "events"),
+        _keyframe_every(get_as<unsigned>("keyframe_every", this->_cfg)),
+        _num_writes(0),
+        _events{},
+        _write_raw(get_as<std::string>("write_mode", this->_cfg) != "none"),
+        _compression(get_as<std::size_t>("compression", this->_cfg["storage"])),
+        _chunksize(get_as<std::vector<hsize_t>>("chunksize", this->_cfg["storage"])),
+        _quantize_opinions(get_as<std::string>("opinion_dtype", this->_cfg["storage"])
+                           == "uint16"),
+        _schedule(this->init_schedule()),
+        _dset_write_times(_schedule.fixed() ? nullptr
+                          : this->_hdfgrp->open_dataset("write_times",
+                                                        {H5S_UNLIMITED}, {1024})),
+        _write_stats(get_as<bool>("enabled", this->_cfg["stats"])),
         // create datagroups and datasets
-        _grp_nw(Utopia::DataIO::create_graph_group(_nw, this->_hdfgrp, "nw")),
+        _grp_nw(this->_hdfgrp->open_group("nw")),
         _dset_discriminators(this->create_dset("discriminators", _grp_nw,
-                                          {boost::num_vertices(_nw)}, 2)),
-        _dset_group_label(this->create_dset("group_label", _grp_nw,
-                                          {boost::num_vertices(_nw)}, 2)),
-        _dset_opinion(this->create_dset("opinion", _grp_nw,
-                                          {boost::num_vertices(_nw)}, 2)),
+                                          this->replica_shape({_num_users}),
+                                          _compression, this->user_chunks())),
+        _dset_group_label(model_mode==ageing
+                          ? this->create_time_series("group_label", _grp_nw,
+                                          this->replica_shape({_num_users}),
+                                          _compression, this->user_chunks())
+                          : this->create_dset("group_label", _grp_nw,
+                                          this->replica_shape({_num_users}),
+                                          _compression, this->user_chunks())),
+        _dset_opinion(this->create_time_series("opinion", _grp_nw,
+                                          this->replica_shape({_num_users}),
+                                          _compression, this->user_chunks())),
         _dset_users(this->create_dset("users", _grp_nw,
-                                          {boost::num_vertices(_nw)}, 2))
-
+                                          {_nw.size()}, _compression)),
+        _replicas{},
+        _seeds{},
+        _pending_steps(0),
+        _pool{},
+        _check_convergence(get_as<bool>("enabled", this->_cfg["convergence"])),
+        _convergence_epsilon(get_as<double>("epsilon", this->_cfg["convergence"])),
+        _convergence_time(_num_replicas, std::numeric_limits<double>::quiet_NaN()),
+        _dset_convergence_time{},
+        _converged(false)
     {
         this->_log->debug("Constructing the OpDisc Model ...");
 
+        this->setup_replicas();
         this->initialize_properties();
+        for (auto& rep : _replicas) {
+            if constexpr (model_mode==reduced_int_prob) {
+                rep.group_index = GroupIndex(rep.nw);
+            }
+            else if constexpr (model_mode==ageing) {
+                rep.parent_index = aging::ParentIndex(rep.nw);
+            }
+        }
 
-        this->_log->info("Initialized user network with {} vertices and {} edges",
-                         num_vertices(_nw), num_edges(_nw));
+        this->_log->info("Initialized {} users in each of {} replica(s).",
+                         _num_users, _num_replicas);
 
         // Write the vertex data once as it does not change
-        _dset_opinion->add_attribute("dim_name__1", "vertex");
-        _dset_opinion->add_attribute("coords_mode__vertex", "trivial");
-
-        _dset_discriminators->add_attribute("dim_name__1", "vertex");
-        _dset_discriminators->add_attribute("coords_mode__vertex", "trivial");
+        this->add_dims(_dset_opinion, {"vertex"});
+        this->add_dims(_dset_discriminators, {"vertex"});
+        this->add_dims(_dset_group_label, {"vertex"});
+        if (_quantize_opinions) {
+            _dset_opinion->add_attribute("scale_factor", utils::opinion_scale);
+        }
 
-        _dset_group_label->add_attribute("dim_name__1", "vertex");
-        _dset_group_label->add_attribute("coords_mode__vertex", "trivial");
+        if (_parallel_matching) {
+            this->setup_parallel_matching();
+        }
+        if (_write_events) {
+            this->setup_event_output();
+        }
+        if (_check_convergence) {
+            this->setup_convergence_check();
+        }
+        if (_write_stats) {
+            this->setup_stats_output();
+        }
+        else if (not _write_raw) {
+            this->_log->warn("Neither the opinions nor summary statistics are "
+                             "written!");
+        }
     }
 
 public:
@@ -148,67 +284,651 @@ public:
     void initialize_properties() {
         this->_log->info("time scale: {}", _time_scale);
         this->_log->debug("Initializing user properties ...");
-        utils::initialize<model_mode>(_nw,
-                                      _discriminators,
-                                      _extremism,
-                                      _homophily_parameter,
-                                      _life_expectancy,
-                                      _number_of_groups,
-                                      _susceptibility,
-                                      _tolerance,
-                                      _uniform_distr_prob_val,
-                                      *this->_rng);
+        for (auto& rep : _replicas) {
+            utils::initialize<model_mode>(rep.nw,
+                                          _discriminators,
+                                          _extremism,
+                                          _homophily_parameter,
+                                          _life_expectancy,
+                                          _number_of_groups,
+                                          _susceptibility,
+                                          _tolerance,
+                                          _uniform_distr_prob_val,
+                                          *rep.rng);
+        }
     } //initialize_properties
-    Network init_nw() {
-        this->_log->debug("Creating and initializing the user network ...");
-        Network nw = Graph::create_graph<Network>(_cfg_nw, *this->_rng);
-        return nw;
+    Users<model_mode> init_nw() {
+        this->_log->debug("Creating the users ...");
+        return Users<model_mode>(_num_users*_num_replicas);
+    }
+
+    void setup_replicas() {
+        /** Divides the users into the replicas and sets up their generators.
+          * A single replica uses the model's generator, so that its results
+          * are unaffected by the lockstep execution; with several replicas,
+          * each generator is seeded by the model's generator. The replicas
+          * are advanced concurrently on num_threads threads.
+          */
+        if (_num_replicas==0) {
+            throw std::invalid_argument("num_replicas must be positive!");
+        }
+        if (_num_replicas>1 and (_write_events or _parallel_matching)) {
+            throw std::invalid_argument("Several replicas are not supported by "
+                                        "the events write mode or the "
+                                        "parallel_matching update scheme!");
+        }
+        const auto cfg_stats = this->_cfg["stats"];
+        for (std::size_t r=0; r<_num_replicas; ++r) {
+            auto rng = this->_rng;
+            if (_num_replicas>1) {
+                _seeds.push_back((*this->_rng)());
+                rng = std::make_shared<RNG>(_seeds.back());
+            }
+            _replicas.push_back({
+                PopulationView<Users<model_mode>>(_nw, r*_num_users, _num_users),
+                rng,
+                GroupIndex{},
+                aging::ParentIndex{},
+                stats::GroupStats(_number_of_groups,
+                    get_as<unsigned>("num_bins", cfg_stats),
+                    model_mode==ageing
+                        ? get_as<std::vector<double>>("age_groups", cfg_stats)
+                        : std::vector<double>{})
+            });
+        }
+
+        if (_num_replicas>1) {
+            const auto num_threads = get_as<std::size_t>("num_threads",
+                                                         this->_cfg);
+            _pool = std::make_shared<parallel::ThreadPool>(
+                        std::min(_num_replicas,
+                                 num_threads ? num_threads
+                                 : std::max<std::size_t>(1,
+                                        std::thread::hardware_concurrency())));
+            this->_log->info("Running {} replicas in lockstep on {} threads.",
+                             _num_replicas, _pool->num_threads());
+        }
+    }
+
+    std::vector<hsize_t> replica_shape (std::vector<hsize_t> shape) const {
+        /** The shape of a dataset per write time, with a leading replica
+          * dimension if there are several replicas
+          */
+        if (_num_replicas>1) {
+            shape.insert(shape.begin(), _num_replicas);
+        }
+        return shape;
+    }
+
+    schedule::WriteSchedule init_schedule () const {
+        /** Sets up the schedule of the writes from the write_schedule
+          * configuration. The logarithmically spaced times range from the
+          * write start to the end of the run.
+          */
+        const auto cfg = this->_cfg["write_schedule"];
+        const auto mode = get_as<std::string>("mode", cfg);
+        std::vector<std::size_t> times;
+        if (mode=="log") {
+            times = schedule::WriteSchedule::log_times(this->get_write_start(),
+                        this->get_time_max(),
+                        get_as<std::size_t>("num_writes", cfg));
+        }
+        else if (mode=="list") {
+            times = get_as<std::vector<std::size_t>>("times", cfg);
+        }
+        return schedule::WriteSchedule(mode, times,
+                                       get_as<double>("threshold", cfg),
+                                       get_as<std::size_t>("num_bins", cfg));
+    }
+
+    std::shared_ptr<DataSet> create_time_series (
+        const std::string& name,
+        const std::shared_ptr<DataGroup>& grp,
+        const std::vector<hsize_t>& shape,
+        const std::size_t compression = 1,
+        const std::vector<hsize_t>& chunks = {})
+    {
+        /** Creates a dataset that is written at the scheduled write times.
+          * With a fixed schedule, this is a regular model dataset; otherwise,
+          * the dataset is extended at each write, and its time coordinates
+          * are linked to the write_times dataset. The group must be a
+          * subgroup of the model's group.
+          */
+        if (_schedule.fixed()) {
+            return this->create_dset(name, grp, shape, compression, chunks);
+        }
+        std::vector<hsize_t> capacity = {H5S_UNLIMITED};
+        capacity.insert(capacity.end(), shape.begin(), shape.end());
+        auto dset = grp->open_dataset(name, capacity, chunks, compression);
+        dset->add_attribute("dim_name__0", "time");
+        dset->add_attribute("coords_mode__time", "linked");
+        dset->add_attribute("coords__time", "../write_times");
+        return dset;
+    }
+
+    std::vector<hsize_t> user_chunks () const {
+        /** The chunk shape of the time series of the users, with a single
+          * replica per chunk, or an empty shape for automatic chunking. The
+          * time extent is limited to the number of write times.
+          */
+        if (_chunksize.empty()) {
+            return {};
+        }
+        if (_chunksize.size()!=2) {
+            throw std::invalid_argument("The chunksize must be of the form "
+                                        "[time, vertex]!");
+        }
+        const std::size_t write_start = this->get_write_start();
+        const hsize_t num_writes = write_start>this->get_time_max() ? 1
+            : (this->get_time_max()-write_start)/this->get_write_every()+1;
+        std::vector<hsize_t> chunks = {
+            std::clamp<hsize_t>(_chunksize[0], 1, num_writes),
+            std::clamp<hsize_t>(_chunksize[1], 1, _num_users)
+        };
+        if (_num_replicas>1) {
+            chunks.insert(chunks.begin()+1, 1);
+        }
+        return chunks;
+    }
+
+    template<typename WriteFunc>
+    void write_opinions (WriteFunc&& write) {
+        /** Calls write(encode) with the function that encodes an opinion for
+          * storage, either as a float or as a 16-bit fixed-point number
+          */
+        if (_quantize_opinions) {
+            write([](const double op) { return utils::quantize_opinion(op); });
+        }
+        else {
+            write([](const double op) { return (float)op; });
+        }
+    }
+
+    void add_dims (const std::shared_ptr<DataSet>& dset,
+                   const std::vector<std::string>& dims)
+    {
+        /** Names the dimensions of a dataset following the time dimension.
+          * With several replicas, the first of these is the 'seed' dimension,
+          * labelled by the seeds of the replicas.
+          */
+        std::size_t d = 1;
+        if (_num_replicas>1) {
+            dset->add_attribute("dim_name__1", "seed");
+            dset->add_attribute("coords_mode__seed", "values");
+            dset->add_attribute("coords__seed", _seeds);
+            ++d;
+        }
+        for (const auto& dim : dims) {
+            dset->add_attribute("dim_name__"+std::to_string(d++), dim);
+            dset->add_attribute("coords_mode__"+dim, "trivial");
+        }
+    }
+
+    void setup_parallel_matching() {
+        /** Sets up the random matchings of the parallel_matching scheme. In
+          * the reduced_int_prob mode, users are matched within their group
+          * with the homophily probability, so each group is a separate class.
+          */
+        if (_write_events) {
+            throw std::invalid_argument("The events write mode is not supported "
+                                        "by the parallel_matching update scheme!");
+        }
+        const std::size_t num_classes = (model_mode==reduced_int_prob)
+                                        ? _number_of_groups+1 : 1;
+        _pool = std::make_shared<parallel::ThreadPool>(
+                        get_as<std::size_t>("num_threads", this->_cfg));
+        _matching = parallel::RandomMatching<RNG>(_nw.size(), num_classes,
+                                                  _pool, *this->_rng);
+        this->_log->info("Revising all users in random pairs in each step, "
+                         "using {} threads.", _matching.num_threads());
+    }
+
+    void setup_stats_output() {
+        /** Initialises the running statistics and creates their datasets */
+        for (auto& rep : _replicas) {
+            rep.stats.reset(rep.nw);
+        }
+        _grp_stats = this->_hdfgrp->open_group("stats");
+
+        const auto& stats = _replicas.front().stats;
+        const hsize_t num_groups = stats.num_groups();
+        for (const auto& name : {"group_size", "group_mean", "group_std"}) {
+            auto dset = this->create_time_series(name, _grp_stats,
+                                          this->replica_shape({num_groups}));
+            this->add_dims(dset, {"group"});
+            _dsets_stats[name] = dset;
+        }
+        _dsets_stats["global_mean"] = this->create_time_series("global_mean",
+                                            _grp_stats, this->replica_shape({}));
+        this->add_dims(_dsets_stats["global_mean"], {});
+        _dsets_stats["hist"] = this->create_time_series("hist", _grp_stats,
+                    this->replica_shape({num_groups*stats.num_bins()}));
+        this->add_dims(_dsets_stats["hist"], {"group_bin"});
+        _dsets_stats["hist"]->add_attribute("num_bins", stats.num_bins());
+        if constexpr (model_mode==ageing) {
+            _dsets_stats["group_size"]->add_attribute("age_groups",
+                get_as<std::vector<double>>("age_groups", this->_cfg["stats"]));
+            _dsets_stats["max_group"] = this->create_time_series("max_group",
+                                            _grp_stats, this->replica_shape({}));
+            this->add_dims(_dsets_stats["max_group"], {});
+        }
+        this->_log->info("Recording summary statistics of {} groups.", num_groups);
+    }
+
+    void setup_convergence_check() {
+        /** Creates the dataset of the convergence times. Since the users are
+          * continually reinitialised in the ageing mode, the opinions never
+          * freeze, and the check is disabled.
+          */
+        if constexpr (model_mode==ageing) {
+            this->_log->warn("Convergence is not checked in the ageing mode.");
+            _check_convergence = false;
+            return;
+        }
+        this->_log->info("Stopping the run once the opinions are frozen up to "
+                         "{}.", _convergence_epsilon);
+        _dset_convergence_time = this->_hdfgrp->open_dataset("convergence_time",
+                                                             {_num_replicas});
+        if (_num_replicas>1) {
+            _dset_convergence_time->add_attribute("dim_name__0", "seed");
+            _dset_convergence_time->add_attribute("coords_mode__seed", "values");
+            _dset_convergence_time->add_attribute("coords__seed", _seeds);
+        }
+    }
+
+    void setup_event_output() {
+        /** Creates the extensible event datasets and the keyframe datasets.
+          * The keyframes replace the opinion (and, for ageing, group label)
+          * snapshots and are written at every keyframe_every-th write time.
+          */
+        if (_keyframe_every==0) {
+            throw std::invalid_argument("keyframe_every must be positive!");
+        }
+        if (not _schedule.fixed()) {
+            throw std::invalid_argument("The events write mode requires the "
+                                        "fixed write schedule!");
+        }
+        this->_log->info("Recording events, with keyframes at every {}. write "
+                         "time.", _keyframe_every);
+
+        const hsize_t num_vertices = _nw.size();
+        const auto chunks = this->user_chunks();
+        const hsize_t chunk_vertices = chunks.empty() ? num_vertices : chunks.back();
+        std::vector<std::string> keyframes = {"opinion_keyframes"};
+        if constexpr (model_mode==ageing) {
+            keyframes.push_back("group_label_keyframes");
+        }
+        for (const auto& name : keyframes) {
+            auto dset = _grp_nw->open_dataset(name, {H5S_UNLIMITED, num_vertices},
+                                              {1, chunk_vertices}, _compression);
+            dset->add_attribute("dim_name__0", "time");
+            dset->add_attribute("coords_mode__time", "start_and_step");
+            dset->add_attribute("coords__time", std::vector<std::size_t>
+                {this->get_write_start(), this->get_write_every()*_keyframe_every});
+            dset->add_attribute("dim_name__1", "vertex");
+            dset->add_attribute("coords_mode__vertex", "trivial");
+            _dsets_events[name] = dset;
+        }
+
+        _grp_events = _grp_nw->open_group("events");
+        std::vector<std::string> fields = {"step", "vertex", "opinion"};
+        if constexpr (model_mode==ageing) {
+            fields.push_back("group");
+        }
+        for (const auto& name : fields) {
+            _dsets_events[name] = _grp_events->open_dataset(name, {H5S_UNLIMITED},
+                                                            {1024}, _compression);
+        }
+        if (_quantize_opinions) {
+            _dsets_events["opinion_keyframes"]->add_attribute("scale_factor",
+                                                        utils::opinion_scale);
+            _dsets_events["opinion"]->add_attribute("scale_factor",
+                                                    utils::opinion_scale);
+        }
     }
 
 public:
     // Runtime functions ......................................................
     void perform_step () {
-        if constexpr (model_mode == ageing) {
-             aging::user_revision (_nw,
-                                  _extremism,
-                                  _life_expectancy,
-                                  _peer_radius,
-                                  _time_scale,
-                                  _tolerance,
-                                  *this->_rng);
+        // the opinions are frozen: the remaining steps would not change them
+        if (_converged) {
+            return;
+        }
+
+        if (_parallel_matching) {
+            this->perform_sweep();
+            return;
+        }
+
+        if (_num_replicas>1) {
+            // the replicas are advanced concurrently, up to the next write
+            // time or the end of the run
+            ++_pending_steps;
+            const std::size_t time = this->get_time()+1;
+            const std::size_t write_start = this->get_write_start();
+            if (time>=this->get_time_max()
+                or (time>=write_start
+                    and (time-write_start)%this->get_write_every()==0))
+            {
+                this->advance_replicas();
+            }
+            return;
+        }
+
+        auto revised = this->revise_users(_replicas.front());
+
+        if (_write_events) {
+            // the state after this step belongs to the next time step
+            const std::size_t step = this->get_time()+1;
+            for (auto v : {revised.first, revised.second}) {
+                _events.push_back({step, v, (float)_nw[v].opinion,
+                                   (float)_nw[v].group});
+            }
+            if (step >= this->get_time_max()) {
+                this->write_events();
+            }
+        }
+    }
+
+    auto revise_users (Replica& rep) {
+        /** Revises a pair of users of a replica and updates its statistics */
+        auto revised = [this, &rep](){
+            if constexpr (model_mode == ageing) {
+                return aging::user_revision (rep.nw,
+                                             _extremism,
+                                             _life_expectancy,
+                                             _peer_radius,
+                                             _time_scale,
+                                             _tolerance,
+                                             *rep.rng,
+                                             &rep.parent_index);
+            }
+            else {
+                return revision::user_revision<model_mode> (rep.nw,
+                                                            _extremism,
+                                                            _homophily_parameter,
+                                                            _tolerance,
+                                                            _uniform_distr_prob_val,
+                                                            *rep.rng,
+                                                            &rep.group_index);
+            }
+        }();
+
+        if (_write_stats) {
+            rep.stats.update(rep.nw, revised.first);
+            rep.stats.update(rep.nw, revised.second);
+        }
+        return revised;
+    }
+
+    void advance_replicas () {
+        /** Performs the pending steps in all replicas. The replicas share no
+          * state, so that they are distributed over the threads in blocks.
+          */
+        _pool->for_blocks(_num_replicas,
+            [this](const std::size_t, const std::size_t begin,
+                   const std::size_t end)
+            {
+                for (std::size_t r=begin; r<end; ++r) {
+                    // converged replicas are frozen
+                    if (not std::isnan(_convergence_time[r])) {
+                        continue;
+                    }
+                    for (std::size_t i=0; i<_pending_steps; ++i) {
+                        this->revise_users(_replicas[r]);
+                    }
+                }
+            });
+        _pending_steps = 0;
+    }
+
+    void perform_sweep () {
+        /** Revises all users once, in disjoint random pairs that interact
+          * concurrently. The ageing of the users modifies the shared parent
+          * index and is applied sequentially afterwards.
+          */
+        if constexpr (model_mode==reduced_int_prob) {
+            _matching.draw([this](const std::size_t v, auto& rng) {
+                std::uniform_real_distribution<double> prob_distr(0., 1.);
+                if (prob_distr(rng)<=_homophily_parameter) {
+                    return (std::size_t)_nw[v].group+1;
+                }
+                return std::size_t{0};
+            });
         }
         else {
-            revision::user_revision<model_mode> (_nw,
-                                                 _extremism,
-                                                 _homophily_parameter,
-                                                 _tolerance,
-                                                 _uniform_distr_prob_val,
-                                                 *this->_rng);
+            _matching.draw();
+        }
+
+        if constexpr (model_mode==ageing) {
+            _matching.for_each_pair([this](const auto v, const auto nb) {
+                aging::revise_pair(_nw, v, nb, _extremism, _peer_radius,
+                                   _tolerance);
+            });
+            for (std::size_t p=0; p<_matching.num_pairs(); ++p) {
+                const auto [v, nb] = _matching.pair(p);
+                for (auto w : {v, nb}) {
+                    aging::age_user(_nw, w, _extremism, _life_expectancy,
+                                    _time_scale, _tolerance, *this->_rng,
+                                    &_replicas.front().parent_index);
+                }
+            }
+        }
+        else {
+            _matching.for_each_pair([this](const auto v, const auto nb) {
+                revision::revise_pair<model_mode>(_nw, v, nb, _extremism,
+                                                  _tolerance);
+            });
         }
     }
 
     void monitor () {}
 
-    void write_data () {
-        //Iterators
-        auto [v, v_end] = boost::vertices(_nw);
+    void write_events () {
+        /** Appends the buffered events to the event datasets */
+        if (_events.empty()) {
+            return;
+        }
+        _dsets_events["step"]->write(_events.begin(), _events.end(),
+                                     [](const auto& e) { return e.step; });
+        _dsets_events["vertex"]->write(_events.begin(), _events.end(),
+                                       [](const auto& e) { return e.vertex; });
+        this->write_opinions([&](const auto encode) {
+            _dsets_events["opinion"]->write(_events.begin(), _events.end(),
+                [&](const auto& e) { return encode(e.opinion); });
+        });
+        if constexpr (model_mode==ageing) {
+            _dsets_events["group"]->write(_events.begin(), _events.end(),
+                                          [](const auto& e) { return e.group; });
+        }
+        _events.clear();
+    }
 
-        _dset_opinion->write(v, v_end,[this](auto vd) {
-                                 return (float)_nw[vd].opinion;
-                             });
+    void write_stats () {
+        /** Writes the current summary statistics. With parallel updates, the
+          * statistics are recomputed at the write times instead of being
+          * updated after each revision.
+          */
+        if (_parallel_matching) {
+            for (auto& rep : _replicas) {
+                rep.stats.reset(rep.nw);
+            }
+        }
+        const auto& stats = _replicas.front().stats;
+        const std::size_t num_groups = stats.num_groups();
+        this->write_replicas(_dsets_stats["group_size"], num_groups,
+            [](const auto& rep, auto g) { return rep.stats.counts()[g]; });
+        this->write_replicas(_dsets_stats["group_mean"], num_groups,
+            [](const auto& rep, auto g) { return rep.stats.means()[g]; });
+        this->write_replicas(_dsets_stats["group_std"], num_groups,
+            [](const auto& rep, auto g) { return rep.stats.stddevs()[g]; });
+        this->write_replicas(_dsets_stats["global_mean"],
+            [](const auto& rep) { return rep.stats.global_mean(); });
+        this->write_replicas(_dsets_stats["hist"],
+                             num_groups*stats.num_bins(),
+            [](const auto& rep, auto i) { return rep.stats.hist()[i]; });
         if constexpr (model_mode==ageing) {
-          _dset_group_label->write(v, v_end, [this](auto vd) {
-                                       return (float)_nw[vd].group;
-                                   });
-        }
-        else if (this->get_time() + this->get_write_every() > this->get_time_max()) {
-              _dset_discriminators->write(v, v_end, [this](auto vd) {
-                                              return (unsigned) _nw[vd].discriminates;
-                                          });
-              _dset_group_label->write(v, v_end, [this](auto vd) {
-                                           return (int) _nw[vd].group;
-                                       });
-              this->_log->debug("All datasets have been written!");
+            this->write_replicas(_dsets_stats["max_group"],
+                [](const auto& rep) {
+                    double max_age = 0.;
+                    for (auto v : rep.nw.vertices()) {
+                        max_age = std::max(max_age, rep.nw[v].group);
+                    }
+                    return max_age;
+                });
+        }
+    }
+
+    template<typename Func>
+    void write_replicas (const std::shared_ptr<DataSet>& dset,
+                         const std::size_t size,
+                         Func&& value)
+    {
+        /** Writes value(replica, i) for i in [0, size) to a dataset. With
+          * several replicas, the values of all replicas are written at once,
+          * along the seed dimension.
+          */
+        if (_num_replicas==1) {
+            const auto idx = boost::irange<std::size_t>(0, size);
+            dset->write(idx.begin(), idx.end(), [&](const auto i) {
+                            return value(_replicas.front(), i);
+                        });
+            return;
+        }
+        using T = std::decay_t<decltype(value(_replicas.front(), size))>;
+        boost::multi_array<T, 3> data(boost::extents[1][_num_replicas][size]);
+        for (std::size_t r=0; r<_num_replicas; ++r) {
+            for (std::size_t i=0; i<size; ++i) {
+                data[0][r][i] = value(_replicas[r], i);
+            }
+        }
+        dset->write_nd(data);
+    }
+
+    template<typename Func>
+    void write_replicas (const std::shared_ptr<DataSet>& dset, Func&& value) {
+        /** Writes the scalar value(replica) of each replica to a dataset */
+        if (_num_replicas==1) {
+            dset->write(value(_replicas.front()));
+            return;
+        }
+        using T = std::decay_t<decltype(value(_replicas.front()))>;
+        boost::multi_array<T, 2> data(boost::extents[1][_num_replicas]);
+        for (std::size_t r=0; r<_num_replicas; ++r) {
+            data[0][r] = value(_replicas[r]);
+        }
+        dset->write_nd(data);
+    }
+
+    void check_convergence () {
+        /** Records the replicas whose opinions have frozen since the last
+          * write time. Once all replicas have converged, the remaining steps
+          * and writes of the run are skipped, so that the written data ends at
+          * the time of convergence.
+          */
+        const double time = this->get_time();
+        bool converged = true;
+        for (std::size_t r=0; r<_num_replicas; ++r) {
+            if (std::isnan(_convergence_time[r])) {
+                if (convergence::is_frozen<model_mode>(_replicas[r].nw,
+                                                       _convergence_epsilon)) {
+                    _convergence_time[r] = time;
+                }
+                else {
+                    converged = false;
+                }
+            }
+        }
+
+        const auto identity = [](const auto x) { return x; };
+        if (converged) {
+            this->_log->info("The opinions have converged at time {}; skipping "
+                             "the remaining steps.", time);
+            _converged = true;
+        }
+        if (converged or time+this->get_write_every()>this->get_time_max()) {
+            _dset_convergence_time->write(_convergence_time.begin(),
+                                          _convergence_time.end(), identity);
+        }
+    }
+
+    void write_scheduled () {
+        /** Writes the time series at a write time selected by the schedule */
+        if (_write_stats) {
+            this->write_stats();
+        }
+
+        if (_write_events) {
+            //Iterators
+            const auto users = _nw.vertices();
+            const auto v = users.begin();
+            const auto v_end = users.end();
+
+            this->write_events();
+            if (_num_writes % _keyframe_every == 0) {
+                this->write_opinions([&](const auto encode) {
+                    _dsets_events["opinion_keyframes"]->write(v, v_end,
+                        [&](auto vd) { return encode(_nw[vd].opinion); });
+                });
+                if constexpr (model_mode==ageing) {
+                    _dsets_events["group_label_keyframes"]->write(v, v_end,
+                        [this](auto vd) { return (float)_nw[vd].group; });
+                }
+            }
+        }
+        else if (_write_raw) {
+            this->write_opinions([&](const auto encode) {
+                this->write_replicas(_dset_opinion, _num_users,
+                    [&](const auto& rep, auto vd) {
+                        return encode(rep.nw[vd].opinion);
+                    });
+            });
+            if constexpr (model_mode==ageing) {
+                this->write_replicas(_dset_group_label, _num_users,
+                    [](const auto& rep, auto vd) { return (float)rep.nw[vd].group; });
+            }
+        }
+        ++_num_writes;
+
+        if (_dset_write_times) {
+            _dset_write_times->write(this->get_time());
+        }
+    }
+
+    void write_data () {
+        // the state at the time of convergence is the last one written
+        const bool frozen = _converged;
+        if (_check_convergence and not frozen) {
+            this->check_convergence();
+        }
+
+        const bool last = (this->get_time() + this->get_write_every()
+                           > this->get_time_max());
+        std::vector<PopulationView<Users<model_mode>>> nws;
+        if (not _schedule.fixed()) {
+            for (const auto& rep : _replicas) {
+                nws.push_back(rep.nw);
+            }
+        }
+        if (not frozen and _schedule.decide(this->get_time(), nws,
+                                            last or _converged)) {
+            this->write_scheduled();
+        }
+
+        if constexpr (model_mode!=ageing) {
+            if (last) {
+                this->write_replicas(_dset_discriminators, _num_users,
+                    [](const auto& rep, auto vd) {
+                        return (unsigned) rep.nw[vd].discriminates;
+                    });
+                this->write_replicas(_dset_group_label, _num_users,
+                    [](const auto& rep, auto vd) { return (int) rep.nw[vd].group; });
+            }
+        }
+        if (last) {
+            // marks the data as complete, for evaluations during the run
+            this->_hdfgrp->add_attribute("end_time", this->get_time());
+            this->_log->debug("All datasets have been written!");
         }
     }
 };
@@ -0,0 +1,122 @@
+"""Runs an adaptive sweep of the model over two parameters.
+
+A coarse grid of parameter points is run first. In each round, the cells of
+the parameter plane across which the chosen observable changes most are
+refined, and the new points are run as a single multiverse, until the budget
+of points is spent (see ``plot_functions/refinement.py``). The results are
+saved after each round and can be plotted with ``sweep2d`` by passing the
+results file as ``points``.
+
+Usage:
+    python adaptive_sweep.py RUN_CFG --x homophily_parameter --x_range 0 1
+        --y tolerance --y_range 0.1 0.5 [--observable extreme_means_diff]
+        [--num_coarse 5] [--budget 200] [--max_depth 4] [--tolerance 0.1]
+        [--num_seeds 1] [--output adaptive_sweep.npz]
+"""
+import argparse
+import logging
+import numpy as np
+
+from paramspace import CoupledParamDim, ParamDim
+from utopya import Multiverse
+
+from plot_functions.metrics_store import index_run
+from plot_functions.refinement import CLASSIFIERS, OBSERVABLES, adaptive_sweep
+
+log = logging.getLogger(__name__)
+
+#the parameters set in the 'ageing' entry of the model configuration
+AGEING_PARAMS = ['life_expectancy', 'peer_radius', 'time_scale']
+
+#the name of the sweep dimension enumerating the points of a round
+POINT_DIM = 'adaptive_point'
+
+## -----------------------------------------------------------------------------
+def parameter_space(points, *, x: str, y: str, num_seeds: int=1) -> dict:
+    """Returns the parameter space running the given points as a single sweep.
+    The points are enumerated by a sweep dimension, to which the x and y
+    parameters are coupled.
+
+    Arguments:
+        points (array): the (point, (x, y)) parameter values
+        x (str): the first parameter
+        y (str): the second parameter
+        num_seeds (int, optional): the number of seeds run at each point
+
+    Returns:
+        pspace (dict): the parameter space update
+    """
+    pspace = {POINT_DIM: ParamDim(default=0, range=[len(points)]), 'OpDisc': {}}
+    for i, key in enumerate([x, y]):
+        entry = (pspace['OpDisc'].setdefault('ageing', {})
+                 if key in AGEING_PARAMS else pspace['OpDisc'])
+        entry[key] = CoupledParamDim(target_name=POINT_DIM,
+                                     values=[float(p) for p in points[:, i]])
+    if num_seeds>1:
+        pspace['seed'] = ParamDim(default=42, range=[num_seeds])
+
+    return pspace
+
+## -----------------------------------------------------------------------------
+def run_points(run_cfg: str, points, *, x: str, y: str, observable: str,
+               num_seeds: int=1) -> np.ndarray:
+    """Runs the model at the given points and returns the observable at each
+    point, averaged over the seeds.
+
+    Arguments:
+        run_cfg (str): the run configuration
+        points (array): the (point, (x, y)) parameter values
+        x (str): the first parameter
+        y (str): the second parameter
+        observable (str): the observable (see ``metrics_store.universe_metrics``)
+        num_seeds (int, optional): the number of seeds run at each point
+
+    Returns:
+        values (ndarray): the value of the observable at each point
+    """
+    mv = Multiverse(model_name='OpDisc', run_cfg_path=run_cfg,
+                    update_meta_cfg={'parameter_space': parameter_space(
+                        points, x=x, y=y, num_seeds=num_seeds)})
+    mv.run(sweep=True)
+    mv.dm.load_from_cfg(print_tree=False)
+
+    #the metrics of the universes are added to the metrics store of the runs
+    df = index_run(mv.dm)
+
+    return (df.groupby(POINT_DIM)[observable].mean()
+            .reindex(range(len(points))).to_numpy(dtype=float))
+
+## -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('run_cfg', help="the run configuration of the model")
+    parser.add_argument('--x', required=True, help="the first parameter")
+    parser.add_argument('--x_range', type=float, nargs=2, required=True,
+                        help="the range of the first parameter")
+    parser.add_argument('--y', required=True, help="the second parameter")
+    parser.add_argument('--y_range', type=float, nargs=2, required=True,
+                        help="the range of the second parameter")
+    parser.add_argument('--observable', default='extreme_means_diff',
+                        choices=OBSERVABLES, help="the observable to refine")
+    parser.add_argument('--num_coarse', type=int, default=5,
+                        help="the number of coarse points along each dimension")
+    parser.add_argument('--budget', type=int, default=200,
+                        help="the maximum number of points run")
+    parser.add_argument('--max_depth', type=int, default=4,
+                        help="the maximum number of refinements of a cell")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="the relative change across a cell to refine it")
+    parser.add_argument('--num_seeds', type=int, default=1,
+                        help="the number of seeds run at each point")
+    parser.add_argument('--output', default='adaptive_sweep.npz',
+                        help="the results file")
+    args = parser.parse_args()
+
+    adaptive_sweep(lambda points: run_points(args.run_cfg, points, x=args.x,
+                                             y=args.y, observable=args.observable,
+                                             num_seeds=args.num_seeds),
+                   x_range=args.x_range, y_range=args.y_range,
+                   num_coarse=args.num_coarse, budget=args.budget,
+                   max_depth=args.max_depth, tolerance=args.tolerance,
+                   classify=args.observable in CLASSIFIERS, output=args.output,
+                   x=args.x, y=args.y, observable=args.observable)
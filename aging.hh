@@ -1,43 +1,129 @@
 #ifndef UTOPIA_MODELS_OPDISC_AGING
 #define UTOPIA_MODELS_OPDISC_AGING
 
+#include <limits>
+#include <optional>
+
 #include "utils.hh"
 
 namespace Utopia::Models::OpDisc::aging {
 
+/** The set of users in the parent age band [20, 40], updated in O(1) whenever
+  * the age of a user changes, so that parents are drawn in constant time.
+  */
+class ParentIndex {
+    static constexpr std::size_t npos = std::numeric_limits<std::size_t>::max();
+
+    double _min_age;
+    double _max_age;
+    // the eligible users, and the position of each user in that list (or npos)
+    std::vector<std::size_t> _members;
+    std::vector<std::size_t> _pos;
+
+public:
+    ParentIndex (const double min_age = 20, const double max_age = 40)
+    :
+        _min_age(min_age),
+        _max_age(max_age),
+        _members{},
+        _pos{}
+    { }
+
+    /// Builds the index from the current ages of the users
+    template<typename NWType>
+    explicit ParentIndex (const NWType& nw,
+                          const double min_age = 20,
+                          const double max_age = 40)
+    :
+        ParentIndex(min_age, max_age)
+    {
+        _pos.assign(nw.size(), npos);
+        for (auto v : nw.vertices()) {
+            this->update(nw, v);
+        }
+    }
+
+    /// The number of eligible parents
+    std::size_t size () const { return _members.size(); }
+
+    /// Whether a user is an eligible parent
+    bool contains (const std::size_t v) const { return _pos[v]!=npos; }
+
+    /// Adds or removes a user whose age may have changed
+    template<typename NWType>
+    void update (const NWType& nw, const std::size_t v) {
+        const bool eligible = (nw[v].group>=_min_age and nw[v].group<=_max_age);
+        if (eligible and not this->contains(v)) {
+            _pos[v] = _members.size();
+            _members.push_back(v);
+        }
+        else if (not eligible and this->contains(v)) {
+            // move the last member into the freed position
+            const std::size_t last = _members.back();
+            _members[_pos[v]] = last;
+            _pos[last] = _pos[v];
+            _members.pop_back();
+            _pos[v] = npos;
+        }
+    }
+
+    /// Returns a random eligible parent other than v, if there is any
+    template<typename RNGType>
+    std::optional<std::size_t> random_parent (const std::size_t v,
+                                              RNGType& rng) const
+    {
+        const std::size_t num_parents = _members.size()-(this->contains(v) ? 1 : 0);
+        if (num_parents==0) {
+            return std::nullopt;
+        }
+        // if v is eligible, draw from all members but the last; if v is drawn,
+        // the last member takes its place
+        std::uniform_int_distribution<std::size_t> distr(0, num_parents-1);
+        const std::size_t parent = _members[distr(rng)];
+        return parent==v ? _members.back() : parent;
+    }
+};
+
 template<typename NWType, typename VertexDescType, typename RNGType>
 void reinitialise_as_child( NWType& nw,
                             VertexDescType v,
                             bool extremism,
                             const double t,
-                            RNGType& rng ){
-    /** Reinitialises users as child vertices */
-    auto parent = random_vertex(nw, rng);
-    while (nw[parent].group<20 or nw[parent].group>40 or parent==v){
-        parent = random_vertex(nw, rng);
-    }
+                            RNGType& rng,
+                            const ParentIndex* parent_index = nullptr ){
+    /** Reinitialises users as child vertices, with the opinion of a random
+      * parent (ages 20-40). If a parent index is given, the parent is drawn
+      * from it; if there is no eligible parent, the child is given a random
+      * opinion.
+      */
     nw[v].group = 10;
-    nw[v].opinion = nw[parent].opinion;
+    if (parent_index) {
+        const auto parent = parent_index->random_parent(v, rng);
+        nw[v].opinion = parent ? nw[*parent].opinion : utils::rand_double(0, 1, rng);
+    }
+    else {
+        auto parent = random_vertex(nw, rng);
+        while (nw[parent].group<20 or nw[parent].group>40 or parent==v){
+            parent = random_vertex(nw, rng);
+        }
+        nw[v].opinion = nw[parent].opinion;
+    }
     if (extremism) {
         nw[v].tolerance = utils::tolerance_func(nw[v].opinion, t);
     }
 }
 
-template<typename NWType, typename RNGType>
-void user_revision( NWType& nw,
-                    bool extremism,
-                    const double life_expectancy,
-                    const double peer_radius,
-                    const double time_scale,
-                    const double t,
-                    RNGType& rng ){
-    /** Chooses interaction partners, checks their groups and selects
-      * the opinion update function */
-
-    // choose random vertex pair that gets a revision opportunity
-    auto v = random_vertex(nw, rng);
-    auto nb = random_vertex(nw, rng);
-    while (nb==v){ nb = random_vertex(nw, rng); }
+template<typename NWType, typename VertexDescType>
+void revise_pair( NWType& nw,
+                  const VertexDescType v,
+                  const VertexDescType nb,
+                  const bool extremism,
+                  const double peer_radius,
+                  const double t ){
+    /** Applies the opinion interaction rules of the ageing mode to a pair of
+      * users, without changing their ages. Only the two users are read and
+      * modified, so that disjoint pairs can be revised concurrently.
+      */
     const double op_v = nw[v].opinion;
     const double age_difference = fabs(nw[v].group-nw[nb].group);
 
@@ -66,19 +152,56 @@ void user_revision( NWType& nw,
         nw[v].tolerance = utils::tolerance_func(nw[v].opinion, t);
         nw[nb].tolerance = utils::tolerance_func(nw[nb].opinion, t);
     }
+}
 
-    // reinitialise users older than the life expectancy as children with
-    // the opinion of a random parent (ages 20-40)
+template<typename NWType, typename VertexDescType, typename RNGType>
+void age_user( NWType& nw,
+               const VertexDescType v,
+               const bool extremism,
+               const double life_expectancy,
+               const double time_scale,
+               const double t,
+               RNGType& rng,
+               ParentIndex* parent_index = nullptr ){
+    /** Ages a user that had a revision opportunity. Users older than the life
+      * expectancy are reinitialised as children with the opinion of a random
+      * parent (ages 20-40).
+      */
     if (nw[v].group>life_expectancy) {
-        reinitialise_as_child(nw, v, extremism, t, rng);
+        reinitialise_as_child(nw, v, extremism, t, rng, parent_index);
     }
     else { nw[v].group+=time_scale; }
+    if (parent_index) { parent_index->update(nw, v); }
+}
 
-    if (nw[nb].group>life_expectancy) {
-        reinitialise_as_child(nw, nb, extremism, t, rng);
-    }
-    else { nw[nb].group+=time_scale; }
+template<typename NWType, typename RNGType>
+auto user_revision( NWType& nw,
+                    bool extremism,
+                    const double life_expectancy,
+                    const double peer_radius,
+                    const double time_scale,
+                    const double t,
+                    RNGType& rng,
+                    ParentIndex* parent_index = nullptr ){
+    /** Chooses interaction partners, checks their groups and selects
+      * the opinion update function
+      * \param parent_index Optional index of the eligible parents, which is
+      *        kept up to date as the ages change. Without it, parents are drawn
+      *        by rejection sampling.
+      * \return The pair of users that had a revision opportunity; no other
+      *         user's opinion or age is changed
+      */
+
+    // choose random vertex pair that gets a revision opportunity
+    auto v = random_vertex(nw, rng);
+    auto nb = random_vertex(nw, rng);
+    while (nb==v){ nb = random_vertex(nw, rng); }
+
+    revise_pair(nw, v, nb, extremism, peer_radius, t);
+    age_user(nw, v, extremism, life_expectancy, time_scale, t, rng, parent_index);
+    age_user(nw, nb, extremism, life_expectancy, time_scale, t, rng, parent_index);
 
+    return std::make_pair(v, nb);
 } //user_revision
 
 } // namespace
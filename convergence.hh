@@ -0,0 +1,76 @@
+#ifndef UTOPIA_MODELS_OPDISC_CONVERGENCE
+#define UTOPIA_MODELS_OPDISC_CONVERGENCE
+
+#include <algorithm>
+#include <numeric>
+#include <vector>
+
+#include "modes.hh"
+
+namespace Utopia::Models::OpDisc::convergence {
+
+using modes::Mode;
+
+/** Whether the opinions are frozen up to epsilon, i.e. whether no revision can
+  * change an opinion by more than a fraction of epsilon.
+  *
+  * The sorted opinions are divided into clusters at gaps larger than epsilon.
+  * The opinions are frozen if every cluster spans at most epsilon, and the
+  * gap between neighbouring clusters exceeds the tolerance of all members of
+  * both clusters, so that users only interact within their cluster. In the
+  * conflict modes, a cluster must moreover not contain users that reject each
+  * other's opinions: in the conflict_dir mode, a cluster must consist of a
+  * single group, and in the conflict_undir mode, a cluster of several groups
+  * must not contain discriminators.
+  */
+template<Mode model_mode, typename NWType>
+bool is_frozen (const NWType& nw, const double epsilon) {
+    std::vector<std::size_t> order(nw.size());
+    std::iota(order.begin(), order.end(), 0);
+    std::sort(order.begin(), order.end(), [&nw](const auto v, const auto w) {
+        return nw[v].opinion<nw[w].opinion;
+    });
+    const auto opinion = [&](const std::size_t i) {
+        return (double)nw[order[i]].opinion;
+    };
+
+    double prev_tolerance = 0.;
+    for (std::size_t begin=0, end=0; begin<order.size(); begin=end) {
+        // the extent of the cluster starting at begin
+        double tolerance = nw[order[begin]].tolerance;
+        bool mixed = false;
+        bool discriminates = nw[order[begin]].discriminates;
+        for (end=begin+1; end<order.size()
+                          and opinion(end)-opinion(end-1)<=epsilon; ++end)
+        {
+            const auto user = nw[order[end]];
+            tolerance = std::max(tolerance, (double)user.tolerance);
+            mixed = mixed or user.group!=nw[order[begin]].group;
+            discriminates = discriminates or user.discriminates;
+        }
+
+        if (opinion(end-1)-opinion(begin)>epsilon) {
+            return false;
+        }
+        if (begin>0 and opinion(begin)-opinion(begin-1)
+                        <=std::max(tolerance, prev_tolerance)) {
+            return false;
+        }
+        if constexpr (model_mode==Mode::conflict_dir) {
+            if (mixed) {
+                return false;
+            }
+        }
+        else if constexpr (model_mode==Mode::conflict_undir) {
+            if (mixed and discriminates) {
+                return false;
+            }
+        }
+        prev_tolerance = tolerance;
+    }
+    return true;
+}
+
+} // namespace
+
+#endif // UTOPIA_MODELS_OPDISC_CONVERGENCE
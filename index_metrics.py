@@ -0,0 +1,44 @@
+"""Extracts the metrics of multiverse runs into the metrics store.
+
+The metrics of all universes of each run are written to the ``sweep_metrics``
+directory next to the run directory (see ``plot_functions/metrics_store.py``),
+from which the sweep plots and cross-run comparisons read them. Runs whose
+metrics are stored already are skipped.
+
+Usage:
+    python index_metrics.py RUN_DIR [RUN_DIR ...]
+        [--age_groups 10 20 40 60 80]
+"""
+import argparse
+import logging
+
+from utopya import FrozenMultiverse
+
+from plot_functions.metrics_store import AGE_GROUPS, index_run
+
+log = logging.getLogger(__name__)
+
+## -----------------------------------------------------------------------------
+def index_runs(run_dirs: list, *, age_groups: list=AGE_GROUPS):
+    """Extracts the metrics of the given runs into the metrics store.
+
+    Arguments:
+        run_dirs (list): the run directories
+        age_groups (list, optional): the age intervals of the ageing mode
+    """
+    for run_dir in run_dirs:
+        mv = FrozenMultiverse(model_name='OpDisc', run_dir=run_dir)
+        mv.dm.load_from_cfg(print_tree=False)
+        df = index_run(mv.dm, age_groups=age_groups)
+        log.info(f"Stored the metrics of {df['uni'].nunique()} universes of "
+                 f"{run_dir}.")
+
+## -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('run_dirs', nargs='+', help="the run directories")
+    parser.add_argument('--age_groups', type=int, nargs='+', default=AGE_GROUPS,
+                        help="the age intervals of the ageing mode")
+    args = parser.parse_args()
+
+    index_runs(args.run_dirs, age_groups=args.age_groups)
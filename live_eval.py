@@ -0,0 +1,61 @@
+"""Evaluates a multiverse run incrementally while it is running.
+
+The metrics of each universe are extracted into the metrics store as soon as
+the universe has finished, and previews of the sweep plots (``sweep1d``,
+``sweep2d`` and ``bifurcation``) of the plots configuration are rendered into
+``<run_dir>/eval/live`` after each round with new universes, marking the
+points of the parameter grid that are still pending (see
+``plot_functions/live.py``). The evaluation stops once all universes of the
+run have finished (or failed), or once the output of the run has not been
+modified for some time; the universes that remain pending are logged.
+
+Usage:
+    python live_eval.py RUN_DIR [--plots_cfg OpDisc_plots.yml]
+        [--base_cfg OpDisc_base_plots.yml] [--plots area bifurcation]
+        [--interval 60] [--settle 10] [--stale 600] [--once]
+        [--age_groups 10 20 40 60 80]
+"""
+import argparse
+import logging
+
+from ruamel.yaml import YAML
+
+from plot_functions.live import live_plots, watch
+from plot_functions.metrics_store import AGE_GROUPS
+
+log = logging.getLogger(__name__)
+
+## -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('run_dir', help="the run directory to be evaluated")
+    parser.add_argument('--plots_cfg', default='OpDisc_plots.yml',
+                        help="the plots configuration")
+    parser.add_argument('--base_cfg', default='OpDisc_base_plots.yml',
+                        help="the base plots configuration")
+    parser.add_argument('--plots', nargs='+', default=None,
+                        help="the plots to preview; by default, all sweep plots")
+    parser.add_argument('--interval', type=float, default=60.,
+                        help="the time in seconds between two rounds")
+    parser.add_argument('--settle', type=float, default=10.,
+                        help="the time in seconds for which the data of a "
+                             "universe must be unmodified to be evaluated")
+    parser.add_argument('--stale', type=float, default=600.,
+                        help="the time in seconds without modification of the "
+                             "output of the run after which it is considered "
+                             "to have stopped")
+    parser.add_argument('--once', action='store_true',
+                        help="whether to stop after a single round")
+    parser.add_argument('--age_groups', type=int, nargs='+', default=AGE_GROUPS,
+                        help="the age intervals of the ageing mode")
+    args = parser.parse_args()
+
+    yaml = YAML(typ='safe')
+    with open(args.plots_cfg) as file:
+        plots_cfg = yaml.load(file)
+    with open(args.base_cfg) as file:
+        base_cfg = yaml.load(file)
+
+    plots = live_plots(plots_cfg, base_cfg, names=args.plots)
+    watch(args.run_dir, plots, interval=args.interval, settle=args.settle,
+          stale=args.stale, once=args.once, age_groups=args.age_groups)
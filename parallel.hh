@@ -0,0 +1,319 @@
+#ifndef UTOPIA_MODELS_OPDISC_PARALLEL
+#define UTOPIA_MODELS_OPDISC_PARALLEL
+
+#include <algorithm>
+#include <condition_variable>
+#include <cstdint>
+#include <exception>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <random>
+#include <thread>
+#include <utility>
+#include <vector>
+
+namespace Utopia::Models::OpDisc::parallel {
+
+/** A pool of persistent worker threads, on which ranges are processed in
+  * contiguous blocks.
+  *
+  * The threads are created once and wait for work between the calls of
+  * for_blocks, so that the pool can be reused for every phase of every step
+  * without the cost of starting and joining threads. The calling thread
+  * processes the first block itself.
+  */
+class ThreadPool {
+    std::size_t _num_threads;
+    std::vector<std::thread> _workers;
+
+    // the current task, called with the thread index, and the state of the
+    // workers: the task generation, the number of blocks still running, and
+    // the first exception thrown by a block
+    std::function<void(std::size_t)> _task;
+    std::size_t _generation;
+    std::size_t _pending;
+    std::exception_ptr _error;
+    bool _stop;
+    std::mutex _mutex;
+    std::condition_variable _start;
+    std::condition_variable _done;
+
+public:
+    /// Starts a pool of num_threads threads (all cores if 0)
+    explicit ThreadPool (const std::size_t num_threads)
+    :
+        _num_threads(num_threads
+                     ? num_threads
+                     : std::max(1u, std::thread::hardware_concurrency())),
+        _workers{},
+        _task{},
+        _generation(0),
+        _pending(0),
+        _error{},
+        _stop(false)
+    {
+        for (std::size_t thread=1; thread<_num_threads; ++thread) {
+            _workers.emplace_back([this, thread](){ this->work(thread); });
+        }
+    }
+
+    ThreadPool (const ThreadPool&) = delete;
+    ThreadPool& operator= (const ThreadPool&) = delete;
+
+    ~ThreadPool () {
+        {
+            std::lock_guard<std::mutex> lock(_mutex);
+            _stop = true;
+        }
+        _start.notify_all();
+        for (auto& worker : _workers) {
+            worker.join();
+        }
+    }
+
+    std::size_t num_threads () const { return _num_threads; }
+
+    /** Runs func(thread, begin, end) on contiguous blocks of [0, n), one per
+      * thread, and returns once all blocks are done. An exception thrown by
+      * a block is rethrown here.
+      */
+    template<typename Func>
+    void for_blocks (const std::size_t n, Func&& func) {
+        if (_num_threads<=1) {
+            func(std::size_t{0}, std::size_t{0}, n);
+            return;
+        }
+        {
+            std::lock_guard<std::mutex> lock(_mutex);
+            _task = [this, &func, n](const std::size_t thread) {
+                func(thread, n*thread/_num_threads, n*(thread+1)/_num_threads);
+            };
+            _pending = _num_threads-1;
+            _error = nullptr;
+            ++_generation;
+        }
+        _start.notify_all();
+        this->run_block(0);
+
+        std::unique_lock<std::mutex> lock(_mutex);
+        _done.wait(lock, [this](){ return _pending==0; });
+        _task = nullptr;
+        if (_error) {
+            std::rethrow_exception(std::exchange(_error, nullptr));
+        }
+    }
+
+private:
+    void run_block (const std::size_t thread) {
+        try {
+            _task(thread);
+        }
+        catch (...) {
+            std::lock_guard<std::mutex> lock(_mutex);
+            if (not _error) {
+                _error = std::current_exception();
+            }
+        }
+    }
+
+    void work (const std::size_t thread) {
+        std::size_t generation = 0;
+        while (true) {
+            {
+                std::unique_lock<std::mutex> lock(_mutex);
+                _start.wait(lock, [this, generation](){
+                    return _stop or _generation!=generation;
+                });
+                if (_stop) {
+                    return;
+                }
+                generation = _generation;
+            }
+            this->run_block(thread);
+            {
+                std::lock_guard<std::mutex> lock(_mutex);
+                --_pending;
+            }
+            _done.notify_one();
+        }
+    }
+};
+
+/** A random matching of the users into disjoint pairs, drawn in parallel.
+  *
+  * The users are divided into classes, and only users of the same class are
+  * paired. Each thread assigns the users of its block to a random bucket
+  * within their class, the buckets are shuffled concurrently, and the
+  * concatenated buckets form a uniformly random permutation of each class.
+  * Consecutive users of a class are paired; if the size of a class is odd,
+  * one of its users remains unpaired.
+  *
+  * Each thread uses its own random number generator, seeded from the model's
+  * generator, so that the matchings are reproducible for a given number of
+  * threads. The work is distributed over a thread pool, which may be shared
+  * with other parts of the model.
+  *
+  * \tparam RNGType The type of the per-thread random number generators
+  */
+template<typename RNGType=std::mt19937>
+class RandomMatching {
+    std::shared_ptr<ThreadPool> _pool;
+    std::size_t _num_threads;
+    std::size_t _num_classes;
+    std::vector<RNGType> _rngs;
+
+    // the bucket of each user, and the size of each bucket per thread
+    std::vector<std::uint32_t> _bucket;
+    std::vector<std::size_t> _counts;
+    // the users ordered by bucket, and the start of each class in that order
+    std::vector<std::size_t> _order;
+    std::vector<std::size_t> _class_start;
+    // the index of the first pair of each class
+    std::vector<std::size_t> _pair_start;
+
+public:
+    RandomMatching ()
+    :
+        RandomMatching(0, 1, std::make_shared<ThreadPool>(1))
+    { }
+
+    /** Sets up the matching of num_users users in num_classes classes on
+      * the threads of the given pool. The per-thread generators are seeded
+      * by the given generator.
+      */
+    template<typename SeedRNGType>
+    RandomMatching (const std::size_t num_users,
+                    const std::size_t num_classes,
+                    const std::shared_ptr<ThreadPool>& pool,
+                    SeedRNGType& rng)
+    :
+        RandomMatching(num_users, num_classes, pool)
+    {
+        _rngs.clear();
+        for (std::size_t t=0; t<_num_threads; ++t) {
+            _rngs.emplace_back(rng());
+        }
+    }
+
+    RandomMatching (const std::size_t num_users,
+                    const std::size_t num_classes,
+                    const std::shared_ptr<ThreadPool>& pool)
+    :
+        _pool(pool),
+        _num_threads(pool->num_threads()),
+        _num_classes(std::max<std::size_t>(num_classes, 1)),
+        _rngs(_num_threads),
+        _bucket(num_users, 0),
+        _counts(_num_threads*_num_classes*_num_threads, 0),
+        _order(num_users, 0),
+        _class_start(_num_classes+1, 0),
+        _pair_start(_num_classes+1, 0)
+    { }
+
+    std::size_t num_threads () const { return _num_threads; }
+
+    /// The number of pairs of the current matching
+    std::size_t num_pairs () const { return _pair_start.back(); }
+
+    /** Draws a new matching. The class of each user is given by
+      * class_of(user, rng), which may use the thread's generator.
+      */
+    template<typename ClassFunc>
+    void draw (ClassFunc&& class_of) {
+        const std::size_t num_buckets = _num_classes*_num_threads;
+
+        // assign each user to a random bucket of its class
+        _pool->for_blocks(_order.size(),
+            [&](const std::size_t thread, const std::size_t begin,
+                const std::size_t end)
+            {
+                auto& rng = _rngs[thread];
+                auto* counts = &_counts[thread*num_buckets];
+                std::fill(counts, counts+num_buckets, 0);
+                std::uniform_int_distribution<std::size_t> distr(0, _num_threads-1);
+                for (std::size_t v=begin; v<end; ++v) {
+                    const std::size_t bucket = class_of(v, rng)*_num_threads
+                                               + distr(rng);
+                    _bucket[v] = bucket;
+                    ++counts[bucket];
+                }
+            });
+
+        // the position of each thread's users within each bucket
+        std::vector<std::size_t> offsets(_counts.size());
+        std::vector<std::size_t> bucket_start(num_buckets+1, 0);
+        std::size_t pos = 0;
+        for (std::size_t b=0; b<num_buckets; ++b) {
+            bucket_start[b] = pos;
+            for (std::size_t t=0; t<_num_threads; ++t) {
+                offsets[t*num_buckets+b] = pos;
+                pos += _counts[t*num_buckets+b];
+            }
+        }
+        bucket_start[num_buckets] = pos;
+
+        // scatter the users into their buckets and shuffle the buckets
+        _pool->for_blocks(_order.size(),
+            [&](const std::size_t thread, const std::size_t begin,
+                const std::size_t end)
+            {
+                auto* offset = &offsets[thread*num_buckets];
+                for (std::size_t v=begin; v<end; ++v) {
+                    _order[offset[_bucket[v]]++] = v;
+                }
+            });
+        _pool->for_blocks(num_buckets,
+            [&](const std::size_t thread, const std::size_t begin,
+                const std::size_t end)
+            {
+                for (std::size_t b=begin; b<end; ++b) {
+                    std::shuffle(_order.begin()+bucket_start[b],
+                                 _order.begin()+bucket_start[b+1],
+                                 _rngs[thread]);
+                }
+            });
+
+        // pair consecutive users of each class
+        for (std::size_t c=0; c<_num_classes; ++c) {
+            _class_start[c] = bucket_start[c*_num_threads];
+            _class_start[c+1] = bucket_start[(c+1)*_num_threads];
+            _pair_start[c+1] = _pair_start[c]
+                               + (_class_start[c+1]-_class_start[c])/2;
+        }
+    }
+
+    /// Draws a new matching in which all users are of the same class
+    void draw () {
+        this->draw([](auto, auto&) { return std::size_t{0}; });
+    }
+
+    /// The users of the p-th pair of the current matching
+    std::pair<std::size_t, std::size_t> pair (const std::size_t p) const {
+        const std::size_t c = std::upper_bound(_pair_start.begin(),
+                                               _pair_start.end(), p)
+                              - _pair_start.begin() - 1;
+        const std::size_t i = _class_start[c]+2*(p-_pair_start[c]);
+        return std::make_pair(_order[i], _order[i+1]);
+    }
+
+    /** Calls func(v, nb) for all pairs of the current matching, distributed
+      * over the threads. Since the pairs are disjoint, func may modify the
+      * two users of its pair without synchronisation.
+      */
+    template<typename Func>
+    void for_each_pair (Func&& func) const {
+        _pool->for_blocks(this->num_pairs(),
+            [&](const std::size_t, const std::size_t begin, const std::size_t end)
+            {
+                for (std::size_t p=begin; p<end; ++p) {
+                    const auto [v, nb] = this->pair(p);
+                    func(v, nb);
+                }
+            });
+    }
+};
+
+} // namespace
+
+#endif // UTOPIA_MODELS_OPDISC_PARALLEL
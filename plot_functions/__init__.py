@@ -0,0 +1,34 @@
+"""Plot functions of the OpDisc model.
+
+The plot functions are imported lazily on first access, so that loading a
+single plot function does not import all of its sibling modules and their
+dependencies.
+"""
+import importlib
+
+#the plot functions and the modules they are defined in
+_PLOT_FUNCS = {
+    'bifurcation': '.bifurcation',
+    'densities': '.densities',
+    'group_avg': '.group_avg',
+    'group_avgs_anim': '.group_avgs_anim',
+    'op_groups': '.op_groups',
+    'opinion_animation': '.opinion_anim',
+    'opinion_at_time': '.opinion_at_time',
+    'sweep1d': '.sweep1d',
+    'sweep2d': '.sweep2d',
+}
+
+__all__ = list(_PLOT_FUNCS)
+
+def __getattr__(name: str):
+    """Imports a plot function from its module on first access"""
+    if name not in _PLOT_FUNCS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    func = getattr(importlib.import_module(_PLOT_FUNCS[name], __name__), name)
+    globals()[name] = func
+
+    return func
+
+def __dir__() -> list:
+    return sorted(list(globals())+__all__)
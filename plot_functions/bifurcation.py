@@ -1,25 +1,26 @@
 import logging
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
-from matplotlib.lines import Line2D
 from utopya import DataManager
 from utopya.plotting import is_plot_func, PlotHelper, MultiversePlotCreator
 
-from .data_analysis import find_extrema
-from .tools import convert_to_label, get_keys_cfg, setup_figure
+from .data_analysis import chunk_mv_data, out_of_core, find_extrema, global_means, rolling_mean
+from .data_io import decode_mv_data
+from .tools import deduce_sweep_dimension, get_keys_cfg, plot_extrema, setup_figure
 
 log = logging.getLogger(__name__)
 
 #-------------------------------------------------------------------------------
 @is_plot_func(creator_type=MultiversePlotCreator)
+@out_of_core
 def bifurcation(dm: DataManager,
                 *,
                 hlpr: PlotHelper,
                 mv_data,
                 avg_window: int=20,
                 dim: str=None,
+                memory_budget=None,
                 plot_kwargs: dict=None,
                 title: str=None):
 
@@ -32,6 +33,9 @@ def bifurcation(dm: DataManager,
         - choose the dimension `dim` in which the sweep was performed. For a single
           sweep dimension, the sweep parameter is automatically deduced
         - use the `select/subspace` key to set values for all other parameters
+        - the global mean recorded by the model can be selected instead of the
+          opinions (see `.global_mean` in the base config), so that only the
+          cached or recorded global means are read
 
     Arguments:
         dm (DataManager): the data manager from which to retrieve the data
@@ -42,6 +46,9 @@ def bifurcation(dm: DataManager,
         dim (str, optional): the parameter dimension of the diagram. If no str
            is passed, an attempt will be made to automatically deduce the sweep
            dimension.
+        memory_budget (int or str, optional): if given, the multiverse data is
+           evaluated out-of-core in chunks fitting this memory budget (in bytes,
+           or as a string such as '4GB'). Requires dask.
         plot_kwargs (dict, optional): kwargs passed to the scatter plot function
         title (str, optional): custom plot title
 
@@ -59,8 +66,7 @@ def bifurcation(dm: DataManager,
                              f" Available: {mv_data.coords}")
 
     #get datasets and cfg ......................................................
-    dataset = mv_data['opinion']
-    time_steps = dataset['time'].size
+    mv_data = decode_mv_data(chunk_mv_data(mv_data, memory_budget=memory_budget))
     keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
                              keys_to_ignore=[dim, 'time'])
 
@@ -73,43 +79,17 @@ def bifurcation(dm: DataManager,
     #get the turning points of the average opinion (maxima only). If a sweep over
     #seed was performed, multiple datapoints are collected per x-value
     log.info("Starting data analysis ...")
+    means_glob, has_seeds = global_means(mv_data, keys, dims=[dim], dm=dm)
+    means_glob = rolling_mean(means_glob, window=avg_window)
     to_plot = []
-    if 'seed' in mv_data.coords and len(dataset['seed'])>1:
-        for i in range(len(dataset[dim])):
-            extremes = []
-            for j in range(len(dataset['seed'])):
-                keys[dim] = i
-                keys['seed'] = j
-                data = np.asarray(dataset[keys])
-                means_glob = pd.Series(np.mean(data, axis=1)).rolling(window=avg_window).mean()
-                res = find_extrema(means_glob)
-                extremes.extend(res['max']['y'])
+    for i in range(len(mv_data.coords[dim])):
+        extremes = []
+        for means in (means_glob[i] if has_seeds else [means_glob[i]]):
+            extremes.extend(find_extrema(means)['max']['y'])
 
-            to_plot.append((dataset[dim][i].data, extremes))
-    else:
-        for i in range(len(dataset[dim])):
-            keys[dim] = i
-            data = np.asarray(dataset[keys])
-            means_glob = pd.Series(np.mean(data, axis=1)).rolling(window=avg_window).mean()
-            extremes = find_extrema(means_glob)['max']['y']
-
-            to_plot.append((dataset[dim][i].data, extremes))
+        to_plot.append((mv_data.coords[dim].data[i], extremes))
 
     log.info("Data analysis complete.")
 
     #plot scatter plot of extrema ..............................................
-    for p, o in to_plot:
-        hlpr.ax.scatter([p] * len(o), o, **plot_kwargs)
-
-    #hlpr.ax.set_ylim(0, 1)
-    hlpr.ax.set_xlabel(convert_to_label(dim))
-    hlpr.ax.set_ylabel(r'mean opinion $\bar{\sigma}$')
-    legend_elements = [Line2D([0], [0],
-                       label=(r'$\bar{\sigma}^\prime = 0$,'+
-                              r'$\bar{\sigma}^{\prime \prime} < 0$'),
-                       lw=0,
-                       marker='o', color=plot_kwargs['color'] if not None else 'navy',
-                       markerfacecolor=plot_kwargs['color'] if not None else 'navy',
-                       markersize=5)]
-    hlpr.ax.legend(handles=legend_elements, bbox_to_anchor=(1, 1.01),
-                   loc='lower right', ncol=2, fontsize='xx-small')
+    plot_extrema(hlpr.ax, to_plot, dim=dim, plot_kwargs=plot_kwargs)
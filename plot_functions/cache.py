@@ -0,0 +1,104 @@
+"""Persistent cache of derived per-universe statistics for the OpDisc plots.
+
+The statistics of each universe are stored in a sidecar file next to the
+universe's data. Each entry is keyed by a hash of the universe's model
+configuration and the analysis parameters, and is recomputed whenever either
+of them changes.
+"""
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+#name of the sidecar file in each universe directory
+CACHE_FILE = 'derived_stats.npz'
+
+#the configuration entries that determine the output of a universe
+CFG_KEYS = ['OpDisc', 'num_steps', 'seed', 'write_every', 'write_start']
+
+## -----------------------------------------------------------------------------
+def cache_key(cfg, **params) -> str:
+    """Returns the hash of a universe configuration and the analysis parameters.
+
+    Arguments:
+        cfg (dict): the universe configuration
+        **params: the analysis parameters
+
+    Returns:
+        key (str): the hex digest of the hash
+    """
+    cfg = {key: cfg[key] for key in CFG_KEYS if key in cfg}
+    content = json.dumps({'cfg': cfg, 'params': params}, sort_keys=True,
+                         default=lambda x: np.asarray(x).tolist())
+
+    return hashlib.sha1(content.encode()).hexdigest()
+
+## -----------------------------------------------------------------------------
+def universe_dir(dm, uni) -> str:
+    """Returns the output directory of a universe, or None if it cannot be
+    found.
+
+    Arguments:
+        dm (DataManager): the data manager
+        uni (UniverseGroup): the universe
+    """
+    candidates = [os.path.join(dm.dirs['data'], f"uni{uni.name}"),
+                  os.path.join(dm.dirs['data'], uni.name)]
+    if 'output_path' in uni['cfg']:
+        candidates.append(os.path.dirname(uni['cfg']['output_path']))
+    for path in candidates:
+        if os.path.isdir(path):
+            return path
+
+    return None
+
+## -----------------------------------------------------------------------------
+def load_or_compute(directory: str, name: str, key: str,
+                    compute: Callable[[], dict]) -> dict:
+    """Returns a cache entry, computing and storing it if it is missing or was
+    computed for a different key.
+
+    Arguments:
+        directory (str): the directory holding the cache file. If None, the
+            entry is computed without caching.
+        name (str): the name of the cache entry
+        key (str): the key of the entry, see ``cache_key``
+        compute (Callable): returns the entry as a dict of arrays
+
+    Returns:
+        entry (dict): the (cached) entry
+    """
+    if directory is None:
+        return compute()
+
+    path = os.path.join(directory, CACHE_FILE)
+    prefix = f"{name}__"
+    entries = {}
+    if os.path.exists(path):
+        try:
+            with np.load(path) as f:
+                entries = {k: f[k] for k in f.files}
+        except (OSError, ValueError) as err:
+            log.warning(f"Could not read cache file {path}: {err}")
+
+    if str(entries.get(prefix+'_key', '')) == key:
+        log.debug(f"Loaded '{name}' from cache {path}.")
+        return {k[len(prefix):]: v for k, v in entries.items()
+                if k.startswith(prefix) and k!=prefix+'_key'}
+
+    entry = compute()
+    entries = {k: v for k, v in entries.items() if not k.startswith(prefix)}
+    entries.update({prefix+k: np.asarray(v) for k, v in entry.items()})
+    entries[prefix+'_key'] = np.asarray(key)
+    try:
+        tmp_path = path+'.tmp.npz'
+        np.savez(tmp_path, **entries)
+        os.replace(tmp_path, path)
+    except OSError as err:
+        log.warning(f"Could not write cache file {path}: {err}")
+
+    return entry
@@ -1,118 +1,72 @@
 """Data analysis tools for the OpDisc plots."""
+import contextlib
+import functools
 import logging
 import numpy as np
-import pandas as pd
-from typing import Tuple
+import os
+from typing import Tuple, Union
+
+from .cache import cache_key, load_or_compute, universe_dir
+from .data_io import (extend_frozen, model_stats, replica_seeds, universe_dataset,
+                      universe_time)
+from .grouped_stats import group_indices, grouped_stats, means_stddevs, to_time_series
 
 log = logging.getLogger(__name__)
 
 ## -----------------------------------------------------------------------------
-def data_by_group(dataset, groups, group_list, val_range: tuple=(0., 1.),
-                  num_bins: int=100, *, ageing: bool, time_step: int=None) -> list:
+def data_by_group(dataset, groups, group_list, *, ageing: bool,
+                  time_step: int=None) -> Tuple[np.ndarray, np.ndarray]:
     """For a given input of opinion values and group labels, this function
-    sorts the opinions by groups and outputs the opinions of each group over time.
+    sorts the opinions by groups. At each time step, the opinions are ordered by
+    group, such that the opinions of group k at time step t are given by
+    ``data[t, bounds[t, k]:bounds[t, k+1]]``. Users that do not belong to any
+    group are moved to the end of each row.
 
     Arguments:
         dataset (ndarray): the opinion dataset
         groups (ndarray): group label dataset
         group_list (list): list of groups to sort by
-        val_range (tuple): range for the histogram binning
-        num_bins (int): number of bins for the histogram
         ageing: (bool): whether the list of groups represents age intervals
-        time_step (int, optional): if the data array is 1d, the time step of the
-            data array considered can be passed to ensure the group labels are
-            also chosen from that time step
+        time_step (int, optional): if the data array is 2d, only the opinions
+            (and, for time-dependent labels, the group labels) at this time step
+            are considered
+
+    Returns:
+        data (ndarray, 2d): the (time, vertex) opinions, sorted by group
+        bounds (ndarray, 2d): the (time, group) boundaries of each group; has
+            one more entry than the number of groups along the second axis
 
     Raises:
         ValueError: if the dimension of the group labels is greater than two
-        ValueError: if a single time step is specified but the
     """
     #prepare data...............................................................
-    data = np.asarray(dataset)
-    #if a specific time step is considered (eg. the last one) only the opinion
-    #value at that time step are relevant
-    if data.ndim==2 and time_step:
-        data = np.asarray([dataset[time_step]])
-    #for certain runs, only a single time step will have been written (typically
-    #the last one. In these cases, the data array is transformed into a 2d array
-    #with one 'artifical' time step.
-    elif data.ndim==1:
-        data = np.asarray([dataset])
+    data = to_time_series(dataset, time_step=time_step)
     time_steps = data.shape[0]
-    start, stop = val_range
-
-    #prepare group labels.......................................................
-    groups = np.asarray(groups)
-    if groups.ndim>2:
-        raise ValueError(f"Invalid array dimension {groups.ndim}! Group label"
-              " array must have dimension<3.")
-
-    #the group labels can be constant or change over time (ageing model), and
-    #they can also either represent group numbers or age bins. We must accout
-    #for each of the three cases (1d and group label, 1d and age, 2d and age).
-    #Case 1 group labels are time-dependent or represent age groups.............
-    if ageing:
-        #if a specific time step is considered (eg. the last one) only the group
-        #labels at that time step are relevant in the case of temporally changing
-        #labels
-        if groups.ndim==2 and time_step:
-            groups = np.asarray([groups[time_step]])
-
-        #If the group labels are already 1d but still represent age groups, the
-        #group label array is transformed into a 2d array with one 'artifical'
-        #time step (as in the dataset above)
-        elif groups.ndim==1:
-            groups = np.asarray([groups])
-
-        #check if all groups are covered by the given  groups; if not,
-        #add maximum groups number to make sure they are.
-        #This is necessary for pd.cut
-        max_group_number = np.amax(groups)
-        extended_groups = False
-        if max_group_number>=group_list[-1]:
-            extended_groups = True
-            group_list.append(max_group_number+1)
-
-        num_groups = len(group_list)-1 if ageing else len(group_list)
-
-        data_by_group = [[[] for _ in range(time_steps)] for k in range(num_groups)]
-        for t in range(time_steps):
-            m = [[] for _ in range(num_groups)]
-            group_bins = pd.cut(groups[t, :], group_list, labels=False,
-                                  include_lowest=True)
-            for i in range(data.shape[1]):
-                m[group_bins[groups[t, i]]].append(data[t, i])
-            for k in range(len(m)):
-                data_by_group[k][t] = m[k]
-
-        #if the age range was artificially extended, remove this additional
-        #age bin
-        if extended_groups:
-            data_by_group.pop(-1)
-            group_list.pop(-1)
-
-    #group labels are constant and do not represent age labels..................
+
+    #get group indices, moving users without a group to an additional group.....
+    num_groups = len(group_list)-1 if ageing else len(group_list)
+    idx = group_indices(groups, group_list, ageing=ageing, time_step=time_step)
+    idx = idx[:time_steps]
+    idx = np.where(idx<0, num_groups, idx)
+
+    #count the group sizes at each time step in a single pass
+    offsets = (num_groups+1)*np.arange(idx.shape[0])[:, np.newaxis]
+    counts = np.bincount((idx+offsets).ravel(),
+                         minlength=idx.shape[0]*(num_groups+1))
+    counts = counts.reshape(idx.shape[0], num_groups+1)
+    bounds = np.zeros_like(counts)
+    bounds[:, 1:] = np.cumsum(counts[:, :-1], axis=1)
+
+    #sort the opinions by group; constant group labels only need to be sorted
+    #once
+    if idx.shape[0]==1:
+        data = data[:, np.argsort(idx[0], kind='stable')]
+        bounds = np.repeat(bounds, time_steps, axis=0)
     else:
-        #subspace selection
-        if groups.ndim==2:
-            groups = groups[0]
-        num_groups = len(group_list)
-        data_by_group = [[[] for _ in range(time_steps)] for k in range(num_groups)]
-        i = np.argsort(groups)
-        data = data[:,i]
-        groups = groups[i]
-        idx_jumps = np.zeros(num_groups+1, dtype=int)
-        idx_jumps[-1] = data.shape[1]-1
-        j = 1
-        for i in range(data.shape[1]-1):
-            if(groups[i+1]>groups[i]):
-                idx_jumps[j]=i+1
-                j+=1
-        for t in range(time_steps):
-            for _ in range(num_groups):
-                data_by_group[_][t]=data[t, idx_jumps[_]:idx_jumps[_+1]]
+        data = np.take_along_axis(data, np.argsort(idx, axis=1, kind='stable'),
+                                  axis=1)
 
-    return data_by_group
+    return data, bounds
 
 ## -----------------------------------------------------------------------------
 def get_means_stddevs(data, groups, group_list, *,
@@ -137,19 +91,62 @@ def get_means_stddevs(data, groups, group_list, *,
             Warning: if two-dimensional group labels are passed without a specific
                time step.
         """
-        if groups.ndim==2 and time_step is None:
+        if np.ndim(groups)==2 and time_step is None:
             log.warn("Group labels are two-dimensional, yet you have not specified"
             " the specific time step of the dataset. The first time step will"
             " automatically be chosen. Pass a 'time_step' if you wish to specify"
             " the time step!")
 
-        data_by_groups = data_by_group(data, groups, group_list, ageing=ageing,
-                                       time_step=time_step)
-        m = [abs(np.mean(data_by_groups[n])-0.5) for n in range(len(data_by_groups))]
-        s = [np.std(data_by_groups[n]) for n in range(len(data_by_groups))]
+        means, stddevs = means_stddevs(grouped_stats(data, groups, group_list,
+                                       ageing=ageing, time_step=time_step))
+        m = np.abs(means[0]-0.5).tolist()
+        s = stddevs[0].tolist()
 
         return m, s
 
+## -----------------------------------------------------------------------------
+def rolling_mean(data, *, window: int) -> np.ndarray:
+    """Returns the rolling mean along the last axis, calculated from the
+    cumulative sum. As with ``pd.Series.rolling``, the first window-1 entries of
+    the result are NaN.
+
+    Arguments:
+        data (array): the data, with time as the last dimension
+        window (int): the smoothing window
+
+    Returns:
+        res (ndarray): the smoothed data, with the same shape as the data
+    """
+    data = np.asarray(data, dtype=float)
+    res = np.full(data.shape, np.nan)
+    if data.shape[-1]<window:
+        return res
+    c = np.cumsum(data, axis=-1)
+    res[..., window-1] = c[..., window-1]
+    res[..., window:] = c[..., window:]-c[..., :-window]
+    res[..., window-1:] /= window
+
+    return res
+
+## -----------------------------------------------------------------------------
+def area_from_means(means, *, absolute: bool, window: int=10) -> np.ndarray:
+    """Returns the area under the curve of the global mean opinion minus 0.5.
+
+    Arguments:
+        means (array): the global mean opinion, with time as the last dimension
+        absolute (bool): whether to return the absolute (unsigned) area or the
+            absolute value of the signed area
+        window (int, optional): the smoothing window for the rolling average
+
+    Returns:
+        A (ndarray): the areas, with the time dimension reduced
+    """
+    means = rolling_mean(means, window=window)-0.5
+    if absolute:
+        return np.nansum(np.abs(means), axis=-1)
+
+    return np.abs(np.nansum(means, axis=-1))
+
 ## -----------------------------------------------------------------------------
 def absolute_area(data, *, window: int=10) -> float:
     """Returns the absolute area (unsigned) under the mean curve minus 0.5.
@@ -161,11 +158,7 @@ def absolute_area(data, *, window: int=10) -> float:
     Returns:
         A (float): the area (>=0)
     """
-    mean_glob = pd.Series(np.mean(data, axis=1)).rolling(window=window).mean()
-    means = np.abs(mean_glob-0.5)
-    A = np.sum(means, axis=0)
-
-    return A
+    return area_from_means(np.mean(data, axis=1), absolute=True, window=window)
 
 ## -----------------------------------------------------------------------------
 def area(data, *, window: int=10) -> float:
@@ -177,11 +170,7 @@ def area(data, *, window: int=10) -> float:
     Returns:
         A (float): the area
     """
-    mean_glob = pd.Series(np.mean(data, axis=1)).rolling(window=window).mean()
-    means = mean_glob-0.5
-    A = np.sum(means, axis=0)
-
-    return np.abs(A)
+    return area_from_means(np.mean(data, axis=1), absolute=False, window=window)
 
 ## -----------------------------------------------------------------------------
 def difference_of_extreme_means(mv_data, x, y, groups, group_list, *,
@@ -218,19 +207,16 @@ def difference_of_extreme_means(mv_data, x, y, groups, group_list, *,
             groups = np.asarray(mv_data['group_label'][{x: 0, y: n, 'time': 0}], dtype=int)
             for i in range(len(mv_data.coords[x])):
                 data = np.asarray(mv_data[{y: n, x: i, 'time': -1}]['opinion'])
-                data_by_groups = data_by_group(data, groups, group_list, ageing=False)
-                mean_0 = np.mean(data_by_groups[group_1])
-                mean_1 = np.mean(data_by_groups[group_2])
-                res[n, i] = mean_1-mean_0
+                means = means_stddevs(grouped_stats(data, groups, group_list,
+                                                    ageing=False))[0][0]
+                res[n, i] = means[group_2]-means[group_1]
     else:
         for param1 in range(len(mv_data.coords[x])):
             for param2 in range(len(mv_data.coords[y])):
                 data = np.asarray(mv_data[{x: param1, y: param2, 'time':-1}]['opinion'])
-                data_by_groups = data_by_group(data, groups, group_list,
-                                                 ageing=ageing, time_step=time_step)
-                mean_0 = np.mean(data_by_groups[group_1])
-                mean_1 = np.mean(data_by_groups[group_2])
-                res[param2, param1] = mean_1-mean_0
+                means = means_stddevs(grouped_stats(data, groups, group_list,
+                                      ageing=ageing, time_step=time_step))[0][0]
+                res[param2, param1] = means[group_2]-means[group_1]
 
     return res
 
@@ -334,7 +320,355 @@ def find_extrema(data, *, x=None) -> dict:
     return res
 
 ## -----------------------------------------------------------------------------
-def get_absolute_area(mv_data, keys, *, dim: str) -> Tuple[list, list]:
+def chunk_mv_data(mv_data, *, memory_budget: Union[int, str]=None,
+                  num_workers: int=None):
+    """Returns the multiverse data as chunked dask arrays, such that all
+    reductions of the multiverse data are evaluated out-of-core within the
+    given memory budget. Each chunk holds a single universe and a block of time
+    steps with all vertices. The data must be selected lazily, i.e. from
+    HDF5 proxies resolved as dask arrays (see the 'lazy' load entry of
+    ``OpDisc_eval_cfg.yml``), so that it is only read chunk by chunk; the
+    time blocks are then aligned to its chunks (the HDF5 chunks) where the
+    budget allows.
+
+    Arguments:
+        mv_data (xdarray): the multiverse data
+        memory_budget (int or str, optional): the peak memory to be used by the
+            reductions, either in bytes or as a string (eg. '4GB'). If None,
+            or if no opinions were selected, the data is returned unchanged.
+        num_workers (int, optional): the number of threads the chunks are
+            sized for; defaults to the number of CPUs. The reductions are only
+            evaluated on these threads within ``out_of_core``.
+
+    Returns:
+        mv_data (xdarray): the chunked multiverse data
+
+    Raises:
+        ImportError: if a memory budget is given but dask is not installed
+    """
+    #only the opinions (and group labels) need to be read chunk by chunk
+    if memory_budget is None or 'opinion' not in mv_data:
+        return mv_data
+    try:
+        from dask.utils import parse_bytes
+    except ImportError as err:
+        raise ImportError("Out-of-core evaluation requires dask! Install it or "
+                          "remove the 'memory_budget' key.") from err
+
+    if isinstance(memory_budget, str):
+        memory_budget = parse_bytes(memory_budget)
+    num_workers = num_workers if num_workers else (os.cpu_count() or 1)
+
+    #each worker holds one chunk and temporaries of about the same size
+    opinions = mv_data['opinion']
+    chunk_bytes = memory_budget // (2*num_workers)
+    row_bytes = opinions.dtype.itemsize*opinions.sizes.get('vertex', 1)
+    time_chunk = max(1, chunk_bytes // row_bytes)
+
+    #align the time blocks to the storage chunks, if whole chunks fit into the
+    #budget
+    if opinions.chunks is None:
+        log.warning("The multiverse data was loaded into memory before being "
+                    "chunked, so that the memory budget only applies to the "
+                    "reductions. Select the fields from the 'lazy' data of "
+                    "OpDisc_eval_cfg.yml to read the data chunk by chunk.")
+    elif 'time' in opinions.dims:
+        t = opinions.chunks[opinions.dims.index('time')][0]
+        if time_chunk >= t:
+            time_chunk = (time_chunk // t)*t
+
+    chunks = {dim: 1 for dim in mv_data.dims if dim not in ['time', 'vertex']}
+    chunks['time'] = min(time_chunk, mv_data.sizes.get('time', 1))
+    chunks['vertex'] = -1
+    log.info(f"Evaluating out-of-core with chunks {chunks} on {num_workers} "
+             "threads.")
+
+    return mv_data.chunk({dim: c for dim, c in chunks.items() if dim in mv_data.dims})
+
+## -----------------------------------------------------------------------------
+@contextlib.contextmanager
+def dask_scheduler(memory_budget: Union[int, str]=None, num_workers: int=None):
+    """Evaluates the dask reductions within the context on the threaded
+    scheduler; the previous dask configuration is restored on exit.
+
+    Arguments:
+        memory_budget (int or str, optional): the memory budget of the
+            evaluation (see ``chunk_mv_data``). If None, the data is not
+            chunked and the dask configuration is left unchanged.
+        num_workers (int, optional): the number of threads; defaults to the
+            number of CPUs
+
+    Raises:
+        ImportError: if a memory budget is given but dask is not installed
+    """
+    if memory_budget is None:
+        yield
+        return
+    try:
+        import dask
+    except ImportError as err:
+        raise ImportError("Out-of-core evaluation requires dask! Install it or "
+                          "remove the 'memory_budget' key.") from err
+
+    num_workers = num_workers if num_workers else (os.cpu_count() or 1)
+    with dask.config.set(scheduler='threads', num_workers=num_workers):
+        yield
+
+## -----------------------------------------------------------------------------
+def out_of_core(plot_func):
+    """Decorates a multiverse plot function such that the reductions of the
+    data chunked by ``chunk_mv_data`` are evaluated on the threaded scheduler
+    for the duration of the plot only (see ``dask_scheduler``). The memory
+    budget is taken from the ``memory_budget`` argument of the plot function.
+    """
+    @functools.wraps(plot_func)
+    def wrapped(*args, **kwargs):
+        with dask_scheduler(kwargs.get('memory_budget')):
+            return plot_func(*args, **kwargs)
+
+    return wrapped
+
+## -----------------------------------------------------------------------------
+def universe_group_stats(dm, uni, group_list, *, ageing: bool,
+                         num_bins: int=None, val_range: tuple=(0., 1.),
+                         replica: int=0) -> dict:
+    """Returns the grouped statistics of the opinions of a replica of a
+    universe (see ``grouped_stats.grouped_stats``), together with the 'time'
+    coordinates and the maximum group label 'max_group'. If the model recorded
+    matching summary statistics, these are used; otherwise, the statistics are
+    calculated from the opinion dataset and cached in the universe directory.
+
+    Arguments:
+        dm (DataManager): the data manager
+        uni (UniverseGroup): the universe
+        group_list (list): list of groups (or age bin edges) to sort by
+        ageing (bool): whether the list of groups represents age intervals
+        num_bins (int, optional): number of bins for the histograms
+        val_range (tuple, optional): range for the histogram binning
+        replica (int, optional): the replica, for runs with several replicas
+
+    Returns:
+        stats (dict): the grouped statistics
+    """
+    def compute() -> dict:
+        with universe_dataset(uni, 'group_label', replica=replica) as labels:
+            groups = np.asarray(labels[:] if ageing else labels[0], dtype=int)
+        with universe_dataset(uni, 'opinion', replica=replica) as opinions:
+            stats = grouped_stats(opinions, groups, group_list, ageing=ageing,
+                                  num_bins=num_bins, val_range=val_range)
+        stats['time'] = universe_time(uni)
+        stats['max_group'] = np.amax(groups)
+        return stats
+
+    stats = model_stats(uni, group_list, ageing=ageing, num_bins=num_bins,
+                        val_range=val_range, replica=replica)
+    if stats is not None:
+        return stats
+
+    name = 'grouped_stats' if num_bins is None else 'grouped_hist'
+    #the key of the first replica is that of a universe without replicas
+    key = cache_key(uni['cfg'], group_list=list(group_list), ageing=ageing,
+                    num_bins=num_bins, val_range=list(val_range),
+                    **({'replica': replica} if replica else {}))
+
+    return load_or_compute(universe_dir(dm, uni), name, key, compute)
+
+## -----------------------------------------------------------------------------
+def universe_global_mean(dm, uni, *, replica: int=None) -> np.ndarray:
+    """Returns the global mean opinion of a universe over time. If recorded,
+    the global mean of the model's summary statistics is used; otherwise, it is
+    calculated from the opinion dataset and cached in the universe directory.
+    Runs stopped on convergence are extended to all write times of the run.
+
+    Arguments:
+        dm (DataManager): the data manager
+        uni (UniverseGroup): the universe
+        replica (int, optional): the replica to select, for runs with several
+            replicas; by default, the means of all replicas are returned
+
+    Returns:
+        mean (ndarray): the global mean opinion at each time step; of several
+            replicas, the (time, seed) global mean opinions unless a single
+            replica is selected
+    """
+    try:
+        mean = np.asarray(uni['data/OpDisc/stats/global_mean'])
+    except KeyError:
+        mean = None
+    if mean is not None:
+        if mean.ndim>1 and replica is not None:
+            mean = mean[:, replica]
+        return extend_frozen(uni, mean)
+
+    seeds = replica_seeds(uni)
+    replicas = range(len(seeds)) if seeds is not None else [0]
+
+    def compute() -> dict:
+        means = []
+        for r in replicas:
+            with universe_dataset(uni, 'opinion', replica=r) as opinions:
+                means.append([np.mean(ops) for ops in opinions])
+        #the means of a single replica are stored without a seed axis
+        return {'mean': np.array(means).T if seeds is not None else
+                        np.array(means[0])}
+
+    #the key of a universe without replicas is kept unchanged
+    key = cache_key(uni['cfg'], **({} if seeds is None
+                                   else {'replicas': len(seeds)}))
+    mean = load_or_compute(universe_dir(dm, uni), 'global_mean', key,
+                           compute)['mean']
+    if seeds is not None and replica is not None:
+        mean = mean[:, replica]
+
+    return extend_frozen(uni, mean)
+
+## -----------------------------------------------------------------------------
+def _cfg_value(cfg, key: str):
+    """Returns the value of a sweep parameter from a universe configuration"""
+    if key=='seed':
+        return cfg['seed']
+    elif key in ['life_expectancy', 'peer_radius', 'time_scale']:
+        return cfg['OpDisc']['ageing'][key]
+
+    return cfg['OpDisc'][key]
+
+## -----------------------------------------------------------------------------
+def _coord_index(coords, val) -> int:
+    """Returns the index of a value in the coordinates, or None"""
+    try:
+        idx = np.flatnonzero(np.isclose(np.asarray(coords, dtype=float), float(val)))
+    except (TypeError, ValueError):
+        idx = np.flatnonzero(np.asarray(coords)==val)
+
+    return idx[0] if idx.size else None
+
+## -----------------------------------------------------------------------------
+def cached_global_means(dm, mv_data, keys, *, dims: list) -> Tuple[np.ndarray, bool]:
+    """Returns the global mean opinion over time of all points of the sweep
+    dimensions from the per-universe caches (see ``universe_global_mean``). The
+    output has the same layout as that of ``global_means``. The replicas of a
+    universe are assigned to the seed axis by their seeds. Only the coordinates
+    of the multiverse data are used, so that a small field such as the recorded
+    global mean may be selected instead of the opinions.
+
+    Arguments:
+        dm (DataManager): the data manager
+        mv_data (xdarray): the multiverse data
+        keys (dict): the keys with the subspace selection
+        dims (list): the sweep dimensions
+
+    Returns:
+        means (ndarray): the global mean opinions, or None if not every point
+            of the selection could be assigned a universe
+        has_seeds (bool): whether or not the means have a seed axis
+    """
+    #the coordinates of the selection in each parameter dimension
+    coords = {dim: np.asarray(mv_data.coords[dim].data[keys[dim]] if dim in keys
+                              and dim not in dims else mv_data.coords[dim].data)
+              for dim in mv_data.dims if dim not in ['time', 'vertex']}
+    seeds = ['seed'] if 'seed' in coords and coords['seed'].ndim and 'seed' not in dims else []
+    out_dims = list(dims)+seeds
+    fixed = {dim: c for dim, c in coords.items() if dim not in out_dims}
+    if any(c.ndim for c in fixed.values()):
+        return None, bool(seeds)
+
+    means = np.full([coords[dim].size for dim in out_dims]
+                    +[mv_data.sizes['time']], np.nan)
+    for uni in dm['multiverse'].values():
+        try:
+            replicas = replica_seeds(uni)
+        except KeyError:
+            return None, bool(seeds)
+        mean = None
+        #a universe without replicas is a single point of the seed axis
+        for r, seed in enumerate(replicas if replicas is not None else [None]):
+            value = lambda dim: (seed if dim=='seed' and seed is not None
+                                 else _cfg_value(uni['cfg'], dim))
+            try:
+                if any(_coord_index([val], value(dim)) is None
+                       for dim, val in fixed.items()):
+                    continue
+                idx = tuple(_coord_index(coords[dim], value(dim))
+                            for dim in out_dims)
+            except KeyError:
+                return None, bool(seeds)
+            if None in idx:
+                continue
+            if mean is None:
+                mean = universe_global_mean(dm, uni)
+            if mean.shape[0]!=means.shape[-1]:
+                return None, bool(seeds)
+            means[idx] = mean[:, r] if seed is not None else mean
+
+    if np.isnan(means).any():
+        return None, bool(seeds)
+
+    return means, bool(seeds)
+
+## -----------------------------------------------------------------------------
+def global_means(mv_data, keys, *, dims: list, dm=None) -> Tuple[np.ndarray, bool]:
+    """Returns the global mean opinion over time of all points of the sweep
+    dimensions. If a data manager is passed, the per-universe caches are
+    consulted first. Otherwise, the opinions are reduced over the vertices for
+    the entire multiverse in a single (lazy) operation, or, if the global mean
+    recorded by the model was selected instead ('global_mean'), it is used as
+    it is.
+
+    Arguments:
+        mv_data (xdarray): the multiverse data
+        keys (dict): the keys with the subspace selection
+        dims (list): the sweep dimensions
+        dm (DataManager, optional): the data manager
+
+    Returns:
+        means (ndarray): the global mean opinions, with one axis per sweep
+            dimension, followed by the seed axis (if present) and time
+        has_seeds (bool): whether or not the means have a seed axis
+    """
+    if dm is not None:
+        means, has_seeds = cached_global_means(dm, mv_data, keys, dims=dims)
+        if means is not None:
+            return means, has_seeds
+        log.info("Not all universes could be matched to the selection; "
+                 "computing the global means from the multiverse data.")
+
+    data = mv_data['opinion'] if 'opinion' in mv_data else mv_data['global_mean']
+    sel = {key: val for key, val in keys.items()
+           if key in data.dims and key not in list(dims)+['time', 'vertex']}
+    means = data[sel].mean('vertex') if 'vertex' in data.dims else data[sel]
+    seeds = ['seed'] if 'seed' in means.dims and 'seed' not in dims else []
+
+    return np.asarray(means.transpose(*dims, *seeds, 'time')), bool(seeds)
+
+## -----------------------------------------------------------------------------
+def get_areas(mv_data, keys, *, dims: list, absolute: bool, window: int=10,
+              dm=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the areas under the mean curves of all points of the sweep
+    dimensions at once. The mean and stddev are taken over the seeds.
+
+    Arguments:
+        mv_data (xdarray): the multiverse data
+        keys (dict): the keys with the subspace selection
+        dims (list): the sweep dimensions
+        absolute (bool): whether to calculate the absolute (unsigned) or the
+            signed area
+        window (int, optional): the smoothing window for the rolling average
+        dm (DataManager, optional): if given, the cached global means of the
+            universes are used where available
+
+    Returns:
+        plot_data (ndarray): the mean areas, with one axis per sweep dimension
+        err (ndarray): the standard deviations over the seeds
+    """
+    means, has_seeds = global_means(mv_data, keys, dims=dims, dm=dm)
+    areas = area_from_means(means, absolute=absolute, window=window)
+    if has_seeds:
+        return np.mean(areas, axis=-1), np.std(areas, axis=-1)
+
+    return areas, np.zeros_like(areas)
+
+## -----------------------------------------------------------------------------
+def get_absolute_area(mv_data, keys, *, dim: str, dm=None) -> Tuple[list, list]:
     """Returns a list of absolte areas (unsigned) and the stddevs of each value
     for a given sweep parameter.
 
@@ -342,39 +676,20 @@ def get_absolute_area(mv_data, keys, *, dim: str) -> Tuple[list, list]:
         mv_data (xdarray): the multiverse data
         keys (dict): the keys with the subspace selection
         dim (str): the sweep dimension
+        dm (DataManager, optional): if given, the cached global means of the
+            universes are used where available
 
     Returns:
         plot_data (list): a list of area of length (sweep parameter dimension)
         err (list): a list of standard deviations
     """
-    data_to_plot = {}
-    for i in range(len(mv_data.coords[dim].data)):
-        data_to_plot[mv_data.coords[dim].data[i]] = []
-    if 'seed' in mv_data.coords and len(mv_data.coords['seed'].data)>1:
-        for i in range(len(mv_data.coords[dim])):
-            for j in range(len(mv_data.coords['seed'])):
-                keys[dim] = i
-                keys['seed'] = j
-                data = np.asarray(mv_data[keys]['opinion'])
-                res = absolute_area(data)
-                data_to_plot[mv_data.coords[dim].data[i]].append(res)
-    else:
-        for i in range(len(mv_data.coords[dim])):
-            keys[dim]=i
-            data = np.asarray(mv_data[keys]['opinion'])
-            res = absolute_area(data)
-            data_to_plot[mv_data.coords[dim].data[i]].append(res)
+    plot_data, err = get_areas(mv_data, keys, dims=[dim], absolute=True,
+                               dm=dm)
 
-    plot_data = []
-    err = []
-    for key in data_to_plot.keys():
-        plot_data.append(np.mean(data_to_plot[key]))
-        err.append(np.std(data_to_plot[key]))
-
-    return plot_data, err
+    return plot_data.tolist(), err.tolist()
 
 ## -----------------------------------------------------------------------------
-def get_area(mv_data, keys, *, dim: str) -> Tuple[list, list]:
+def get_area(mv_data, keys, *, dim: str, dm=None) -> Tuple[list, list]:
     """Returns a list of areas (signed) and the stddevs of each value for a given
     sweep parameter.
 
@@ -382,36 +697,17 @@ def get_area(mv_data, keys, *, dim: str) -> Tuple[list, list]:
         mv_data (xdarray): the multiverse data
         keys (dict): the keys with the subspace selection
         dim (str): the sweep dimension
+        dm (DataManager, optional): if given, the cached global means of the
+            universes are used where available
 
     Returns:
         plot_data (list): a list of area of length (sweep parameter dimension)
         err (list): a list of standard deviations
     """
-    data_to_plot = {}
-    for i in range(len(mv_data.coords[dim].data)):
-        data_to_plot[mv_data.coords[dim].data[i]] = []
-    if 'seed' in mv_data.coords and len(mv_data.coords['seed'].data)>1:
-        for i in range(len(mv_data.coords[dim])):
-            for j in range(len(mv_data.coords['seed'])):
-                keys[dim] = i
-                keys['seed'] = j
-                data = np.asarray(mv_data[keys]['opinion'])
-                res = area(data)
-                data_to_plot[mv_data.coords[dim].data[i]].append(res)
-    else:
-        for i in range(len(mv_data.coords[dim])):
-            keys[dim]=i
-            data = np.asarray(mv_data[keys]['opinion'])
-            res = area(data)
-            data_to_plot[mv_data.coords[dim].data[i]].append(res)
-
-    plot_data = []
-    err = []
-    for key in data_to_plot.keys():
-        plot_data.append(np.mean(data_to_plot[key]))
-        err.append(np.std(data_to_plot[key]))
+    plot_data, err = get_areas(mv_data, keys, dims=[dim], absolute=False,
+                               dm=dm)
 
-    return plot_data, err
+    return plot_data.tolist(), err.tolist()
 
 ## -----------------------------------------------------------------------------
 def means_stddevs_by_group(mv_data, group_list, dim, keys, *, mode: str,
@@ -0,0 +1,572 @@
+"""Memory-efficient access to the OpDisc datasets.
+
+Universe plots typically only need one time step of a (time, vertex) dataset
+at a time. ``TimeSlices`` gives read-only access to single time slices (or
+blocks of them) without loading the full dataset: contiguous HDF5 datasets are
+memory-mapped, chunked datasets are read chunk-wise through h5py. Datasets that
+are already loaded are accessed without copying.
+
+Runs in the 'events' write mode only record the users revised in each step,
+plus periodic keyframes. ``EventReplay`` reconstructs the snapshots from these
+on demand, and ``universe_dataset`` returns the appropriate reader for a
+universe, so that plots work independently of the write mode.
+
+If enabled, the model also records running summary statistics of the groups
+in the 'stats' group; ``model_stats`` returns these in the format of
+``grouped_stats.grouped_stats``, so that they can replace the reduction of the
+full opinion dataset.
+
+Runs with several replicas (``num_replicas``) write all datasets with an
+additional 'seed' dimension following the time dimension, labelled by the
+seeds of the replicas (see ``replica_seeds``); the time slice readers select a
+single replica of these, the summary statistics keep all replicas. Runs with
+convergence checks may stop early, once the opinions are frozen;
+``extend_frozen`` extends their time series to the full run.
+
+Runs with a write schedule other than 'fixed' only write a subset of the write
+times, which are stored in the 'write_times' dataset; ``universe_time`` returns
+these.
+
+The opinions may be stored as 16-bit fixed-point numbers, marked by a
+'scale_factor' attribute; all readers decode these to float32 transparently,
+and ``decode_mv_data`` decodes them in the multiverse data.
+"""
+import logging
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+## -----------------------------------------------------------------------------
+def _h5_dataset(container):
+    """Returns the HDF5 file name and dataset path of a proxied data container,
+    or None if the container data is not an unresolved HDF5 proxy"""
+    if not getattr(container, 'data_is_proxy', False):
+        return None
+    proxy = container.proxy
+    if not hasattr(proxy, '_fname') or not hasattr(proxy, '_name'):
+        return None
+
+    return proxy._fname, proxy._name
+
+## -----------------------------------------------------------------------------
+def _scale_factor(attrs):
+    """Returns the scale factor of a fixed-point dataset from its attributes,
+    or None if the dataset is not stored in fixed-point form"""
+    scale = attrs.get('scale_factor') if attrs is not None else None
+    if scale is None:
+        return None
+
+    return np.float32(np.asarray(scale).item())
+
+## -----------------------------------------------------------------------------
+def decode(container) -> np.ndarray:
+    """Returns the data of a container, decoding fixed-point opinions.
+
+    Arguments:
+        container: the data container (or array)
+
+    Returns:
+        data (ndarray): the (decoded) data
+    """
+    data = np.asarray(container)
+    scale = _scale_factor(getattr(container, 'attrs', None))
+    if scale is None:
+        return data
+
+    return data.astype(np.float32)*scale
+
+## -----------------------------------------------------------------------------
+def decode_mv_data(mv_data):
+    """Returns the multiverse data with the fixed-point opinion datasets
+    decoded to float32. Lazy (dask) data remains lazy.
+
+    Arguments:
+        mv_data (xr.Dataset): the multiverse data
+
+    Returns:
+        mv_data (xr.Dataset): the decoded multiverse data
+    """
+    for name, var in getattr(mv_data, 'data_vars', {}).items():
+        scale = _scale_factor(var.attrs)
+        if scale is not None:
+            decoded = var.astype(np.float32)*scale
+            decoded.attrs = {k: v for k, v in var.attrs.items()
+                             if k!='scale_factor'}
+            mv_data = mv_data.assign({name: decoded})
+
+    return mv_data
+
+## -----------------------------------------------------------------------------
+class TimeSlices:
+    """Read-only access to the time slices of a (time, vertex) dataset.
+
+    Indexing with an integer returns the (vertex,) slice at that time index,
+    indexing with a slice returns the corresponding (time, vertex) block. A
+    one-dimensional dataset is treated as a single time step. Of a (time, seed,
+    vertex) dataset, a single replica is accessed. Fixed-point opinions are
+    decoded to float32.
+    """
+    def __init__(self, container, replica: int=0):
+        """Sets up the access to the dataset.
+
+        Arguments:
+            container: the data container (or array) holding the dataset
+            replica (int, optional): the index of the replica to access, if
+                the dataset has a seed dimension
+        """
+        self._file = None
+        self._dset = None
+        self._data = None
+        self._replica = replica
+        self._scale = _scale_factor(getattr(container, 'attrs', None))
+
+        self._h5_dset = _h5_dataset(container)
+        if self._h5_dset is not None:
+            self._open()
+        else:
+            self._data = np.asarray(container)
+
+        if self._source.ndim==1:
+            self.shape = (1,)+tuple(self._source.shape)
+        elif self._source.ndim==3:
+            self.shape = (self._source.shape[0], self._source.shape[2])
+        else:
+            self.shape = tuple(self._source.shape)
+
+    def _open(self):
+        """Opens the HDF5 dataset, mapping it to memory if possible"""
+        import h5py
+        fname, name = self._h5_dset
+        self._file = h5py.File(fname, 'r')
+        dset = self._file[name]
+        self._scale = _scale_factor(dset.attrs)
+        offset = dset.id.get_offset()
+        #contiguous, uncompressed datasets can be mapped directly
+        if dset.chunks is None and offset is not None and dset.size:
+            self._data = np.memmap(fname, mode='r', dtype=dset.dtype,
+                                   shape=dset.shape, offset=offset)
+            log.debug(f"Memory-mapped dataset {name} of {fname}.")
+        else:
+            self._dset = dset
+
+    @property
+    def _source(self):
+        return self._data if self._data is not None else self._dset
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32) if self._scale else self._source.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx) -> np.ndarray:
+        """Returns a time slice (int index) or a block of time slices (slice)
+
+        Raises:
+            TypeError: if the index is neither an integer nor a slice
+        """
+        if not isinstance(idx, (int, np.integer, slice)):
+            raise TypeError(f"Invalid time index {idx}: must be an integer or "
+                            "a slice!")
+        data = self._read(idx)
+        if self._scale is None:
+            return data
+
+        return data.astype(np.float32)*self._scale
+
+    def _read(self, idx) -> np.ndarray:
+        """Reads a time slice or a block of time slices as stored"""
+        if self._source.ndim==1:
+            return np.asarray(self._source[()])[np.newaxis, :][idx]
+        if self._source.ndim==3:
+            return np.asarray(self._source[idx, self._replica])
+
+        return np.asarray(self._source[idx])
+
+    def __iter__(self):
+        for t in range(len(self)):
+            yield self[t]
+
+    def close(self):
+        """Closes the underlying HDF5 file, if any"""
+        self._data = None
+        self._dset = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reopen(self):
+        """Replaces the HDF5 file handle by a new one. To be called in forked
+        processes, which must not share the handle of their parent.
+        """
+        if self._h5_dset is None:
+            return
+        self.close()
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+## -----------------------------------------------------------------------------
+def time_coords(container) -> np.ndarray:
+    """Returns the time coordinates of a dataset. For unresolved HDF5 proxies,
+    the coordinates are determined from the dataset attributes, so that the
+    data itself does not need to be loaded.
+
+    Arguments:
+        container: the data container
+
+    Returns:
+        time (ndarray): the time coordinates
+    """
+    h5_dset = _h5_dataset(container)
+    if h5_dset is None:
+        return np.asarray(container.coords['time'].data)
+
+    attrs = container.attrs
+    mode = attrs.get('coords_mode__time', 'values')
+    coords = np.asarray(attrs.get('coords__time', []))
+    num_times = container.proxy.shape[0] if len(container.proxy.shape)>1 else 1
+    if mode=='start_and_step' and coords.size==2:
+        return coords[0]+coords[1]*np.arange(num_times)
+    elif mode=='range' and coords.size in [2, 3]:
+        return np.arange(*coords)[:num_times]
+    elif mode=='trivial':
+        return np.arange(num_times)
+    elif mode=='values' and coords.size==num_times:
+        return coords
+
+    return np.asarray(container.coords['time'].data)
+
+## -----------------------------------------------------------------------------
+def discriminator_indices(discriminators) -> tuple:
+    """Returns the vertex indices of the discriminators and the
+    non-discriminators.
+
+    Arguments:
+        discriminators (array, 1d or 2d): the discriminator flags of the
+            vertices. Since the flags are static, only the first time step of
+            a 2d array is considered.
+
+    Returns:
+        disc (ndarray): the indices of the discriminators
+        nondisc (ndarray): the indices of the non-discriminators
+    """
+    with TimeSlices(discriminators) as data:
+        disc = data[0]
+
+    return np.flatnonzero(disc!=0), np.flatnonzero(disc==0)
+
+## -----------------------------------------------------------------------------
+class EventReplay:
+    """Read-only access to the time slices of a dataset recorded in the 'events'
+    write mode. The snapshots are reconstructed on demand by replaying the
+    recorded events onto the latest keyframe. Sequential access is incremental:
+    only the events since the previously requested time are replayed.
+
+    Indexing behaves as for ``TimeSlices``.
+    """
+    def __init__(self, keyframes, keyframe_times, steps, vertices, values,
+                 times):
+        """Sets up the replay.
+
+        Arguments:
+            keyframes: the (keyframe, vertex) keyframe dataset
+            keyframe_times (array): the times of the keyframes
+            steps (array): the time step of each event, in ascending order
+            vertices (array): the vertex of each event
+            values (array): the value of the vertex after each event
+            times (array): the times at which snapshots can be requested
+        """
+        self._keyframes = TimeSlices(keyframes)
+        self._keyframe_times = np.asarray(keyframe_times)
+        self._steps = np.asarray(steps)
+        self._vertices = np.asarray(vertices, dtype=int)
+        self._values = decode(values)
+        self.time = np.asarray(times)
+        self.shape = (self.time.size, self._keyframes.shape[1])
+        self._state = None
+        self._state_time = None
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self):
+        return self._keyframes.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def snapshot(self, time) -> np.ndarray:
+        """Returns the values of all vertices at the given time.
+
+        Raises:
+            ValueError: if there is no keyframe at or before the given time
+        """
+        k = np.searchsorted(self._keyframe_times, time, side='right')-1
+        if k<0:
+            raise ValueError(f"No keyframe available at or before time {time}!")
+
+        #continue from the previous snapshot if no later keyframe exists
+        if (self._state is not None
+            and self._keyframe_times[k]<=self._state_time<=time):
+            state, start = self._state, self._state_time
+        else:
+            state, start = np.array(self._keyframes[k]), self._keyframe_times[k]
+
+        i_0 = np.searchsorted(self._steps, start, side='right')
+        i_1 = np.searchsorted(self._steps, time, side='right')
+        #only the last event of each vertex determines its value
+        vertices = self._vertices[i_0:i_1][::-1]
+        vertices, idx = np.unique(vertices, return_index=True)
+        state[vertices] = self._values[i_0:i_1][::-1][idx]
+        self._state, self._state_time = state, time
+
+        return state.copy()
+
+    def __getitem__(self, idx) -> np.ndarray:
+        """Returns a time slice (int index) or a block of time slices (slice)
+
+        Raises:
+            TypeError: if the index is neither an integer nor a slice
+        """
+        if isinstance(idx, (int, np.integer)):
+            return self.snapshot(self.time[idx])
+        elif isinstance(idx, slice):
+            return np.array([self.snapshot(t) for t in self.time[idx]],
+                            dtype=self.dtype).reshape(-1, self.shape[1])
+        raise TypeError(f"Invalid time index {idx}: must be an integer or a "
+                        "slice!")
+
+    def __iter__(self):
+        for t in range(len(self)):
+            yield self[t]
+
+    def close(self):
+        """Closes the keyframe dataset"""
+        self._keyframes.close()
+
+    def reopen(self):
+        """Replaces the file handle of the keyframe dataset by a new one, see
+        ``TimeSlices.reopen``"""
+        self._keyframes.reopen()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+## -----------------------------------------------------------------------------
+def records_events(uni) -> bool:
+    """Whether the universe was run in the 'events' write mode"""
+    return uni['cfg']['OpDisc'].get('write_mode', 'snapshots')=='events'
+
+## -----------------------------------------------------------------------------
+def universe_time(uni) -> np.ndarray:
+    """Returns the write times of the time series of a universe.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+
+    Returns:
+        time (ndarray): the write times
+    """
+    if not fixed_schedule(uni):
+        return np.asarray(uni['data/OpDisc/write_times'])
+    if uni['cfg']['OpDisc'].get('write_mode', 'snapshots')=='none':
+        return time_coords(uni['data/OpDisc/stats/group_size'])
+    if not records_events(uni):
+        return time_coords(uni['data/OpDisc/nw/opinion'])
+    cfg = uni['cfg']
+
+    return np.arange(cfg['write_start'], universe_end_time(uni)+1,
+                     cfg['write_every'])
+
+## -----------------------------------------------------------------------------
+def fixed_schedule(uni) -> bool:
+    """Whether the time series of a universe were written at every write time,
+    rather than at the times selected by a write schedule, which are stored in
+    the write_times dataset.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+
+    Returns:
+        fixed (bool): whether the write schedule is fixed
+    """
+    schedule = uni['cfg']['OpDisc'].get('write_schedule', {})
+
+    return schedule.get('mode', 'fixed')=='fixed'
+
+## -----------------------------------------------------------------------------
+def universe_end_time(uni) -> int:
+    """Returns the last time step of a universe: the time at which the opinions
+    of all replicas had converged, if the run was stopped early, or num_steps.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+
+    Returns:
+        end (int): the last time step
+    """
+    num_steps = uni['cfg']['num_steps']
+    try:
+        conv = np.asarray(uni['data/OpDisc/convergence_time'], dtype=float)
+    except KeyError:
+        return num_steps
+    if not conv.size or np.isnan(conv).any():
+        return num_steps
+
+    return min(int(np.amax(conv)), num_steps)
+
+## -----------------------------------------------------------------------------
+def replica_seeds(uni) -> np.ndarray:
+    """Returns the seeds of the replicas of a universe, which label the 'seed'
+    dimension of its datasets.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+
+    Returns:
+        seeds (ndarray): the seeds of the replicas, or None if the universe
+            has a single replica
+
+    Raises:
+        KeyError: if no dataset of the universe is labelled by the seeds
+    """
+    if uni['cfg']['OpDisc'].get('num_replicas', 1)<=1:
+        return None
+    for name in ['stats/global_mean', 'nw/opinion', 'convergence_time']:
+        try:
+            return np.asarray(uni['data/OpDisc/'+name].attrs['coords__seed'])
+        except KeyError:
+            continue
+
+    raise KeyError("No dataset of the universe is labelled by the seeds of "
+                   "its replicas!")
+
+## -----------------------------------------------------------------------------
+def extend_frozen(uni, data) -> np.ndarray:
+    """Extends a time series of a universe that was stopped early to all write
+    times of the configured run, repeating the frozen final state.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+        data (array): the time series, with time as the first axis
+
+    Returns:
+        data (ndarray): the extended time series; time series written on a
+            write schedule other than 'fixed' are returned unchanged, since
+            their write times depend on the run
+    """
+    cfg = uni['cfg']
+    data = np.asarray(data)
+    if not fixed_schedule(uni):
+        return data
+    num_times = len(range(cfg['write_start'], cfg['num_steps']+1,
+                          cfg['write_every']))
+    if not data.shape or len(data)>=num_times or not len(data):
+        return data
+
+    return np.concatenate([data, np.repeat(data[-1:], num_times-len(data),
+                                           axis=0)])
+
+## -----------------------------------------------------------------------------
+def universe_dataset(uni, name: str='opinion', replica: int=0):
+    """Returns time slice-wise access to the opinion or group label time series
+    of a universe, independently of the write mode of the run.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+        name (str, optional): the dataset, 'opinion' or 'group_label'
+        replica (int, optional): the replica, for runs with several replicas
+
+    Returns:
+        data (TimeSlices or EventReplay): the time slices
+    """
+    path = 'data/OpDisc/nw/'
+    ageing = uni['cfg']['OpDisc']['mode']=='ageing'
+    #group labels are only time-dependent in the ageing mode
+    if not records_events(uni) or (name=='group_label' and not ageing):
+        return TimeSlices(uni[path+name], replica=replica)
+
+    keyframes = uni[path+name+'_keyframes']
+    field = 'opinion' if name=='opinion' else 'group'
+
+    return EventReplay(keyframes, time_coords(keyframes),
+                       uni[path+'events/step'], uni[path+'events/vertex'],
+                       uni[path+'events/'+field], universe_time(uni))
+
+## -----------------------------------------------------------------------------
+def model_stats(uni, group_list, *, ageing: bool, num_bins: int=None,
+                val_range: tuple=(0., 1.), replica: int=None) -> dict:
+    """Returns the summary statistics recorded by the model, in the format of
+    ``grouped_stats.grouped_stats``, together with the 'time' coordinates and,
+    for the ageing mode, the maximum age 'max_group'. Of a universe with
+    several replicas, the statistics of all replicas are returned with a seed
+    axis following the time axis, unless a single replica is selected.
+
+    Arguments:
+        uni (UniverseGroup): the universe
+        group_list (list): list of groups (or age bin edges) to sort by
+        ageing (bool): whether the list of groups represents age intervals
+        num_bins (int, optional): number of bins for the histograms
+        val_range (tuple, optional): range for the histogram binning
+        replica (int, optional): the replica to select, for runs with several
+            replicas; by default, all replicas are returned
+
+    Returns:
+        stats (dict): the statistics, or None if the model did not record
+            statistics matching the requested groups and binning
+    """
+    try:
+        group_size = uni['data/OpDisc/stats/group_size']
+        hist = uni['data/OpDisc/stats/hist']
+    except KeyError:
+        return None
+
+    if ageing:
+        age_groups = np.asarray(group_size.attrs.get('age_groups', []))
+        if (age_groups.shape!=np.shape(group_list)
+            or not np.allclose(age_groups, group_list)):
+            return None
+        groups = np.arange(len(group_list)-1)
+    else:
+        groups = np.asarray(group_list, dtype=int)
+        if np.any(groups<0) or np.any(groups>=group_size.shape[-1]):
+            return None
+    if num_bins is not None and (tuple(val_range)!=(0., 1.)
+                                 or hist.attrs.get('num_bins')!=num_bins):
+        return None
+
+    def load(name: str, ndim: int, **kwargs) -> np.ndarray:
+        """Loads a statistic, selecting the replica if requested"""
+        data = np.asarray(uni['data/OpDisc/stats/'+name], **kwargs)
+        return data[:, replica] if data.ndim>ndim and replica is not None else data
+
+    counts = load('group_size', 2, dtype=float)[..., groups]
+    means = load('group_mean', 2)[..., groups]
+    stddevs = load('group_std', 2)[..., groups]
+    stats = {'counts': counts, 'sums': means*counts,
+             'sq_sums': (stddevs**2+means**2)*counts,
+             'time': time_coords(group_size)}
+    if num_bins is not None:
+        hist = load('hist', 2, dtype=float)
+        hist = hist.reshape(hist.shape[:-1]+(-1, num_bins))[..., groups, :]
+        stats['hist'] = np.swapaxes(hist, -1, -2)
+    if ageing:
+        stats['max_group'] = np.amax(load('max_group', 1))
+
+    log.debug("Using the summary statistics recorded by the model.")
+    return stats
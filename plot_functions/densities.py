@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 from utopya import DataManager, UniverseGroup
 from utopya.plotting import UniversePlotCreator, PlotHelper, is_plot_func
 
+from .data_io import universe_dataset, universe_time
 from .tools import setup_figure
 
 log = logging.getLogger(__name__)
@@ -37,10 +38,12 @@ def densities(dm: DataManager, *,
     hlpr.select_axis(0, 1)
 
     #datasets...................................................................
-    data = uni['data/OpDisc/nw/opinion']
-    time_steps = data['time'].size
+    with universe_dataset(uni, 'opinion') as opinions:
+        data = opinions[:]
+    time = universe_time(uni)
+    time_steps = time.size
 
     #data analysis and plotting................................................
-    hlpr.ax.plot(data[:, :], data['time'], **plot_kwargs)
+    hlpr.ax.plot(data[:, :], time, **plot_kwargs)
     hlpr.ax.set_xlim(val_range[0], val_range[1])
-    hlpr.ax.set_ylim(data['time'][-1], 0)
+    hlpr.ax.set_ylim(time[-1], 0)
@@ -1,12 +1,12 @@
 import logging
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
 
 from utopya import DataManager, UniverseGroup
 from utopya.plotting import UniversePlotCreator, PlotHelper, is_plot_func
 
-from .data_analysis import data_by_group, find_const_vals, find_extrema
+from .data_analysis import find_const_vals, find_extrema, universe_group_stats
+from .grouped_stats import means_stddevs
 from .tools import setup_figure
 
 # Get a logger
@@ -45,38 +45,25 @@ def group_avg(dm: DataManager, *,
 
     #get data ..................................................................
     ageing = True if uni['cfg']['OpDisc']['mode'] == 'ageing' else False
-    opinions = uni['data/OpDisc/nw/opinion']
-    if ageing:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'], dtype=int)
-    else:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'][0, :], dtype=int)
     num_groups = len(age_groups)-1 if ageing else uni['cfg']['OpDisc']['number_of_groups']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
-    time_steps = opinions['time'].size
-    time = np.asarray(opinions['time'].data)
+    stats = universe_group_stats(dm, uni, group_list, ageing=ageing)
+    time = stats['time']
+    time_steps = time.size
     hlpr.ax.set_xlim(0, 1)
     hlpr.ax.set_ylim(time[-1], time[0])
 
     #data analysis..............................................................
-    #calculate mean opinion and std of each group
-    means = np.zeros((time_steps, num_groups))
-    stddevs = np.zeros_like(means)
-    data_by_groups = data_by_group(opinions, groups, group_list, val_range, num_bins,
-                                   ageing=ageing)
-    for k in range(num_groups):
-        for t in range(time_steps):
-            if len(data_by_groups[k][t])==0:
-                #empty slices may occur if certain age groups are not present
-                #for a period of time
-                continue
-            means[t, k] = np.mean(data_by_groups[k][t])
-            stddevs[t, k] = np.std(data_by_groups[k][t])
+    #calculate mean opinion and std of each group. Empty groups may occur if
+    #certain age groups are not present for a period of time; their mean and std
+    #are set to 0. The statistics are cached in the universe directory.
+    means, stddevs = means_stddevs(stats)
 
     #plotting...................................................................
     #get pretty labels
     if ageing:
         labels = [f"Ages {group_list[_]}-{group_list[_+1]}" for _ in range(num_groups)]
-        max_age = np.amax(groups)
+        max_age = stats['max_group']
         if (age_groups[-1]>=max_age):
             labels[-1]=f"Ages {group_list[-2]}+"
     else:
@@ -7,6 +7,7 @@ import pandas as pd
 from utopya import DataManager
 from utopya.plotting import MultiversePlotCreator, PlotHelper, is_plot_func
 
+from .data_io import decode_mv_data
 from .tools import convert_to_label, data_by_group, R_p, R_p_factors, setup_figure
 
 log = logging.getLogger(__name__)
@@ -58,6 +59,7 @@ def group_avg_anim(dm: DataManager, *,
 
 
     #datasets...................................................................
+    mv_data = decode_mv_data(mv_data)
     #manually modify any subspace entries in the cfg
     cfg = dm['multiverse'].pspace.default
     #replace the mode if it is a subspace selection
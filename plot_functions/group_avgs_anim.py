@@ -2,12 +2,13 @@ import logging
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-import pandas as pd
 
 from utopya import DataManager
 from utopya.plotting import MultiversePlotCreator, PlotHelper, is_plot_func
 
-from .data_analysis import data_by_group
+from .data_analysis import chunk_mv_data, out_of_core
+from .data_io import decode_mv_data
+from .grouped_stats import grouped_stats, means_stddevs
 from .tools import convert_to_label, deduce_sweep_dimension, get_keys_cfg, R_p, setup_figure
 
 log = logging.getLogger(__name__)
@@ -16,11 +17,14 @@ logging.getLogger('matplotlib.animation').setLevel(logging.WARNING)
 # ------------------------------------------------------------------------------
 @is_plot_func(creator_type=MultiversePlotCreator, supports_animation=True,
               helper_defaults=dict(set_labels=dict(x="User opinion", y="Time")))
+@out_of_core
 def group_avgs_anim(dm: DataManager, *,
                    hlpr: PlotHelper,
                    mv_data,
                    dim: str=None,
                    age_groups: list=[10, 20, 40, 60, 80],
+                   memory_budget=None,
+                   metrics_store: bool=False,
                    num_bins: int=100,
                    title: str=None,
                    val_range: tuple=(0, 1),
@@ -35,6 +39,15 @@ def group_avgs_anim(dm: DataManager, *,
         dim (str, optional): the parameter dimension of the diagram. If no str
            is passed, an attempt will be made to automatically deduce the sweep
            dimension.
+        memory_budget (int or str, optional): if given, the multiverse data is
+           evaluated out-of-core in chunks fitting this memory budget (in bytes,
+           or as a string such as '4GB'). Requires dask.
+        metrics_store (bool, optional): whether to read the time series of the
+           group means and stddevs from the metrics store (see
+           ``metrics_store.py``) rather than from the data. The metrics of the
+           run are extracted into the store on first use. Only the coordinates
+           of the selected data are used then, so that any (small) field can
+           be selected instead of the opinions and group labels.
         num_bins (int, optional): binning size for the histogram
         title (str, optional): custom plot title
         val_range (tuple, optional): binning range for the histogram
@@ -45,44 +58,64 @@ def group_avgs_anim(dm: DataManager, *,
         ValueError: if the dimension is not present in the multiverse data
         ValueError: if the parameter space is greater than four
         ValueError: if the sweep parameter is 'seed' (to do)
+        ValueError: if the universes in the metrics store have different time
+            steps
     """
-    if dim is None:
-        dim = deduce_sweep_dimension(mv_data, key_to_ignore='')
+    #datasets...................................................................
+    #from the store, only the coordinates of the multiverse data are used
+    if metrics_store:
+        #the store needs pandas, which is only imported when it is used
+        from .metrics_store import grid_stats, index_run, store_grid, sweep_dim
+        df = index_run(dm, age_groups=age_groups)
+        coords, cfg = store_grid(dm, df, mv_data)
+        dim = sweep_dim(coords, dim)
     else:
-        if not dim in mv_data.dims:
-            raise ValueError(f"Dimension '{dim}' not available in multiverse data."
-                             f" Available: {mv_data.coords}")
-    if len(mv_data.dims)>3:
-        for key in mv_data.dims.keys():
-            if key not in ['vertex', 'time', dim] and mv_data.dims[key]>1:
-                raise ValueError(f"Too many dimensions! Use 'subspace' to "
-                           f"select specific values for keys other than {dim}!")
+        if dim is None:
+            dim = deduce_sweep_dimension(mv_data, key_to_ignore='')
+        else:
+            if not dim in mv_data.dims:
+                raise ValueError(f"Dimension '{dim}' not available in multiverse data."
+                                 f" Available: {mv_data.coords}")
+        if len(mv_data.dims)>3:
+            for key in mv_data.dims.keys():
+                if key not in ['vertex', 'time', dim] and mv_data.dims[key]>1:
+                    raise ValueError(f"Too many dimensions! Use 'subspace' to "
+                               f"select specific values for keys other than {dim}!")
+        mv_data = decode_mv_data(chunk_mv_data(mv_data, memory_budget=memory_budget))
+        keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
+                                 keys_to_ignore=[dim, 'time'])
+        coords = {dim: mv_data.coords[dim].data}
 
     if dim=='seed':
         raise ValueError("'seed' sweeps currently not supported.")
 
-
-    #datasets...................................................................
-    keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
-                             keys_to_ignore=[dim, 'time'])
     mode = cfg['OpDisc']['mode']
     ageing = True if mode=='ageing' else False
-    #get group labels
-    if ageing:
-        #group labels change over time
-        keys.update({dim: 0})
-        groups = np.asarray(mv_data['group_label'][keys], dtype=int)
-        keys.pop(dim)
+    if metrics_store:
+        times = {tuple(t) for t in df['time']}
+        if len(times)>1:
+            raise ValueError("The universes in the metrics store have "
+                             f"{len(times)} different sets of time steps!")
+        time = np.asarray(df['time'].iloc[0])
+        max_age = np.nanmax(df['max_group'])
     else:
-        #group labels do not change over time
-        keys.update({'time':0, dim: 0})
-        groups = np.asarray(mv_data['group_label'][keys], dtype=int)
-        [keys.pop(ele) for ele in ['time', dim]]
+        #get group labels
+        if ageing:
+            #group labels change over time
+            keys.update({dim: 0})
+            groups = np.asarray(mv_data['group_label'][keys], dtype=int)
+            keys.pop(dim)
+        else:
+            #group labels do not change over time
+            keys.update({'time':0, dim: 0})
+            groups = np.asarray(mv_data['group_label'][keys], dtype=int)
+            [keys.pop(ele) for ele in ['time', dim]]
+        time = mv_data['time'].data
+        max_age = np.amax(groups)
     num_groups = len(age_groups)-1 if ageing else cfg['OpDisc']['number_of_groups']
     num_vertices = cfg['OpDisc']['nw']['num_vertices']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
-    time_steps = mv_data['time'].size
-    time = mv_data['time'].data
+    time_steps = time.size
 
     #figure layout .............................................................
     figure, axs = setup_figure(cfg, plot_name='group_avgs_anim', title=title, dim1=dim)
@@ -90,25 +123,24 @@ def group_avgs_anim(dm: DataManager, *,
     hlpr.select_axis(0, 1)
 
     #data analysis .............................................................
-    #get mean opinion and std of each group using tools.data_by_group
-    means = np.zeros((len(mv_data.coords[dim]), time_steps, num_groups))
-    stddevs = np.zeros_like(means)
-    for param in range(len(mv_data.coords[dim])):
-        keys[dim] = param
-        data = np.asarray(mv_data[keys]['opinion'])
-        data_by_groups = data_by_group(data, groups, group_list, val_range,
-                                        num_bins, ageing=ageing)
-        for k in range(num_groups):
-            for t in range(time_steps):
-                means[param, t, k]=np.mean(data_by_groups[k][t])
-                stddevs[param, t, k]=np.std(data_by_groups[k][t])
+    #get mean opinion and std of each group using grouped_stats
+    if metrics_store:
+        means = grid_stats(df, df['means'], coords, dims=[dim])[0]
+        stddevs = grid_stats(df, df['stddevs'], coords, dims=[dim])[0]
+    else:
+        means = np.zeros((len(coords[dim]), time_steps, num_groups))
+        stddevs = np.zeros_like(means)
+        for param in range(len(coords[dim])):
+            keys[dim] = param
+            data = mv_data[keys]['opinion']
+            means[param], stddevs[param] = means_stddevs(grouped_stats(data, groups,
+                                                         group_list, ageing=ageing))
     log.info("Finished data analysis.")
 
     #plotting...................................................................
     #get pretty labels
     if ageing:
         labels = [f"Ages {group_list[_]}-{group_list[_+1]}" for _ in range(num_groups)]
-        max_age = np.amax(groups)
         if (age_groups[-1]>=max_age):
             labels[-1]=f"Ages {group_list[-2]}+"
     else:
@@ -116,12 +148,12 @@ def group_avgs_anim(dm: DataManager, *,
 
     #calculate R_p factor (for p_hom sweeps)
     if mode not in ['ageing', 'conflict_dir', 'conflict_undir']:
-        R_p_fs = R_p(mv_data.coords[dim], num_groups, mode)
+        R_p_fs = R_p(coords[dim], num_groups, mode)
 
     #animate
     def update_data(stepsize: int=1):
-        log.info(f"Plotting animation with {len(mv_data.coords[dim])} frames ...")
-        for param in range(len(mv_data.coords[dim])):
+        log.info(f"Plotting animation with {len(coords[dim])} frames ...")
+        for param in range(len(coords[dim])):
             hlpr.ax.clear()
             hlpr.ax.set_xlim(0, 1)
             hlpr.ax.set_ylim(time[-1], 0)
@@ -129,11 +161,11 @@ def group_avgs_anim(dm: DataManager, *,
             hlpr.ax.set_ylabel(hlpr.axis_cfg['set_labels']['y'])
             if dim=='homophily_parameter':
                 if mode not in ['ageing', 'conflict_dir', 'conflict_undir']:
-                    sw_text = (f"$R_p=${R_p_fs[param]:.3f} ({convert_to_label(dim)} = {mv_data[dim][param].data})")
+                    sw_text = (f"$R_p=${R_p_fs[param]:.3f} ({convert_to_label(dim)} = {coords[dim][param]})")
                 else:
-                    sw_text = f"{convert_to_label(dim)} = {mv_data[dim][param].data}"
+                    sw_text = f"{convert_to_label(dim)} = {coords[dim][param]}"
             else:
-                sw_text = f"{convert_to_label(dim)}={mv_data[dim][param].data}"
+                sw_text = f"{convert_to_label(dim)}={coords[dim][param]}"
             sweep_text = hlpr.ax.text(0, 1.02, sw_text, fontsize='x-small',
                                                     transform=hlpr.ax.transAxes)
             for i in range(num_groups):
@@ -150,11 +182,12 @@ def group_avgs_anim(dm: DataManager, *,
     #This is for the purpose of my thesis only and will be removed upon
     #completion.
     if write and dim=='homophily_parameter':
-        widths = np.zeros((time_steps, len(mv_data.coords[dim])))
+        widths = np.zeros((time_steps, len(coords[dim])))
         w_0 = np.min(means[:, -1, -1]-means[:, -1, 0])
         w_max = np.max(means[-1, :, -1]-means[-1, :, 0])
-        for param in range(len(mv_data.coords[dim])):
+        for param in range(len(coords[dim])):
             widths[:, param] = (means[param, :, -1]-means[param, :, 0]-w_0)/(w_max-w_0)
+        import pandas as pd
         df = pd.DataFrame(widths, time, R_p_fs)
         df.to_csv(hlpr.out_path.replace('group_avgs_anim.mp4', f'widths_{mode}.csv'))
         log.info("Finished writing files")
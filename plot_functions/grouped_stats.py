@@ -0,0 +1,201 @@
+"""Vectorized per-group statistics for the OpDisc plots."""
+import logging
+import numpy as np
+from typing import Tuple
+
+log = logging.getLogger(__name__)
+
+#the maximum number of (time, vertex) entries reduced at once
+MAX_BLOCK_SIZE = 2**22
+
+## -----------------------------------------------------------------------------
+def to_time_series(dataset, *, time_step: int=None) -> np.ndarray:
+    """Returns the opinion dataset as a two-dimensional (time, vertex) array.
+
+    Arguments:
+        dataset (array, 1d or 2d): the opinion dataset
+        time_step (int, optional): if the dataset is 2d, only the opinions at
+            this time step are returned
+
+    Returns:
+        data (ndarray, 2d): the opinions. For a single time step, the time
+            dimension has length 1.
+    """
+    data = np.asarray(dataset, dtype=float)
+    #if a specific time step is considered (eg. the last one) only the opinion
+    #value at that time step are relevant
+    if data.ndim==2 and time_step is not None:
+        data = data[[time_step], :]
+    #for certain runs, only a single time step will have been written (typically
+    #the last one. In these cases, the data array is transformed into a 2d array
+    #with one 'artifical' time step.
+    elif data.ndim==1:
+        data = data[np.newaxis, :]
+
+    return data
+
+## -----------------------------------------------------------------------------
+def group_indices(groups, group_list, *, ageing: bool,
+                  time_step: int=None) -> np.ndarray:
+    """Returns the index of the group in the group list each user belongs to.
+
+    If the group labels represent ages, the group list holds the age bin edges.
+    The bins are closed on the right, and the lowest edge is included in the
+    first bin (as with ``pd.cut(..., include_lowest=True)``). Otherwise the
+    group labels are matched to the entries of the group list. Users that do not
+    belong to any group are assigned the index -1.
+
+    Arguments:
+        groups (array, 1d or 2d): the group labels of the users
+        group_list (list): list of groups (or age bin edges) to sort by
+        ageing (bool): whether the list of groups represents age intervals
+        time_step (int, optional): if the group labels are time-dependent, only
+            the labels at this time step are considered
+
+    Returns:
+        idx (ndarray, 2d): the (time, vertex) array of group indices. For
+            time-independent group labels, the time dimension has length 1.
+
+    Raises:
+        ValueError: if the dimension of the group labels is greater than two
+    """
+    groups = np.asarray(groups)
+    if groups.ndim>2:
+        raise ValueError(f"Invalid array dimension {groups.ndim}! Group label"
+              " array must have dimension<3.")
+
+    if groups.ndim==1:
+        groups = groups[np.newaxis, :]
+    #time-dependent labels: select the given time step
+    elif ageing and time_step is not None:
+        groups = groups[[time_step], :]
+    #constant labels: the first time step holds all the information
+    elif not ageing:
+        groups = groups[:1, :]
+
+    bins = np.asarray(group_list)
+    if ageing:
+        idx = np.digitize(groups, bins, right=True)-1
+        idx[groups==bins[0]] = 0
+        idx[idx>=len(bins)-1] = -1
+    else:
+        idx = np.clip(np.searchsorted(bins, groups), 0, len(bins)-1)
+        idx[bins[idx]!=groups] = -1
+
+    return idx
+
+## -----------------------------------------------------------------------------
+def bin_indices(data, num_bins: int, val_range: tuple) -> np.ndarray:
+    """Returns the histogram bin of each value, using the same binning as
+    ``np.histogram`` with equally sized bins. Values outside the range are
+    assigned the index -1.
+
+    Arguments:
+        data (ndarray): the values to bin
+        num_bins (int): the number of bins
+        val_range (tuple): the range of the histogram
+
+    Returns:
+        idx (ndarray): the bin indices, with the same shape as the data
+    """
+    start, stop = val_range
+    edges = np.linspace(start, stop, num_bins+1)
+    with np.errstate(invalid='ignore'):
+        keep = (data>=start) & (data<=stop)
+    idx = np.zeros(data.shape, dtype=int)
+    idx[keep] = ((data[keep]-start)*(num_bins/(stop-start))).astype(int)
+    idx[idx==num_bins] -= 1
+    #correct for rounding errors at the bin edges
+    idx[keep & (data<edges[idx])] -= 1
+    idx[keep & (data>=edges[idx+1]) & (idx!=num_bins-1)] += 1
+    idx[~keep] = -1
+
+    return idx
+
+## -----------------------------------------------------------------------------
+def grouped_stats(dataset, groups, group_list, *, ageing: bool,
+                  time_step: int=None, num_bins: int=None,
+                  val_range: tuple=(0., 1.)) -> dict:
+    """Calculates the size, the sum and the sum of squares of the opinions of
+    each group at each time step and, optionally, a histogram of each group's
+    opinion distribution. All statistics are obtained from a single
+    ``np.bincount`` pass over a combined (time, group, bin) index.
+
+    Arguments:
+        dataset (array, 1d or 2d): the opinion dataset
+        groups (array, 1d or 2d): the group labels of the users
+        group_list (list): list of groups (or age bin edges) to sort by
+        ageing (bool): whether the list of groups represents age intervals
+        time_step (int, optional): only consider this time step
+        num_bins (int, optional): number of bins for the histograms. If None,
+            no histograms are calculated.
+        val_range (tuple, optional): range for the histogram binning
+
+    Returns:
+        stats (dict): the (time, group) arrays 'counts', 'sums', and 'sq_sums'
+            and, if num_bins is given, the (time, bin, group) array 'hist'
+    """
+    #full time series are read block by block, so that lazily loaded datasets
+    #are never held in memory at once
+    if np.ndim(dataset)==2 and time_step is None:
+        time_steps, num_vertices = np.shape(dataset)
+        read_block = lambda t_0, t_1: to_time_series(dataset[t_0:t_1])
+    else:
+        data = to_time_series(dataset, time_step=time_step)
+        time_steps, num_vertices = data.shape
+        read_block = lambda t_0, t_1: data[t_0:t_1]
+    num_groups = len(group_list)-1 if ageing else len(group_list)
+    idx = group_indices(groups, group_list, ageing=ageing, time_step=time_step)
+    idx = idx[:time_steps]
+
+    num_cells = num_groups*(num_bins if num_bins else 1)
+    counts = np.zeros(time_steps*num_cells)
+    sums = np.zeros(time_steps*num_cells)
+    sq_sums = np.zeros(time_steps*num_cells)
+
+    #reduce blocks of time steps to bound the size of the temporary arrays
+    block = max(1, MAX_BLOCK_SIZE // max(num_vertices, 1))
+    for t_0 in range(0, time_steps, block):
+        vals = read_block(t_0, t_0+block)
+        g = np.broadcast_to(idx if idx.shape[0]==1 else idx[t_0:t_0+block],
+                            vals.shape)
+        cell = g
+        keep = g>=0
+        if num_bins:
+            b = bin_indices(vals, num_bins, val_range)
+            cell = g*num_bins+b
+            keep = keep & (b>=0)
+        cell = cell+num_cells*np.arange(t_0, t_0+vals.shape[0])[:, np.newaxis]
+        cell, vals = cell[keep], vals[keep]
+        counts += np.bincount(cell, minlength=counts.size)
+        sums += np.bincount(cell, weights=vals, minlength=sums.size)
+        sq_sums += np.bincount(cell, weights=vals**2, minlength=sq_sums.size)
+
+    shape = (time_steps, num_groups, num_bins) if num_bins else (time_steps, num_groups)
+    counts, sums, sq_sums = [a.reshape(shape) for a in (counts, sums, sq_sums)]
+    if not num_bins:
+        return {'counts': counts, 'sums': sums, 'sq_sums': sq_sums}
+
+    return {'counts': counts.sum(axis=2), 'sums': sums.sum(axis=2),
+            'sq_sums': sq_sums.sum(axis=2), 'hist': counts.transpose(0, 2, 1)}
+
+## -----------------------------------------------------------------------------
+def means_stddevs(stats: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the mean and standard deviation of each group at each time step
+    from the output of ``grouped_stats``. Empty groups have mean and standard
+    deviation 0.
+
+    Arguments:
+        stats (dict): the grouped statistics
+
+    Returns:
+        means (ndarray, 2d): the (time, group) group means
+        stddevs (ndarray, 2d): the (time, group) group standard deviations
+    """
+    counts = stats['counts']
+    n = np.maximum(counts, 1)
+    means = np.where(counts>0, stats['sums']/n, 0.)
+    stddevs = np.where(counts>0,
+                       np.sqrt(np.maximum(stats['sq_sums']/n-means**2, 0.)), 0.)
+
+    return means, stddevs
@@ -0,0 +1,555 @@
+"""Incremental evaluation of multiverse runs while they are running.
+
+The output directory of a run is watched for universes that have finished.
+The metrics of each newly finished universe are extracted once (see
+``metrics_store.universe_metrics``) and appended to the run's file in the
+metrics store, so that finished universes are never reloaded: neither in later
+rounds, nor by the sweep plots with the ``metrics_store`` key once the run is
+complete. After each round with new universes, previews of the ``sweep1d``,
+``sweep2d`` and ``bifurcation`` plots of the plots configuration are rendered
+from the metrics into ``<run_dir>/eval/live``, marking the points of the
+parameter grid whose universes have not finished yet.
+
+A universe is considered finished once the model has marked its data as
+complete (with the 'end_time' attribute of the model group, written at the
+last write time) and the data file has not been modified for a settling time.
+Universes of runs of earlier model versions, which do not write the marker,
+are never considered finished.
+"""
+import copy
+import logging
+import os
+import posixpath
+import re
+import time
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import xarray as xr
+from types import SimpleNamespace
+from typing import Tuple
+
+from matplotlib.patches import Patch, Rectangle
+
+from .data_analysis import _coord_index
+from .metrics_store import (AGE_GROUPS, METRICS, SCALARS, _cfg_entry, _dim_path,
+                            _dim_paths, _num_rows, grid_coords, grid_stats,
+                            read_run, select_subspace, store_path, sweep_dim,
+                            universe_key, universe_rows, write_run)
+from .tools import (group_labels, plot_extrema, plot_heatmap, plot_sweep1d,
+                    setup_figure)
+
+log = logging.getLogger(__name__)
+
+#the plot functions of which previews are rendered
+PLOT_FUNCS = ('sweep1d', 'sweep2d', 'bifurcation')
+
+#the output directory of the previews, relative to the run directory
+LIVE_DIR = os.path.join('eval', 'live')
+
+## -----------------------------------------------------------------------------
+class FileUniverse(dict):
+    """A universe read directly from its output directory, for use with the
+    universe accessors of ``data_io`` and ``data_analysis``. The configuration
+    is available as 'cfg'; the datasets of the data file are loaded on first
+    access as labelled arrays, e.g. ``uni['data/OpDisc/stats/group_mean']``.
+    """
+    def __init__(self, directory: str):
+        """Reads the configuration of a universe.
+
+        Arguments:
+            directory (str): the output directory of the universe
+        """
+        super().__init__()
+        from ruamel.yaml import YAML
+
+        self.directory = directory
+        self.name = os.path.basename(os.path.normpath(directory))[len('uni'):]
+        with open(os.path.join(directory, 'config.yml')) as file:
+            self['cfg'] = YAML(typ='safe').load(file)
+
+    def __missing__(self, key: str):
+        """Loads a dataset from the data file
+
+        Raises:
+            KeyError: if there is no such dataset
+        """
+        if not key.startswith('data/'):
+            raise KeyError(key)
+        import h5py
+
+        with h5py.File(os.path.join(self.directory, 'data.h5'), 'r') as file:
+            dset = file.get(key[len('data/'):])
+            if not isinstance(dset, h5py.Dataset):
+                raise KeyError(key)
+            self[key] = _load_dataset(dset)
+
+        return self[key]
+
+## -----------------------------------------------------------------------------
+def _attr(val):
+    """Returns an HDF5 attribute with its strings decoded"""
+    if isinstance(val, bytes):
+        return val.decode()
+    if isinstance(val, np.ndarray) and val.dtype.kind in 'OS':
+        return np.array([v.decode() if isinstance(v, bytes) else v
+                         for v in val.ravel()]).reshape(val.shape)
+
+    return val
+
+## -----------------------------------------------------------------------------
+def _load_dataset(dset) -> xr.DataArray:
+    """Loads an HDF5 dataset, labelled with the dimension names and coordinates
+    given by its attributes (see ``data_io.time_coords``)"""
+    attrs = {key: _attr(val) for key, val in dset.attrs.items()}
+    data = np.asarray(dset)
+    dims = [str(attrs.get(f'dim_name__{i}', f'dim_{i}')) for i in range(data.ndim)]
+    coords = {}
+    for dim, size in zip(dims, data.shape):
+        mode = attrs.get(f'coords_mode__{dim}')
+        vals = attrs.get(f'coords__{dim}')
+        if mode=='values':
+            coords[dim] = np.asarray(vals)[:size]
+        elif mode=='start_and_step':
+            coords[dim] = vals[0]+vals[1]*np.arange(size)
+        elif mode=='range':
+            coords[dim] = np.arange(*vals)[:size]
+        elif mode=='trivial':
+            coords[dim] = np.arange(size)
+        elif mode=='linked':
+            #the path of the linked dataset is relative to the dataset's group
+            target = posixpath.normpath(posixpath.join(dset.parent.name, str(vals)))
+            coords[dim] = np.asarray(dset.file[target])[:size]
+
+    return xr.DataArray(data, dims=dims, coords=coords, attrs=attrs)
+
+## -----------------------------------------------------------------------------
+def universe_dirs(run_dir: str) -> dict:
+    """Returns the output directories of the universes of a run, keyed by the
+    universe names"""
+    data_dir = os.path.join(run_dir, 'data')
+    if not os.path.isdir(data_dir):
+        return {}
+
+    return {d[len('uni'):]: os.path.join(data_dir, d)
+            for d in sorted(os.listdir(data_dir)) if re.fullmatch(r'uni\d+', d)}
+
+## -----------------------------------------------------------------------------
+def universe_finished(directory: str, *, settle: float=10.) -> bool:
+    """Returns whether a universe has finished writing its data, i.e. whether
+    the model has marked its data as complete with the 'end_time' attribute
+    of the model group, which is written at the last write time.
+
+    Arguments:
+        directory (str): the output directory of the universe
+        settle (float, optional): the time (in seconds) for which the data
+            file must not have been modified, so that it is flushed
+
+    Returns:
+        finished (bool): whether the universe has finished
+    """
+    import h5py
+
+    path = os.path.join(directory, 'data.h5')
+    if (not os.path.exists(path)
+        or not os.path.exists(os.path.join(directory, 'config.yml'))):
+        return False
+    if time.time()-os.path.getmtime(path)<settle:
+        return False
+    try:
+        with h5py.File(path, 'r') as file:
+            return 'OpDisc' in file and 'end_time' in file['OpDisc'].attrs
+    except OSError:
+        #the file is locked while the universe is writing to it
+        return False
+
+## -----------------------------------------------------------------------------
+def last_modified(run_dir: str) -> float:
+    """Returns the time of the last modification of the output of the
+    universes of a run, or 0 if there is none"""
+    paths = [p for d in universe_dirs(run_dir).values()
+             for p in (d, os.path.join(d, 'data.h5')) if os.path.exists(p)]
+
+    return max(map(os.path.getmtime, paths), default=0.)
+
+## -----------------------------------------------------------------------------
+def load_pspace(run_dir: str):
+    """Returns the parameter space of a run from its meta configuration, or
+    None if it cannot be loaded (e.g. if utopya is not installed)"""
+    try:
+        from utopya.yaml import load_yml
+        return load_yml(os.path.join(run_dir, 'config', 'meta_cfg.yml'))['parameter_space']
+    except (ImportError, OSError, KeyError) as err:
+        log.warning(f"Could not load the parameter space of run {run_dir} "
+                    f"({err}); the grid is deduced from the finished universes.")
+
+    return None
+
+## -----------------------------------------------------------------------------
+def _stored_rows(run_dir: str, *, paths: dict, **analysis) -> pd.DataFrame:
+    """Returns the stored metrics of the universes of a run that are still
+    valid, i.e. that were stored with the current universe configurations,
+    parameters and analysis parameters"""
+    df = read_run(store_path(run_dir))
+    if df is None or not set(paths).union(METRICS).issubset(df.columns):
+        return pd.DataFrame()
+
+    dirs = universe_dirs(run_dir)
+    unis = {name: FileUniverse(dirs[name]) for name in set(df['uni']) if name in dirs}
+    counts = df['uni'].value_counts()
+    valid = [name in unis and key==universe_key(unis[name], **analysis)
+             and counts[name]==_num_rows(unis[name])
+             for name, key in zip(df['uni'], df['key'])]
+
+    return df[valid].reset_index(drop=True)
+
+## -----------------------------------------------------------------------------
+def reduce_universes(run_dir: str, df: pd.DataFrame=None, *, paths: dict,
+                     failed: set=None, settle: float=10.,
+                     age_groups: list=AGE_GROUPS, window: int=10,
+                     avg_window: int=20) -> Tuple[pd.DataFrame, int]:
+    """Extracts the metrics of the universes of a run that have finished since
+    the last call, and appends them to the run's file in the metrics store.
+
+    Arguments:
+        run_dir (str): the run directory
+        df (DataFrame, optional): the metrics extracted so far. If None, they
+            are read from the store.
+        paths (dict): the configuration paths of the stored parameters
+        failed (set, optional): the names of the universes whose metrics
+            could not be extracted. These are skipped; newly failed universes
+            are added to the set.
+        settle (float, optional): the settling time of the universes, see
+            ``universe_finished``
+        age_groups (list, optional): the age intervals of the ageing mode
+        window (int, optional): the smoothing window of the areas
+        avg_window (int, optional): the smoothing window of 'num_extrema'
+
+    Returns:
+        df (DataFrame): the metrics of all finished universes
+        num_new (int): the number of newly extracted universes
+    """
+    analysis = dict(age_groups=age_groups, window=window, avg_window=avg_window)
+    if df is None:
+        df = _stored_rows(run_dir, paths=paths, **analysis)
+    run = os.path.basename(os.path.normpath(run_dir))
+    dm = SimpleNamespace(dirs={'data': os.path.join(run_dir, 'data')})
+    done = set(df['uni']) if len(df) else set()
+    failed = failed if failed is not None else set()
+
+    rows, num_new = [], 0
+    for name, directory in universe_dirs(run_dir).items():
+        if (name in done or name in failed
+            or not universe_finished(directory, settle=settle)):
+            continue
+        try:
+            rows += universe_rows(dm, name, FileUniverse(directory), run=run,
+                                  paths=paths, **analysis)
+            num_new += 1
+        except (KeyError, OSError, ValueError) as err:
+            failed.add(name)
+            log.warning(f"Could not extract the metrics of universe {name}: "
+                        f"{err}; skipping it.")
+    if not rows:
+        return df, 0
+
+    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+    write_run(store_path(run_dir), df)
+    log.info(f"Extracted the metrics of {num_new} universes, "
+             f"{df['uni'].nunique()} in total.")
+
+    return df, num_new
+
+## -----------------------------------------------------------------------------
+def resolve_plot_cfg(name: str, plots_cfg: dict, base_cfg: dict) -> dict:
+    """Returns a plot configuration with its 'based_on' entries resolved. The
+    entries are looked up in the base configuration, then in the plots
+    configuration; later entries and the plot's own keys take precedence.
+
+    Raises:
+        KeyError: if a 'based_on' entry does not exist
+    """
+    def update(d: dict, u: dict) -> dict:
+        for key, val in u.items():
+            if isinstance(val, dict) and isinstance(d.get(key), dict):
+                update(d[key], val)
+            else:
+                d[key] = copy.deepcopy(val)
+        return d
+
+    cfg = copy.deepcopy(plots_cfg[name])
+    based_on = cfg.pop('based_on', [])
+    resolved = {}
+    for base in [based_on] if isinstance(based_on, str) else based_on:
+        if base in base_cfg:
+            update(resolved, resolve_plot_cfg(base, base_cfg, base_cfg))
+        elif base in plots_cfg and base!=name:
+            update(resolved, resolve_plot_cfg(base, plots_cfg, base_cfg))
+        else:
+            raise KeyError(f"No plot configuration '{base}' to base plot "
+                           f"'{name}' on!")
+
+    return update(resolved, cfg)
+
+## -----------------------------------------------------------------------------
+def live_plots(plots_cfg: dict, base_cfg: dict, *, names: list=None) -> dict:
+    """Returns the resolved configurations of the plots of which previews can
+    be rendered, i.e. the enabled plots of the PLOT_FUNCS.
+
+    Arguments:
+        plots_cfg (dict): the plots configuration
+        base_cfg (dict): the base plots configuration
+        names (list, optional): the plots to select; by default, all
+
+    Returns:
+        plots (dict): the plot configurations, keyed by the plot names
+    """
+    plots = {}
+    for name in (names if names is not None else plots_cfg):
+        if name.startswith('.'):
+            continue
+        cfg = resolve_plot_cfg(name, plots_cfg, base_cfg)
+        if cfg.get('plot_func') in PLOT_FUNCS and cfg.get('enabled', True):
+            plots[name] = cfg
+        elif names is not None:
+            log.warning(f"Plot '{name}' is not one of {PLOT_FUNCS}; skipping.")
+
+    return plots
+
+## -----------------------------------------------------------------------------
+def _mark_pending(ax, x, counts):
+    """Marks the pending points of a one-dimensional grid on the x axis"""
+    pending = counts==0
+    if pending.any():
+        ax.plot(np.asarray(x)[pending], np.zeros(pending.sum()), lw=0, marker='x',
+                color='grey', clip_on=False, transform=ax.get_xaxis_transform(),
+                label='pending')
+
+## -----------------------------------------------------------------------------
+def _plot_sweep1d(ax, df: pd.DataFrame, coords: dict, *, cfg: dict,
+                  age_groups: list):
+    """Plots the preview of a ``sweep1d`` plot
+
+    Raises:
+        ValueError: if 'to_plot' cannot be plotted from the metrics
+    """
+    to_plot = cfg['to_plot']
+    dim = sweep_dim(coords, cfg.get('dim'))
+    x = coords[dim]
+    labels = None
+
+    if to_plot in ['absolute_area', 'area']:
+        mean, std, counts = grid_stats(df, df[to_plot], coords, dims=[dim])
+
+    elif to_plot == 'area_diff':
+        mean, _, counts = grid_stats(df, df['area_diff'], coords, dims=[dim])
+        std = None
+
+    elif to_plot == 'means' or to_plot == 'stddevs':
+        vals = ([np.abs(np.asarray(m)-0.5) for m in df['final_means']]
+                if to_plot=='means' else df['final_stddevs'])
+        mean, std, counts = grid_stats(df, vals, coords, dims=[dim])
+        mean, std = mean.T, std.T
+        if cfg.get('plot_by_groups', True):
+            ageing = df['mode'].iloc[0]=='ageing'
+            labels = group_labels(age_groups, len(mean), ageing=ageing,
+                                  max_age=(np.nanmax(df['max_group'])
+                                           if ageing else None))
+
+    else:
+        raise ValueError(f"Cannot preview the statistical variable {to_plot}!")
+
+    _mark_pending(ax, x, counts)
+    plot_sweep1d(ax, x, mean, std, dim=dim, to_plot=to_plot, labels=labels,
+                 plot_kwargs=cfg.get('plot_kwargs', {}))
+
+## -----------------------------------------------------------------------------
+def _plot_sweep2d(ax, df: pd.DataFrame, coords: dict, *, cfg: dict):
+    """Plots the preview of a ``sweep2d`` heatmap, hatching the pending cells
+
+    Raises:
+        ValueError: if 'to_plot' is not a scalar metric
+    """
+    to_plot, x, y = cfg['to_plot'], cfg['x'], cfg['y']
+    if to_plot not in SCALARS:
+        raise ValueError(f"Cannot preview the statistical variable {to_plot}!")
+    for dim in [x, y]:
+        sweep_dim(coords, dim)
+
+    mean, _, counts = grid_stats(df, df[to_plot], coords, dims=[y, x])
+    plot_heatmap(ax, mean, x=x, y=y, x_coords=coords[x], y_coords=coords[y],
+                 to_plot=to_plot, plot_kwargs=cfg.get('plot_kwargs', {}))
+    for i, j in zip(*np.nonzero(counts==0)):
+        ax.add_patch(Rectangle((j, i), 1, 1, fill=False, hatch='//', lw=0,
+                               edgecolor='grey'))
+    if (counts==0).any():
+        ax.legend(handles=[Patch(fill=False, hatch='//', edgecolor='grey',
+                                 label='pending')],
+                  bbox_to_anchor=(1, 1.01), loc='lower right', fontsize='xx-small')
+
+## -----------------------------------------------------------------------------
+def _plot_bifurcation(ax, df: pd.DataFrame, coords: dict, *, cfg: dict):
+    """Plots the preview of a ``bifurcation`` plot"""
+    dim = sweep_dim(coords, cfg.get('dim'))
+
+    counts = grid_stats(df, np.zeros(len(df)), coords, dims=[dim])[2]
+    on_grid = np.ones(len(df), dtype=bool)
+    for param, c in coords.items():
+        on_grid &= np.array([val is not None and _coord_index(c, val) is not None
+                             for val in df[param]], dtype=bool)
+
+    _mark_pending(ax, coords[dim], counts)
+    plot_extrema(ax, list(zip(df[dim][on_grid], df['maxima'][on_grid])),
+                 dim=dim, plot_kwargs=cfg.get('plot_kwargs', {}))
+
+## -----------------------------------------------------------------------------
+def render(df: pd.DataFrame, coords: dict, plot_cfg: dict, *, model_cfg: dict,
+           out_path: str, num_universes: int=None, age_groups: list=AGE_GROUPS):
+    """Renders the preview of a sweep plot from the metrics of the finished
+    universes. Nothing is rendered if no finished universe lies on the grid.
+
+    Arguments:
+        df (DataFrame): the metrics of the finished universes
+        coords (dict): the coordinates of the parameter grid
+        plot_cfg (dict): the resolved plot configuration
+        model_cfg (dict): the default model configuration of the run
+        out_path (str): the output file
+        num_universes (int, optional): the total number of universes
+        age_groups (list, optional): the age intervals of the ageing mode
+
+    Raises:
+        ValueError: if the plot cannot be previewed
+    """
+    coords, model_cfg = select_subspace(coords, model_cfg,
+                                  plot_cfg.get('select', {}).get('subspace', {}))
+    func = plot_cfg['plot_func']
+    if func=='sweep2d':
+        dims = [plot_cfg['x'], plot_cfg['y']]
+    else:
+        dims = [sweep_dim(coords, plot_cfg.get('dim'))]
+    if not grid_stats(df, np.zeros(len(df)), coords, dims=dims)[2].any():
+        log.debug(f"No finished universes to preview {out_path} yet.")
+        return
+
+    plot_name = 'bifurcation' if func=='bifurcation' else plot_cfg['to_plot']
+    #the rc parameters of the plot's style, as applied by the plot creators
+    style = {key: val for key, val in plot_cfg.get('style', {}).items()
+             if key in matplotlib.rcParams}
+    with matplotlib.rc_context(style):
+        figure, axs = setup_figure(model_cfg, plot_name=plot_name,
+                                   title=plot_cfg.get('title'), dim1=dims[0],
+                                   dim2=dims[1] if len(dims)>1 else None)
+        ax = axs[1][0]
+        if func=='sweep1d':
+            _plot_sweep1d(ax, df, coords, cfg=plot_cfg, age_groups=age_groups)
+        elif func=='sweep2d':
+            _plot_sweep2d(ax, df, coords, cfg=plot_cfg)
+        else:
+            _plot_bifurcation(ax, df, coords, cfg=plot_cfg)
+        total = f" of {num_universes}" if num_universes else ""
+        ax.set_title(f"{df['uni'].nunique()}{total} universes finished",
+                     loc='left', fontsize='xx-small')
+
+        #the preview is replaced at once, so that viewers never see a partial
+        #file
+        tmp_path = os.path.join(os.path.dirname(out_path),
+                                f".{os.path.basename(out_path)}")
+        figure.savefig(tmp_path, bbox_inches='tight')
+        plt.close(figure)
+    os.replace(tmp_path, out_path)
+
+## -----------------------------------------------------------------------------
+def _log_pending(run_dir: str, df: pd.DataFrame, failed: set, *, dims: list,
+                 num_universes: int=None):
+    """Logs the universes of a run that have not finished, with the values of
+    their swept parameters"""
+    done = set(df['uni']) if len(df) else set()
+    dirs = universe_dirs(run_dir)
+    for name in sorted(failed):
+        log.warning(f"The metrics of universe {name} could not be extracted.")
+    for name, directory in dirs.items():
+        if name in done or name in failed:
+            continue
+        try:
+            cfg = FileUniverse(directory)['cfg']
+            point = {path[-1]: _cfg_entry(cfg, path) for path in dims}
+        except OSError:
+            point = {}
+        log.warning(f"Universe {name} did not finish; pending point: {point}")
+    if num_universes is not None and num_universes>len(dirs):
+        log.warning(f"{num_universes-len(dirs)} universes never started.")
+
+## -----------------------------------------------------------------------------
+def watch(run_dir: str, plots: dict, *, interval: float=60., settle: float=10.,
+          stale: float=600., once: bool=False, age_groups: list=AGE_GROUPS,
+          window: int=10, avg_window: int=20) -> pd.DataFrame:
+    """Evaluates a run incrementally while it is running: in each round, the
+    metrics of the newly finished universes are extracted and the previews of
+    the plots are rendered, until all universes of the run have finished or
+    failed, or until the output of the run has not been modified for some
+    time (e.g. if the run was aborted, or a universe was killed before
+    marking its data as complete). The universes that remain pending are
+    logged.
+
+    Arguments:
+        run_dir (str): the run directory
+        plots (dict): the resolved plot configurations (see ``live_plots``)
+        interval (float, optional): the time (in seconds) between rounds
+        settle (float, optional): the settling time of the universes, see
+            ``universe_finished``
+        stale (float, optional): the time (in seconds) without modification
+            of the output of the universes after which the run is considered
+            to have stopped
+        once (bool, optional): whether to stop after a single round
+        age_groups (list, optional): the age intervals of the ageing mode
+        window (int, optional): the smoothing window of the areas
+        avg_window (int, optional): the smoothing window of 'num_extrema'
+
+    Returns:
+        df (DataFrame): the metrics of the finished universes
+    """
+    pspace = load_pspace(run_dir)
+    paths = _dim_paths(pspace.dims if pspace is not None else {})
+    num_universes = pspace.volume if pspace is not None and pspace.dims else None
+    out_dir = os.path.join(run_dir, LIVE_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    df, failed, start = None, set(), time.time()
+    while True:
+        df, num_new = reduce_universes(run_dir, df, paths=paths, failed=failed,
+                                       settle=settle, age_groups=age_groups,
+                                       window=window, avg_window=avg_window)
+        if num_new and len(df):
+            coords = grid_coords(df, pspace, paths=paths)
+            model_cfg = (pspace.default if pspace is not None else
+                         FileUniverse(universe_dirs(run_dir)[df['uni'].iloc[0]])['cfg'])
+            for name, cfg in plots.items():
+                try:
+                    render(df, coords, cfg, model_cfg=model_cfg,
+                           out_path=os.path.join(out_dir, f"{name}.png"),
+                           num_universes=num_universes, age_groups=age_groups)
+                except (KeyError, ValueError) as err:
+                    log.warning(f"Could not preview plot '{name}': {err}")
+            log.info(f"Rendered the previews of {df['uni'].nunique()} finished "
+                     f"universes to {out_dir}.")
+
+        if once:
+            break
+        num_done = (df['uni'].nunique() if len(df) else 0)+len(failed)
+        if num_universes is not None and num_done>=num_universes:
+            break
+        if time.time()-max(last_modified(run_dir), start)>stale:
+            log.warning(f"The output of run {run_dir} has not been modified "
+                        f"for {stale} s; stopping the evaluation.")
+            break
+        time.sleep(interval)
+
+    if not once:
+        #without a parameter space, the swept parameters are those that vary
+        dims = ([_dim_path(key) for key in pspace.dims] if pspace is not None
+                else [path for param, path in paths.items()
+                      if len(df) and df[param].nunique()>1])
+        _log_pending(run_dir, df, failed, dims=dims, num_universes=num_universes)
+
+    return df
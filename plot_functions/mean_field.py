@@ -0,0 +1,626 @@
+"""A mean-field solver for the opinion densities of the OpDisc model.
+
+For a large number of users, the opinion density of each type of users follows
+a deterministic rate equation. The types are the groups, which are split into
+discriminators and non-discriminators in the isolated and conflict_undir
+modes, or the age bins in the ageing mode. In the mean-field time
+``tau = 2*t/num_vertices``, every user has a revision opportunity at rate 1.
+In it, the user's opinion is updated, rejected or kept according to the type
+and opinion of a random partner and the interaction rules of the mode; in the
+ageing mode, the user also ages by time_scale or, beyond the life expectancy,
+is reborn with the opinion of a random parent. In the reduced_int_prob mode,
+the partners are drawn from the user's own group with the enhanced
+probability of the homophilic choice, as in ``tools.R_p``.
+
+The densities are integrated on a grid of opinion bins. The outcomes of the
+interactions of all pairs of bins are computed as array operations, and
+opinions between two bin centres are split linearly between them. All
+parameter points of a sweep are solved at once.
+
+``mean_field_universe`` returns the solution for a universe configuration as
+a universe-like mapping, so that it can be passed to the universe plots
+(e.g. ``densities`` and ``group_avg``) in place of a universe.
+``mean_field_mv_data`` returns the solution for a parameter sweep in the
+layout of the multiverse data; ``sweep2d`` plots it for the points of a run
+with its ``mean_field`` argument. Their opinion datasets
+hold num_vertices pseudo-users, drawn deterministically from the quantiles of
+the densities.
+"""
+import copy
+import logging
+import math
+import numpy as np
+import xarray as xr
+from typing import Tuple
+
+from .reference_model import MODES, REPLICA_PARAMS, rejection_func, tolerance_func
+
+log = logging.getLogger(__name__)
+
+#the maximum number of (point, type, bin, bin) entries evaluated at once
+MAX_BLOCK_SIZE = 2**22
+
+#the age of reborn users, and the age band of their parents
+CHILD_AGE = 10.
+PARENT_AGES = (20., 40.)
+
+#the interactions changing the opinion of a user: an update with the same-group
+#or the inter-group susceptibility, or a rejection
+INTERACTIONS = ('update_1', 'update_2', 'reject')
+
+## -----------------------------------------------------------------------------
+def _group_sizes(mode: str, num_users: int, number_of_groups: int) -> np.ndarray:
+    """Returns the initial fraction of the users in each group, as assigned by
+    ``utils::initialize``"""
+    if mode in ('conflict_dir', 'conflict_undir'):
+        return np.full(number_of_groups, 1./number_of_groups)
+
+    q = number_of_groups-1 if number_of_groups>2 else number_of_groups
+    group = np.arange(num_users)%q
+    if number_of_groups>2:
+        zeros = group==0
+        group[zeros] = q*((np.cumsum(zeros)[zeros]-1)%2)
+
+    return np.bincount(group, minlength=number_of_groups)/num_users
+
+## -----------------------------------------------------------------------------
+def _truncated_normal(edges, mean: float, stddev: float) -> np.ndarray:
+    """Returns the mass of each bin of a normal distribution truncated to the
+    range of the bin edges"""
+    cdf = np.array([0.5*(1+math.erf((x-mean)/(stddev*math.sqrt(2))))
+                    for x in edges])
+    mass = np.diff(cdf)
+
+    return mass/mass.sum()
+
+## -----------------------------------------------------------------------------
+def initial_densities(mode: str, *, num_users: int, number_of_groups: int,
+                      num_bins: int, ages=None, **params) -> dict:
+    """Returns the types of users and their initial opinion densities, as
+    initialised by ``utils::initialize`` for a large number of users.
+
+    Arguments:
+        mode (str): the model mode
+        num_users (int): the number of users, which determines the group sizes
+        number_of_groups (int): the number of groups
+        num_bins (int): the number of opinion bins on [0, 1]
+        ages (array, optional): the age bin edges of the ageing mode
+        **params: the flattened parameter arrays (see ``REPLICA_PARAMS``)
+
+    Returns:
+        types (dict): the 'group' (or age) and 'discriminates' flag of each
+            type, and the initial (point, type, bin) 'density'
+    """
+    num_points = params['tolerance'].size
+    edges = np.linspace(0., 1., num_bins+1)
+    uniform = np.full(num_bins, 1./num_bins)
+
+    if mode=='ageing':
+        #ages uniformly distributed on [10, life_expectancy]
+        life_expectancy = params['life_expectancy'][:, np.newaxis]
+        overlap = np.clip(np.minimum(ages[1:], life_expectancy)
+                          - np.maximum(ages[:-1], CHILD_AGE), 0., None)
+        mass = overlap/(life_expectancy-CHILD_AGE)
+        return dict(group=0.5*(ages[1:]+ages[:-1]),
+                    discriminates=np.zeros(ages.size-1, dtype=bool),
+                    density=mass[:, :, np.newaxis]*uniform)
+
+    sizes = _group_sizes(mode, num_users, number_of_groups)
+    if mode in ('conflict_dir', 'reduced_int_prob', 'reduced_s'):
+        group = np.arange(number_of_groups)
+        discriminates = np.zeros(number_of_groups, dtype=bool)
+        mass = np.broadcast_to(sizes, (num_points, number_of_groups))
+    else:
+        #each group is split into non-discriminators and discriminators
+        split = (params['discriminators'] if mode=='conflict_undir'
+                 else params['homophily_parameter'])[:, np.newaxis]
+        group = np.repeat(np.arange(number_of_groups), 2)
+        discriminates = np.tile([False, True], number_of_groups)
+        mass = np.repeat(sizes, 2)*np.where(discriminates, split, 1-split)
+
+    if mode in ('conflict_dir', 'conflict_undir') or number_of_groups==1:
+        opinions = np.tile(uniform, (group.size, 1))
+    else:
+        stddev = 1./(2*(number_of_groups-1))
+        opinions = np.array([_truncated_normal(edges, g/(number_of_groups-1),
+                                               stddev) for g in group])
+
+    return dict(group=group, discriminates=discriminates,
+                density=mass[:, :, np.newaxis]*opinions)
+
+## -----------------------------------------------------------------------------
+def _outcomes(centers, *, tolerance, susceptibility, homophily_parameter,
+              extremism: bool) -> dict:
+    """Returns the outcomes of the interactions of all pairs of opinion bins:
+    for each interaction, the lower target bin and the weight of the upper
+    target bin of each (point, bin, partner bin), together with the (point,
+    bin, partner bin) mask of the partners within the tolerance"""
+    num_bins = centers.size
+    x = centers[np.newaxis, :, np.newaxis]
+    y = centers[np.newaxis, np.newaxis, :]
+    tolerance = tolerance[:, np.newaxis, np.newaxis]
+    s_1 = susceptibility[:, np.newaxis, np.newaxis]
+    s_2 = s_1*(1-homophily_parameter[:, np.newaxis, np.newaxis])
+    if extremism:
+        tolerance = tolerance_func(x, tolerance)
+    mask = np.fabs(x-y)<=tolerance+1e-12
+
+    def targets(opinion) -> Tuple[np.ndarray, np.ndarray]:
+        pos = opinion*num_bins-0.5
+        lower = np.clip(np.floor(pos), 0, num_bins-2)
+        return lower.astype(np.intp), np.clip(pos-lower, 0., 1.)
+
+    outcomes = dict(update_1=targets(x+s_1*(y-x)),
+                    update_2=targets(x+s_2*(y-x)),
+                    reject=targets(rejection_func(x, y, s_1)))
+
+    return {name: outcome+(mask,) for name, outcome in outcomes.items()}
+
+## -----------------------------------------------------------------------------
+def _interactions(mode: str, types: dict, sizes, homophily_parameter):
+    """Returns the (point, interaction, type, partner type) weights with which
+    the partners of each type induce each interaction"""
+    group = types['group']
+    disc = types['discriminates']
+    same = group[:, np.newaxis]==group[np.newaxis, :]
+    num_points, num_types = homophily_parameter.size, group.size
+    weights = np.zeros((num_points, len(INTERACTIONS), num_types, num_types))
+    index = {name: i for i, name in enumerate(INTERACTIONS)}
+
+    weights[:, index['update_1']] = same
+    if mode=='conflict_dir':
+        lower = group[:, np.newaxis]<group[np.newaxis, :]
+        weights[:, index['reject']] = ~same & lower
+        weights[:, index['update_2']] = ~same & ~lower
+    elif mode=='conflict_undir':
+        weights[:, index['reject']] = ~same & disc[:, np.newaxis]
+        weights[:, index['update_2']] = ~same & ~disc[:, np.newaxis]
+    elif mode=='isolated_1':
+        weights[:, index['update_1']] += ~same & ~disc[:, np.newaxis]
+    elif mode=='isolated_2':
+        weights[:, index['update_1']] += (~same & ~disc[:, np.newaxis]
+                                          & ~disc[np.newaxis, :])
+    elif mode=='reduced_s':
+        weights[:, index['update_2']] = ~same
+    elif mode=='reduced_int_prob':
+        #the partners from other groups are replaced by a member of the own
+        #group with the probability homophily_parameter
+        h = homophily_parameter[:, np.newaxis, np.newaxis]
+        size = sizes[group][np.newaxis, :, np.newaxis]
+        weights[:, index['update_1']] = np.where(same, 1+h*(1-size)/size, 1-h)
+
+    return weights
+
+## -----------------------------------------------------------------------------
+def _age_partners(density, peer_bins: np.ndarray) -> dict:
+    """Returns the (point, type, bin) partner densities of each interaction in
+    the ageing mode: the peers within the peer radius, and the older and the
+    younger users beyond it"""
+    num_points, num_types, _ = density.shape
+    cumsum = np.zeros((num_points, num_types+1, density.shape[2]))
+    cumsum[:, 1:] = np.cumsum(density, axis=1)
+    types = np.arange(num_types)[np.newaxis, :]
+    points = np.arange(num_points)[:, np.newaxis]
+    peer_bins = peer_bins[:, np.newaxis]
+    start = np.clip(types-peer_bins, 0, num_types)
+    stop = np.maximum(np.clip(types+peer_bins+1, 0, num_types), start)
+    total = cumsum[:, -1][:, np.newaxis]
+
+    return dict(update_1=cumsum[points, stop]-cumsum[points, start],
+                reject=total-cumsum[points, stop],
+                update_2=cumsum[points, start])
+
+## -----------------------------------------------------------------------------
+def _revision(density, partners: dict, outcomes: dict) -> np.ndarray:
+    """Returns the (point, type, bin) opinion densities after a revision
+    opportunity of every user"""
+    num_points, num_types, num_bins = density.shape
+    revised = density.copy()
+    offsets = (num_bins*np.arange(num_points*num_types)).reshape(num_points,
+                                                                num_types, 1, 1)
+    for name, partner in partners.items():
+        lower, weight, mask = outcomes[name]
+        flux = (density[:, :, :, np.newaxis]*partner[:, :, np.newaxis, :]
+                *mask[:, np.newaxis])
+        revised -= flux.sum(axis=3)
+        index = (offsets+lower[:, np.newaxis]).ravel()
+        weight = weight[:, np.newaxis]
+        revised += np.bincount(index, (flux*(1-weight)).ravel(),
+                               minlength=revised.size).reshape(revised.shape)
+        revised += np.bincount(index+1, (flux*weight).ravel(),
+                               minlength=revised.size).reshape(revised.shape)
+
+    return revised
+
+## -----------------------------------------------------------------------------
+def _age(density, revised, *, ages, life_expectancy, time_scale) -> np.ndarray:
+    """Returns the (point, type, bin) densities after ageing the revised users
+    by time_scale, with the users beyond the life expectancy reborn as children
+    with the opinion of a random parent"""
+    num_points, num_types, num_bins = density.shape
+    width = ages[1]-ages[0]
+    centers = 0.5*(ages[1:]+ages[:-1])
+    dead = centers[np.newaxis, :]>life_expectancy[:, np.newaxis]
+
+    #shift the ages of the living users, splitting between two age bins
+    shift = time_scale/width
+    lower = np.floor(shift).astype(np.intp)[:, np.newaxis]
+    weight = (shift-np.floor(shift))[:, np.newaxis, np.newaxis]
+    types = np.arange(num_types)[np.newaxis, :]
+    alive = np.where(dead[:, :, np.newaxis], 0., revised)
+    aged = np.zeros_like(density)
+    points = np.arange(num_points)[:, np.newaxis]
+    for target, w in ((types+lower, 1-weight), (types+lower+1, weight)):
+        np.add.at(aged, (points, np.clip(target, 0, num_types-1)), w*alive)
+
+    #the reborn users take the opinions of the users in the parent age band
+    parents = (centers>=PARENT_AGES[0]) & (centers<=PARENT_AGES[1])
+    parent_density = density[:, parents].sum(axis=1)
+    norm = parent_density.sum(axis=1, keepdims=True)
+    parent_density = np.where(norm>0, parent_density/np.where(norm>0, norm, 1),
+                              1./num_bins)
+    deaths = np.where(dead, revised.sum(axis=2), 0.).sum(axis=1)
+    aged[:, 0] += deaths[:, np.newaxis]*parent_density
+
+    return aged
+
+## -----------------------------------------------------------------------------
+def solve(mode: str, *, times, num_users: int, number_of_groups: int=2,
+          discriminators=0.3, homophily_parameter=0.4, tolerance=0.4,
+          susceptibility=0.4, extremism: bool=False, life_expectancy=80.,
+          peer_radius=10., time_scale=1., num_bins: int=100,
+          age_bin_width: float=2., dt: float=0.25) -> dict:
+    """Integrates the mean-field equations of the opinion densities.
+
+    The parameters listed in ``REPLICA_PARAMS`` may be arrays, which are
+    broadcast against each other; the parameter points are solved at once.
+
+    Arguments:
+        mode (str): the model mode
+        times (array): the model times at which the densities are returned
+        num_users (int): the number of users, which relates the model time to
+            the mean-field time, and determines the initial group sizes
+        number_of_groups (int, optional): the number of groups
+        discriminators (optional): the proportion of discriminators
+            (conflict_undir)
+        homophily_parameter (optional): the homophily parameter
+        tolerance (optional): the tolerance
+        susceptibility (optional): the susceptibility
+        extremism (bool, optional): whether users with extreme opinions have
+            a reduced tolerance
+        life_expectancy (optional): the life expectancy (ageing)
+        peer_radius (optional): the peer radius (ageing)
+        time_scale (optional): the ageing per revision (ageing)
+        num_bins (int, optional): the number of opinion bins
+        age_bin_width (float, optional): the width of the age bins (ageing)
+        dt (float, optional): the maximum (Euler) time step in mean-field
+            time; must not exceed 1
+
+    Returns:
+        solution (dict): the model 'time', the opinion bin 'edges', the
+            'group' (or age) and 'discriminates' flag of each type, and the
+            'density' of shape (*shape, time, type, bin), where shape is the
+            broadcast shape of the parameters
+
+    Raises:
+        ValueError: on an invalid mode, number of bins or time step
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid model mode '{mode}'! Choose from: "
+                         f"{', '.join(MODES)}.")
+    if num_bins<2:
+        raise ValueError("At least two opinion bins are needed!")
+    if not 0<dt<=1:
+        raise ValueError(f"The time step must be in (0, 1], but is {dt}!")
+
+    values = dict(discriminators=discriminators,
+                  homophily_parameter=homophily_parameter,
+                  tolerance=tolerance, susceptibility=susceptibility,
+                  life_expectancy=life_expectancy, peer_radius=peer_radius,
+                  time_scale=time_scale)
+    arrays = np.broadcast_arrays(*[np.asarray(values[name], dtype=float)
+                                   for name in REPLICA_PARAMS])
+    shape = arrays[0].shape
+    params = {name: arr.ravel() for name, arr in zip(REPLICA_PARAMS, arrays)}
+    num_points = arrays[0].size
+
+    #the types and the interactions between them
+    ages = None
+    if mode=='ageing':
+        max_age = np.amax(params['life_expectancy']+params['time_scale'])
+        num_ages = int(np.ceil((max_age-CHILD_AGE)/age_bin_width))+1
+        ages = CHILD_AGE+age_bin_width*np.arange(num_ages+1)
+        #the age bins within the peer radius of each other
+        peer_bins = np.ceil(params['peer_radius']/age_bin_width).astype(int)-1
+    types = initial_densities(mode, num_users=num_users,
+                              number_of_groups=number_of_groups,
+                              num_bins=num_bins, ages=ages, **params)
+    density = types.pop('density')
+    if mode!='ageing':
+        sizes = _group_sizes(mode, num_users, number_of_groups)
+        weights = _interactions(mode, types, sizes,
+                                params['homophily_parameter'])
+    edges = np.linspace(0., 1., num_bins+1)
+    outcomes = _outcomes(0.5*(edges[1:]+edges[:-1]),
+                         tolerance=params['tolerance'],
+                         susceptibility=params['susceptibility'],
+                         homophily_parameter=params['homophily_parameter'],
+                         extremism=extremism)
+
+    #the blocks of parameter points evaluated at once
+    num_types = density.shape[1]
+    block = max(1, MAX_BLOCK_SIZE//(num_types*num_bins**2))
+    blocks = [slice(start, start+block) for start in range(0, num_points, block)]
+
+    def rate(density, points: slice) -> np.ndarray:
+        if mode=='ageing':
+            partners = _age_partners(density, peer_bins[points])
+        else:
+            partners = np.einsum('pitk,pky->ipty', weights[points], density)
+            partners = {name: partners[i] for i, name in enumerate(INTERACTIONS)
+                        if partners[i].any()}
+        block_outcomes = {name: tuple(arr[points] for arr in outcomes[name])
+                          for name in partners}
+        revised = _revision(density, partners, block_outcomes)
+        if mode=='ageing':
+            revised = _age(density, revised, ages=ages,
+                           life_expectancy=params['life_expectancy'][points],
+                           time_scale=params['time_scale'][points])
+        return revised-density
+
+    #integrate up to each write time
+    times = np.asarray(times)
+    taus = 2.*times/num_users
+    densities = np.empty((num_points, times.size)+density.shape[1:])
+    tau = 0.
+    for i, target in enumerate(taus):
+        if target>tau:
+            num_steps = int(np.ceil((target-tau)/dt-1e-9))
+            step = (target-tau)/num_steps
+            for _ in range(num_steps):
+                for points in blocks:
+                    density[points] += step*rate(density[points], points)
+            tau = target
+        densities[:, i] = density
+
+    return dict(time=times, edges=edges, group=types['group'],
+                discriminates=types['discriminates'],
+                density=densities.reshape(shape+densities.shape[1:]))
+
+## -----------------------------------------------------------------------------
+def pseudo_users(solution: dict, num_users: int) -> dict:
+    """Returns num_users pseudo-users, whose opinions are the quantiles of the
+    densities of a solution. The users are ordered by type and opinion.
+
+    Arguments:
+        solution (dict): the solution (see ``solve``)
+        num_users (int): the number of pseudo-users
+
+    Returns:
+        users (dict): the 'opinion' and 'group_label' of the users and their
+            'discriminators' flags, each of shape (*shape, time, vertex)
+    """
+    density = solution['density']
+    edges = solution['edges']
+    num_bins = edges.size-1
+    rows = density.reshape(-1, density.shape[-2]*num_bins)
+    rows = rows/rows.sum(axis=1, keepdims=True)
+
+    #the inverse cumulative distribution over (type, bin), searched for all
+    #rows at once by offsetting the rows
+    cdf = np.zeros((rows.shape[0], rows.shape[1]+1))
+    cdf[:, 1:] = np.cumsum(rows, axis=1)
+    offsets = 2.*np.arange(rows.shape[0])[:, np.newaxis]
+    levels = (np.arange(num_users)+0.5)/num_users
+    cell = np.searchsorted((cdf+offsets).ravel(), (levels+offsets).ravel(),
+                           side='right').reshape(-1, num_users)
+    cell = np.clip(cell-1-(rows.shape[1]+1)*np.arange(rows.shape[0])[:, np.newaxis],
+                   0, rows.shape[1]-1)
+    row_idx = np.arange(rows.shape[0])[:, np.newaxis]
+    frac = (levels-cdf[row_idx, cell])/np.where(rows[row_idx, cell]>0,
+                                                rows[row_idx, cell], 1.)
+    opinion = edges[cell%num_bins]+np.clip(frac, 0., 1.)*(edges[1]-edges[0])
+    kind = cell//num_bins
+
+    out_shape = density.shape[:-2]+(num_users,)
+    return dict(opinion=opinion.reshape(out_shape),
+                group_label=solution['group'][kind].reshape(out_shape),
+                discriminators=solution['discriminates'][kind].reshape(out_shape))
+
+## -----------------------------------------------------------------------------
+def _solve_cfg(cfg: dict, **kwargs) -> dict:
+    """Solves the mean-field equations for the write times of a universe
+    configuration, with the parameters overridden by kwargs"""
+    model_cfg = cfg['OpDisc']
+    ageing_cfg = model_cfg.get('ageing', {})
+    times = np.arange(cfg.get('write_start', 0), cfg['num_steps']+1,
+                      cfg.get('write_every', 1))
+    solve_kwargs = dict(
+        times=times,
+        num_users=model_cfg['nw']['num_vertices'],
+        number_of_groups=model_cfg['number_of_groups'],
+        discriminators=model_cfg['discriminators'],
+        homophily_parameter=model_cfg['homophily_parameter'],
+        tolerance=model_cfg['tolerance'],
+        susceptibility=model_cfg['susceptibility'],
+        extremism=model_cfg.get('extremism', False),
+        life_expectancy=ageing_cfg.get('life_expectancy', 80.),
+        peer_radius=ageing_cfg.get('peer_radius', 10.),
+        time_scale=ageing_cfg.get('time_scale', 1.))
+    solve_kwargs.update(kwargs)
+
+    return solve(model_cfg['mode'], **solve_kwargs)
+
+## -----------------------------------------------------------------------------
+def _stats(solution: dict, *, ageing: bool, number_of_groups: int,
+           age_groups: list, num_bins: int, num_users: int) -> dict:
+    """Returns the summary statistics of a single solution in the layout of
+    the model's 'stats' group"""
+    density = solution['density']
+    edges = solution['edges']
+    centers = 0.5*(edges[1:]+edges[:-1])
+    group = solution['group']
+    if ageing:
+        age_groups = np.asarray(age_groups)
+        idx = np.searchsorted(age_groups, group, side='left')-1
+        idx = np.where((group<age_groups[0]) | (group>age_groups[-1]), -1,
+                       np.maximum(idx, 0))
+        num_groups = age_groups.size-1
+    else:
+        idx = group.astype(int)
+        num_groups = number_of_groups
+
+    #the (time, group, bin) densities of each group
+    members = (idx[:, np.newaxis]==np.arange(num_groups)).astype(float)
+    grouped = np.einsum('wtb,tg->wgb', density, members)
+    mass = grouped.sum(axis=2)
+    safe = np.where(mass>0, mass, 1.)
+    mean = (grouped*centers).sum(axis=2)/safe
+    var = (grouped*centers**2).sum(axis=2)/safe-mean**2
+    cdf = np.zeros(grouped.shape[:2]+(edges.size,))
+    cdf[:, :, 1:] = np.cumsum(grouped, axis=2)
+    hist_edges = np.linspace(0., 1., num_bins+1)
+    hist_cdf = np.apply_along_axis(lambda c: np.interp(hist_edges, edges, c),
+                                   2, cdf)
+
+    stats = dict(group_size=mass*num_users,
+                 group_mean=np.where(mass>0, mean, 0.),
+                 group_std=np.where(mass>0, np.sqrt(np.maximum(var, 0.)), 0.),
+                 hist=np.diff(hist_cdf, axis=2)*num_users,
+                 global_mean=(density.sum(axis=1)*centers).sum(axis=1))
+    if ageing:
+        alive = density.sum(axis=2)>0
+        stats['max_group'] = np.amax(np.where(alive, group, -np.inf), axis=1)
+
+    return stats
+
+## -----------------------------------------------------------------------------
+class MeanFieldUniverse(dict):
+    """A mean-field solution in the form of a universe: a mapping holding the
+    'cfg' of the universe and its datasets under their paths, such as
+    'data/OpDisc/nw/opinion'. It can be passed to the universe plots in place
+    of a universe.
+    """
+    def __init__(self, cfg: dict, data: dict, name: str='mean_field'):
+        """Sets up the universe.
+
+        Arguments:
+            cfg (dict): the universe configuration
+            data (dict): the datasets, by path
+            name (str, optional): the name of the universe
+        """
+        super().__init__(data)
+        self['cfg'] = cfg
+        self.name = name
+
+## -----------------------------------------------------------------------------
+def mean_field_universe(cfg: dict, **kwargs) -> MeanFieldUniverse:
+    """Solves the mean-field equations for a universe configuration, e.g.
+    ``uni['cfg']``, and returns the solution in the form of a universe. Its
+    opinion dataset holds num_vertices pseudo-users (see ``pseudo_users``),
+    and its summary statistics are computed from the densities. All write
+    times are included, regardless of the write schedule.
+
+    Arguments:
+        cfg (dict): the universe configuration
+        **kwargs: passed on to ``solve``, overriding the configuration; the
+            parameters must be scalars
+
+    Returns:
+        uni (MeanFieldUniverse): the universe-like solution
+    """
+    cfg = copy.deepcopy(dict(cfg))
+    model_cfg = cfg['OpDisc']
+    model_cfg.update(write_mode='snapshots', write_schedule=dict(mode='fixed'),
+                     num_replicas=1)
+    ageing = model_cfg['mode']=='ageing'
+    stats_cfg = model_cfg.setdefault('stats', {})
+    stats_cfg.setdefault('num_bins', 100)
+    stats_cfg.setdefault('age_groups', [10, 20, 40, 60, 80])
+    num_users = model_cfg['nw']['num_vertices']
+
+    solution = _solve_cfg(cfg, **kwargs)
+    if solution['density'].ndim!=3:
+        raise ValueError("The parameters of a mean-field universe must be "
+                         "scalars; use mean_field_mv_data for sweeps!")
+    users = pseudo_users(solution, num_users)
+    time = solution['time']
+
+    def time_series(data, *dims, **attrs):
+        return xr.DataArray(data, dims=('time',)+dims,
+                            coords=dict(time=time), attrs=attrs)
+
+    data = {'data/OpDisc/nw/opinion': time_series(users['opinion'], 'vertex')}
+    if ageing:
+        data['data/OpDisc/nw/group_label'] = time_series(users['group_label'],
+                                                         'vertex')
+    else:
+        data['data/OpDisc/nw/group_label'] = xr.DataArray(
+                                users['group_label'][-1].astype(int),
+                                dims=('vertex',))
+        data['data/OpDisc/nw/discriminators'] = xr.DataArray(
+                                users['discriminators'][-1].astype(int),
+                                dims=('vertex',))
+
+    stats = _stats(solution, ageing=ageing,
+                   number_of_groups=model_cfg['number_of_groups'],
+                   age_groups=stats_cfg['age_groups'],
+                   num_bins=stats_cfg['num_bins'], num_users=num_users)
+    group_attrs = dict(age_groups=stats_cfg['age_groups']) if ageing else {}
+    for name in ('group_size', 'group_mean', 'group_std'):
+        data['data/OpDisc/stats/'+name] = time_series(stats[name], 'group',
+                                                      **group_attrs)
+    #the histograms of all groups are concatenated, as in the model
+    hist = stats['hist'].reshape(time.size, -1)
+    data['data/OpDisc/stats/hist'] = time_series(hist, 'group_bin',
+                                                 num_bins=stats_cfg['num_bins'])
+    data['data/OpDisc/stats/global_mean'] = time_series(stats['global_mean'])
+    if ageing:
+        data['data/OpDisc/stats/max_group'] = time_series(stats['max_group'])
+
+    return MeanFieldUniverse(cfg, data)
+
+## -----------------------------------------------------------------------------
+def mean_field_mv_data(cfg: dict, sweep: dict, *, num_users: int=None,
+                       **kwargs) -> xr.Dataset:
+    """Solves the mean-field equations for a sweep over the given parameters
+    and returns the solution in the layout of the multiverse data, with the
+    'opinion' and 'group_label' of pseudo-users (see ``pseudo_users``) along
+    the sweep dimensions and the time and vertex dimensions. The configuration
+    is stored in the 'cfg' attribute, from which the plots take the model
+    parameters in place of the parameter space of a run. For the sweep plots,
+    pass ``mean_field`` to ``sweep2d`` rather than the returned data, so that
+    the caches of the universes are not consulted.
+
+    Arguments:
+        cfg (dict): the universe configuration of the default point
+        sweep (dict): the values of the swept parameters (see
+            ``REPLICA_PARAMS``)
+        num_users (int, optional): the number of pseudo-users; defaults to
+            num_vertices
+        **kwargs: passed on to ``solve``, overriding the configuration
+
+    Returns:
+        mv_data (xr.Dataset): the multiverse data of the sweep
+
+    Raises:
+        ValueError: if a parameter cannot be swept
+    """
+    invalid = [name for name in sweep if name not in REPLICA_PARAMS]
+    if invalid:
+        raise ValueError(f"Cannot sweep the parameters {invalid}! Choose "
+                         f"from: {', '.join(REPLICA_PARAMS)}.")
+    values = [np.asarray(vals, dtype=float) for vals in sweep.values()]
+    grids = np.meshgrid(*values, indexing='ij')
+    solution = _solve_cfg(cfg, **dict(zip(sweep, grids)), **kwargs)
+    if num_users is None:
+        num_users = cfg['OpDisc']['nw']['num_vertices']
+    users = pseudo_users(solution, num_users)
+
+    dims = tuple(sweep)+('time', 'vertex')
+    coords = dict(zip(sweep, values), time=solution['time'],
+                  vertex=np.arange(num_users))
+
+    return xr.Dataset(dict(opinion=(dims, users['opinion'].astype(np.float32)),
+                           group_label=(dims, users['group_label'])),
+                      coords=coords, attrs=dict(cfg=cfg))
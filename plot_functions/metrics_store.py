@@ -0,0 +1,441 @@
+"""Columnar store of the scalar metrics of the universes of multiverse runs.
+
+The metrics of each universe (the areas under the mean curve, the maxima of
+the mean opinion, the group means and stddevs at the final time
+step and their time series) are extracted once per run, together with the
+model parameters, and written as one Parquet file per run into the
+``sweep_metrics`` directory next to the run directories. Since the files of
+all runs form a single table, comparisons across runs are dataframe queries,
+e.g.::
+
+    df = load_metrics('~/utopia_output/OpDisc/sweep_metrics')
+    df.groupby(['number_of_groups', 'homophily_parameter']).area.mean()
+
+The metrics of a run are extracted on first use by the sweep plots (with the
+``metrics_store`` key), or by ``index_metrics.py`` as soon as a run completes.
+They are extracted again if the configuration of a universe or the analysis
+parameters change.
+"""
+import copy
+import logging
+import numpy as np
+import os
+import pandas as pd
+from typing import Tuple
+
+from .cache import cache_key
+from .data_analysis import (_coord_index, area_from_means, find_extrema,
+                            rolling_mean, universe_global_mean,
+                            universe_group_stats)
+from .data_io import replica_seeds
+from .grouped_stats import means_stddevs
+
+log = logging.getLogger(__name__)
+
+#the name of the store directory in the output directory of the runs
+STORE_DIR = 'sweep_metrics'
+
+#the scalar metrics of a universe
+SCALARS = ('extreme_means_diff', 'avg_of_means_diff_to_05', 'avg_of_stddevs',
+           'absolute_area', 'area', 'area_diff', 'num_extrema')
+
+#the metrics of a universe, see universe_metrics
+METRICS = SCALARS+('maxima', 'final_means', 'final_stddevs', 'time', 'means',
+                   'stddevs', 'max_group')
+
+#the model parameters stored with the metrics, and their configuration paths
+PARAMS = {
+    'seed': ('seed',),
+    'num_steps': ('num_steps',),
+    'write_every': ('write_every',),
+    'write_start': ('write_start',),
+    'num_vertices': ('OpDisc', 'nw', 'num_vertices'),
+    'mode': ('OpDisc', 'mode'),
+    'number_of_groups': ('OpDisc', 'number_of_groups'),
+    'discriminators': ('OpDisc', 'discriminators'),
+    'homophily_parameter': ('OpDisc', 'homophily_parameter'),
+    'tolerance': ('OpDisc', 'tolerance'),
+    'extremism': ('OpDisc', 'extremism'),
+    'susceptibility': ('OpDisc', 'susceptibility'),
+    'life_expectancy': ('OpDisc', 'ageing', 'life_expectancy'),
+    'peer_radius': ('OpDisc', 'ageing', 'peer_radius'),
+    'time_scale': ('OpDisc', 'ageing', 'time_scale'),
+    'update_scheme': ('OpDisc', 'update_scheme'),
+}
+
+#the default age intervals of the ageing mode, as in the sweep plots
+AGE_GROUPS = [10, 20, 40, 60, 80]
+
+## -----------------------------------------------------------------------------
+def universe_metrics(dm, uni, *, replica: int=0, age_groups: list=AGE_GROUPS,
+                     window: int=10, avg_window: int=20) -> dict:
+    """Returns the metrics of a replica of a universe, as used by the sweep
+    plots. The group metrics are those of ``sweep2d``; 'num_extrema' is the
+    number of maxima of the smoothed global mean opinion, as in
+    ``bifurcation``.
+
+    Arguments:
+        dm (DataManager): the data manager
+        uni (UniverseGroup): the universe
+        replica (int, optional): the replica, for runs with several replicas
+        age_groups (list, optional): the age intervals of the ageing mode
+        window (int, optional): the smoothing window of the areas
+        avg_window (int, optional): the smoothing window of 'num_extrema'
+
+    Returns:
+        metrics (dict): the SCALARS, the values of the 'maxima' of the mean
+            opinion, the (group,) 'final_means' and 'final_stddevs', the
+            (time, group) 'means' and 'stddevs' with their 'time' coordinates,
+            and the maximum group label (or age) 'max_group'; NaN if the model
+            statistics do not record it
+    """
+    cfg = uni['cfg']['OpDisc']
+    ageing = cfg['mode']=='ageing'
+    group_list = age_groups if ageing else list(range(cfg['number_of_groups']))
+    stats = universe_group_stats(dm, uni, group_list, ageing=ageing,
+                                 replica=replica)
+    means, stddevs = means_stddevs(stats)
+
+    mean = universe_global_mean(dm, uni, replica=replica)
+    areas = {absolute: float(area_from_means(mean, absolute=absolute,
+                                             window=window))
+             for absolute in [True, False]}
+    maxima = find_extrema(rolling_mean(mean, window=avg_window))['max']['y']
+
+    return {'extreme_means_diff': float(means[-1, -1]-means[-1, 0]),
+            'avg_of_means_diff_to_05': float(np.mean(np.abs(means[-1]-0.5))),
+            'avg_of_stddevs': float(np.mean(stddevs[-1])),
+            'absolute_area': areas[True], 'area': areas[False],
+            'area_diff': areas[True]-areas[False],
+            'num_extrema': float(len(maxima)), 'maxima': np.asarray(maxima),
+            'final_means': means[-1], 'final_stddevs': stddevs[-1],
+            'time': np.asarray(stats['time'], dtype=float),
+            'means': means, 'stddevs': stddevs,
+            'max_group': float(stats.get('max_group', np.nan))}
+
+## -----------------------------------------------------------------------------
+def _cfg_entry(cfg, path: tuple):
+    """Returns an entry of a universe configuration, or None"""
+    for key in path:
+        if not isinstance(cfg, dict) or key not in cfg:
+            return None
+        cfg = cfg[key]
+
+    return cfg
+
+## -----------------------------------------------------------------------------
+def _dim_path(key) -> tuple:
+    """Returns the configuration path of a parameter space dimension"""
+    return tuple(key.split('.')) if isinstance(key, str) else tuple(key)
+
+## -----------------------------------------------------------------------------
+def _dim_paths(dims) -> dict:
+    """Returns the paths of the stored parameters: the PARAMS and the given
+    dimensions of a parameter space, keyed by their names"""
+    paths = dict(PARAMS)
+    for path in map(_dim_path, dims):
+        if path not in paths.values():
+            paths[path[-1] if path[-1] not in paths else '.'.join(path)] = path
+
+    return paths
+
+## -----------------------------------------------------------------------------
+def _param_paths(dm) -> dict:
+    """Returns the paths of the stored parameters: the PARAMS and the
+    dimensions of the parameter space of the run, keyed by their names"""
+    try:
+        dims = dm['multiverse'].pspace.dims
+    except (AttributeError, KeyError):
+        dims = {}
+
+    return _dim_paths(dims)
+
+## -----------------------------------------------------------------------------
+def store_path(run_dir: str) -> str:
+    """Returns the path of the metrics of a run in the store directory next to
+    the run directory"""
+    run_dir = os.path.normpath(run_dir)
+
+    return os.path.join(os.path.dirname(run_dir), STORE_DIR,
+                        f"{os.path.basename(run_dir)}.parquet")
+
+## -----------------------------------------------------------------------------
+def read_run(path: str) -> pd.DataFrame:
+    """Returns the stored metrics of a run, or None if there are none"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError) as err:
+        log.warning(f"Could not read the metrics store {path}: {err}")
+
+    return None
+
+## -----------------------------------------------------------------------------
+def write_run(path: str, df: pd.DataFrame):
+    """Replaces the stored metrics of a run"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path),
+                                f".{os.path.basename(path)}.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except OSError as err:
+        log.warning(f"Could not write the metrics store {path}: {err}")
+
+## -----------------------------------------------------------------------------
+def universe_key(uni, *, age_groups: list=AGE_GROUPS, window: int=10,
+                 avg_window: int=20) -> str:
+    """Returns the key of the metrics of a universe, see ``cache.cache_key``"""
+    return cache_key(uni['cfg'], age_groups=list(age_groups), window=window,
+                     avg_window=avg_window)
+
+## -----------------------------------------------------------------------------
+def _num_rows(uni) -> int:
+    """Returns the number of rows of a universe in the store"""
+    return uni['cfg']['OpDisc'].get('num_replicas', 1)
+
+## -----------------------------------------------------------------------------
+def universe_rows(dm, name: str, uni, *, run: str, paths: dict,
+                  **analysis) -> list:
+    """Returns the rows of a universe in the store, one per replica.
+
+    Arguments:
+        dm (DataManager): the data manager
+        name (str): the name of the universe
+        uni (UniverseGroup): the universe
+        run (str): the name of the run
+        paths (dict): the configuration paths of the stored parameters
+        **analysis: the analysis parameters passed to ``universe_metrics``
+
+    Returns:
+        rows (list): the rows, each with the 'run', the universe name 'uni',
+            its 'key', the parameters and the metrics. The 'seed' of the row
+            of a replica is the seed of the replica.
+    """
+    params = {'run': run, 'uni': name, 'key': universe_key(uni, **analysis)}
+    params.update({param: _cfg_entry(uni['cfg'], p) for param, p in paths.items()})
+    seeds = replica_seeds(uni)
+
+    rows = []
+    for replica, seed in enumerate(seeds if seeds is not None else [None]):
+        row = dict(params)
+        if seed is not None:
+            row['seed'] = seed.item()
+        metrics = universe_metrics(dm, uni, replica=replica, **analysis)
+        row.update({key: val.tolist() if isinstance(val, np.ndarray) else val
+                    for key, val in metrics.items()})
+        rows.append(row)
+
+    return rows
+
+## -----------------------------------------------------------------------------
+def index_run(dm, *, age_groups: list=AGE_GROUPS, window: int=10,
+              avg_window: int=20) -> pd.DataFrame:
+    """Returns the metrics of all universes of a run, one row per universe (or
+    per replica, see ``universe_rows``). The metrics are read from the store
+    if they were stored for the same universe configurations, parameters and
+    analysis parameters; otherwise they are extracted and the run's file in
+    the store is replaced.
+
+    Arguments:
+        dm (DataManager): the data manager of the run
+        age_groups (list, optional): the age intervals of the ageing mode
+        window (int, optional): the smoothing window of the areas
+        avg_window (int, optional): the smoothing window of 'num_extrema'
+
+    Returns:
+        df (DataFrame): the metrics, together with the 'run' and universe
+            'uni' names, the parameters and the 'key' of each universe
+
+    Raises:
+        ImportError: if no Parquet engine (pyarrow or fastparquet) is installed
+    """
+    analysis = dict(age_groups=age_groups, window=window, avg_window=avg_window)
+    unis = dm['multiverse']
+    run_dir = os.path.dirname(os.path.normpath(dm.dirs['data']))
+    run = os.path.basename(run_dir)
+    path = store_path(run_dir)
+    paths = _param_paths(dm)
+    keys = {name: universe_key(uni, **analysis) for name, uni in unis.items()}
+    num_rows = sum(_num_rows(uni) for uni in unis.values())
+
+    df = read_run(path)
+    if (df is not None and dict(zip(df['uni'], df['key']))==keys
+        and len(df)==num_rows and set(paths).union(METRICS).issubset(df.columns)):
+        log.debug(f"Loaded the metrics of run {run} from the store.")
+        return df
+
+    log.info(f"Extracting the metrics of {len(keys)} universes of run {run} ...")
+    df = pd.DataFrame([row for name, uni in unis.items()
+                       for row in universe_rows(dm, name, uni, run=run,
+                                                paths=paths, **analysis)])
+    write_run(path, df)
+
+    return df
+
+## -----------------------------------------------------------------------------
+def load_metrics(directory: str, *, columns: list=None) -> pd.DataFrame:
+    """Loads the metrics of all runs in a store directory.
+
+    Arguments:
+        directory (str): the store directory
+        columns (list, optional): the columns to be loaded; by default, all
+
+    Returns:
+        df (DataFrame): the metrics, one row per universe or replica;
+            parameters not stored for a run are None
+    """
+    directory = os.path.expanduser(directory)
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                   if f.endswith('.parquet') and not f.startswith('.'))
+    #the runs are read separately, since their swept parameters may differ
+    dfs = [pd.read_parquet(path, columns=columns) for path in paths]
+
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=columns)
+
+## -----------------------------------------------------------------------------
+def grid_stats(df: pd.DataFrame, values, coords: dict, *,
+               dims: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Arranges metrics on a grid of parameter coordinates, and returns their
+    mean and standard deviation over the rows at each point of the sweep
+    dimensions (i.e. over the seeds and replicas). Only the rows whose
+    parameters lie on the grid are taken into account.
+
+    Arguments:
+        df (DataFrame): the metrics of the universes (see ``index_run``)
+        values (array): the (row, ...) values, eg. a column of df
+        coords (dict): the coordinates of the parameters of the grid
+        dims (list): the sweep dimensions, a subset of the grid parameters
+
+    Returns:
+        mean (ndarray): the mean values, with one axis per sweep dimension,
+            followed by the axes of the values. NaN where there is no universe.
+        std (ndarray): the standard deviations
+        counts (ndarray): the number of rows at each point
+
+    Raises:
+        ValueError: if a grid parameter is not in the store
+    """
+    #nested lists are read from Parquet as object arrays of arrays
+    values = np.asarray([np.array(v.tolist() if isinstance(v, np.ndarray) else v,
+                                  dtype=float) for v in values])
+    extra = list(values.shape[1:])
+    keep = np.ones(len(df), dtype=bool)
+    idx = {}
+    for dim, c in coords.items():
+        if dim not in df:
+            raise ValueError(f"The sweep dimension '{dim}' is not in the "
+                             "metrics store!")
+        pos = np.array([_coord_index(c, val) if val is not None else None
+                        for val in df[dim]], dtype=object)
+        keep &= pos!=None
+        idx[dim] = pos
+    keep = np.flatnonzero(keep)
+
+    shape = [len(coords[dim]) for dim in dims]
+    flat = np.ravel_multi_index(tuple(np.asarray(idx[dim][keep], dtype=int)
+                                      for dim in dims), shape)
+    counts = np.bincount(flat, minlength=np.prod(shape))
+    values = values[keep].reshape(len(keep), -1)
+    sums = np.zeros((counts.size, values.shape[1]))
+    sq_sums = np.zeros_like(sums)
+    np.add.at(sums, flat, values)
+    np.add.at(sq_sums, flat, values**2)
+
+    n = np.maximum(counts, 1)[:, np.newaxis]
+    mean = np.where(counts[:, np.newaxis]>0, sums/n, np.nan)
+    std = np.sqrt(np.maximum(sq_sums/n-mean**2, 0.))
+
+    return (mean.reshape(shape+extra), std.reshape(shape+extra),
+            counts.reshape(shape))
+
+## -----------------------------------------------------------------------------
+def grid_coords(df: pd.DataFrame, pspace, *, paths: dict) -> dict:
+    """Returns the coordinates of the parameter grid of a run. Without the
+    parameter space, the parameters with several values among the finished
+    universes are taken as the grid.
+
+    Arguments:
+        df (DataFrame): the metrics of the finished universes
+        pspace (ParamSpace): the parameter space of the run, or None
+        paths (dict): the configuration paths of the stored parameters
+
+    Returns:
+        coords (dict): the coordinates of the parameters, keyed by their names
+    """
+    if pspace is not None:
+        names = {path: name for name, path in paths.items()}
+        return {names[_dim_path(key)]: np.asarray(pdim.values)
+                for key, pdim in pspace.dims.items()}
+
+    coords = {}
+    for name in paths:
+        vals = df[name].dropna().unique() if name in df else []
+        if len(vals)>1:
+            coords[name] = np.sort(vals)
+
+    return coords
+
+## -----------------------------------------------------------------------------
+def select_subspace(coords: dict, cfg: dict, subspace: dict) -> Tuple[dict, dict]:
+    """Restricts the grid coordinates and the model configuration shown in the
+    title box to a subspace selection"""
+    coords, cfg = dict(coords), copy.deepcopy(cfg)
+    for param, val in subspace.items():
+        vals = np.atleast_1d(val)
+        coords[param] = vals
+        entry = cfg
+        path = PARAMS.get(param, ('OpDisc', param))
+        for key in path[:-1]:
+            entry = entry.setdefault(key, {})
+        entry[path[-1]] = vals[0] if len(vals)==1 else list(vals)
+
+    return coords, cfg
+
+## -----------------------------------------------------------------------------
+def sweep_dim(coords: dict, dim: str=None) -> str:
+    """Returns the given sweep dimension, or deduces it as the only parameter
+    (other than the seed) with several values
+
+    Raises:
+        ValueError: if the dimension is not on the grid or cannot be deduced
+    """
+    if dim is not None:
+        if dim not in coords:
+            raise ValueError(f"Dimension '{dim}' not available in the parameter "
+                             f"grid. Available: {list(coords)}")
+        return dim
+
+    dims = [d for d, c in coords.items() if d!='seed' and len(c)>1]
+    if len(dims)!=1:
+        raise ValueError(f"Automatic sweep parameter deduction failed for the "
+                         f"dimensions {dims}! Use 'subspace' to select specific "
+                         "values for keys other than the desired sweep key!")
+
+    return dims[0]
+
+## -----------------------------------------------------------------------------
+def store_grid(dm, df: pd.DataFrame, mv_data) -> Tuple[dict, dict]:
+    """Returns the parameter grid of a sweep plot reading from the store: the
+    coordinates of the parameter space of the run, restricted to the subspace
+    selected in the multiverse data, and the default model configuration with
+    the selected values. Only the coordinates of the multiverse data are used,
+    so that any field may be selected.
+
+    Arguments:
+        dm (DataManager): the data manager of the run
+        df (DataFrame): the metrics of the universes (see ``index_run``)
+        mv_data (xdarray): the multiverse data
+
+    Returns:
+        coords (dict): the coordinates of the parameters, keyed by their names
+        cfg (dict): the model configuration
+    """
+    pspace = dm['multiverse'].pspace
+    coords = grid_coords(df, pspace, paths=_param_paths(dm))
+    subspace = {dim: np.asarray(mv_data.coords[dim].data) for dim in coords
+                if dim in mv_data.coords
+                and mv_data.coords[dim].size<len(coords[dim])}
+
+    return select_subspace(coords, pspace.default, subspace)
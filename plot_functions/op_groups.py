@@ -1,13 +1,12 @@
 import logging
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation
-import pandas as pd
 
 from utopya import DataManager, UniverseGroup
 from utopya.plotting import UniversePlotCreator, PlotHelper, is_plot_func
 
-from .data_analysis import data_by_group
+from .data_analysis import universe_group_stats
+from .parallel_frames import parallel_writer
 from .tools import setup_figure
 
 log = logging.getLogger(__name__)
@@ -26,7 +25,8 @@ def op_groups(dm: DataManager, *,
               title: str=None,
               val_range: tuple=(0., 1.)):
     """Plots an animated stacked histogram of the opinion distribution of
-       each group.
+       each group. With the 'ffmpeg_parallel' writer, the frames are rendered
+       in parallel (see ``parallel_frames.py``).
 
     Arguments:
         age_groups (list): The age intervals to be plotted in the final_ax
@@ -51,81 +51,73 @@ def op_groups(dm: DataManager, *,
 
     #datasets ..................................................................
     ageing = True if uni['cfg']['OpDisc']['mode'] == 'ageing' else False
-    if ageing:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'], dtype=int)
-    else:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'][0, :], dtype=int)
     num_groups = len(age_groups)-1 if ageing else uni['cfg']['OpDisc']['number_of_groups']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
-    opinions = uni['data/OpDisc/nw/opinion']
-    time = opinions.coords['time'].data
-    time_steps = opinions.coords['time'].size
 
     #data analysis .............................................................
-    #get opinions by group
-    to_plot = np.zeros((time_steps, num_bins, num_groups))
-    data_by_groups = data_by_group(opinions, groups, group_list, val_range,
-                                   num_bins, ageing=ageing)
-    #calculate a histogram of the opinion distribution at each time step
-    for t in range(time_steps):
-        for k in range(num_groups):
-            counts, _ = np.histogram(data_by_groups[k][t], bins=num_bins,
-                                     range=val_range)
-            to_plot[t, :, k] = counts[:]
+    #calculate a histogram of the opinion distribution of each group at each
+    #time step. The histograms are cached in the universe directory.
+    stats = universe_group_stats(dm, uni, group_list, ageing=ageing,
+                                 num_bins=num_bins, val_range=val_range)
+    to_plot = stats['hist']
+    time = stats['time']
+    time_steps = time.size
 
     #get pretty labels
     if ageing:
         labels = [f"Ages {group_list[_]}-{group_list[_+1]}" for _ in range(num_groups)]
-        max_age = np.amax(groups)
+        max_age = stats['max_group']
         if (age_groups[-1]>=max_age):
             labels[-1]=f"Ages {group_list[-2]}+"
     else:
         labels = [f"Group {_+1}" for _ in group_list]
 
-    #create pandas df for stacked bar plot
-    if not time_idx:
-        X = [pd.DataFrame(to_plot[_, :, :], columns=labels) for _ in range(time_steps)]
-    else:
-        X = pd.DataFrame(to_plot[time_idx, :, :], columns=labels)
-
     #plotting ..................................................................
-    #plot an animated stacked bar chart. Since there is no 'set height' function
-    #for pandas charts, we need to clear the axis and entirely reformat the plot
-    #for every frame. Clearing is necessary or else successive frames are simply
-    #superimposed
+    #plot an animated stacked bar chart. The bars of each group are created
+    #once; for every frame, only their heights and bottoms are updated
+    pos = np.arange(num_bins)
+    bars = [hlpr.ax.bar(pos, np.zeros(num_bins), width=0.5, label=labels[i])
+            for i in range(num_groups)]
+    time_text = hlpr.ax.text(0.02, 0.97, '', transform=hlpr.ax.transAxes,
+                             fontsize ='xx-small')
+    hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
+                                   ncol=num_groups, fontsize='xx-small')
+    hlpr.ax.set_xlim(-0.5, num_bins-0.5)
+    hlpr.ax.set_xticks([i for i in np.linspace(0, num_bins-1, 11)])
+    hlpr.ax.set_xticklabels([0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1])
+    hlpr.ax.set_xlabel(hlpr.axis_cfg['set_labels']['x'])
+    hlpr.ax.set_ylabel(hlpr.axis_cfg['set_labels']['y'])
+
+    def draw_frame(t: int):
+        """Sets the bars to the stacked histogram at time step t"""
+        tops = np.cumsum(to_plot[t, :, :], axis=1)
+        bottoms = tops-to_plot[t, :, :]
+        for i in range(num_groups):
+            for rect, height, bottom in zip(bars[i], to_plot[t, :, i], bottoms[:, i]):
+                rect.set_height(height)
+                rect.set_y(bottom)
+        hlpr.ax.set_ylim(0, 1.05*max(np.amax(tops[:, -1]), 1))
+        time_text.set_text(f'step {time[t]}')
+
     def update_data(stepsize: int=1):
         """Updates the data of the imshow objects"""
         if time_idx:
             log.info(f"Plotting discribution at time step {time[time_idx]} ...")
+            frames = [time_idx]
         else:
-            log.info(f"Plotting animation with {opinions.shape[0]//stepsize} frames ...")
-        next_frame_idx = 0
-        if time_steps < stepsize:
-            log.warn("Stepsize is greater than number of steps. "
-                          "Continue by plotting fist and last frame.")
-            stepsize=time_steps-1
-        for t in range(time_steps):
-            if t < next_frame_idx:
-                continue
-            hlpr.ax.clear()
-            hlpr.ax.set_xlim(0, 1)
-            if time_idx:
-                t = time_idx
-                im = X.plot.bar(stacked=True, ax=hlpr.ax, legend=False, rot=0)
-            else:
-                im = X[t].plot.bar(stacked=True, ax=hlpr.ax, legend=False, rot=0)
-            time_text = hlpr.ax.text(0.02, 0.97, '', transform=hlpr.ax.transAxes,
-                                     fontsize ='xx-small')
-            time_text.set_text(f'step {time[t]}')
-            hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
-                                           ncol=num_groups, fontsize='xx-small')
-            hlpr.ax.set_xticks([i for i in np.linspace(0, num_bins-1, 11)])
-            hlpr.ax.set_xticklabels([0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1])
-            hlpr.ax.set_xlabel(hlpr.axis_cfg['set_labels']['x'])
-            hlpr.ax.set_ylabel(hlpr.axis_cfg['set_labels']['y'])
-            if time_idx:
-                yield
-                break
-            next_frame_idx = t + stepsize
+            log.info(f"Plotting animation with {time_steps//stepsize} frames ...")
+            if time_steps < stepsize:
+                log.warn("Stepsize is greater than number of steps. "
+                              "Continue by plotting fist and last frame.")
+                stepsize=time_steps-1
+            frames = list(range(0, time_steps, max(stepsize, 1)))
+        #the parallel writer renders all frames at once
+        writer = parallel_writer(figure)
+        if writer is not None and len(frames)>1:
+            writer.render(draw_frame, frames)
+            yield
+            return
+        for t in frames:
+            draw_frame(t)
             yield
     hlpr.register_animation_update(update_data)
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 from utopya import DataManager, UniverseGroup
 from utopya.plotting import UniversePlotCreator, PlotHelper, is_plot_func
 
+from .data_io import discriminator_indices, universe_dataset, universe_time
+from .parallel_frames import parallel_writer
 from .tools import setup_figure
 
 log = logging.getLogger(__name__)
@@ -24,7 +26,9 @@ def opinion_animation(dm: DataManager, *,
 
     """Plots an animated histogram of the opinion distribution over time. If
     the model mode is 'conflict_undir', the opinion distribution of the
-    discriminators and non-discriminators is also shown.
+    discriminators and non-discriminators is also shown. With the
+    'ffmpeg_parallel' writer, the frames are rendered in parallel (see
+    ``parallel_frames.py``).
 
     Arguments:
         num_bins(int): Binning of the histogram
@@ -48,28 +52,26 @@ def opinion_animation(dm: DataManager, *,
     hlpr.attach_figure_and_axes(fig=figure, axes=axs)
 
     #datasets...................................................................
-    opinions    = uni['data/OpDisc/nw/opinion']
-    time        = opinions['time'].data
+    #the opinions are read one time slice at a time; the file is closed once
+    #the animation is complete
+    opinions    = universe_dataset(uni, 'opinion')
+    time        = universe_time(uni)
     time_steps  = time.size
-    #dict containing the data to plot, as well axis-specific info
-    to_plot = {'all': {'data': opinions, 'axs_idx': 1, 'text': '',
+    #dict containing the vertices to plot, as well axis-specific info
+    to_plot = {'all': {'idx': None, 'axs_idx': 1, 'text': '',
                            'color': 'dodgerblue'}}
 
     #data analysis..............................................................
     if disc_plot:
-        #calculate the opinions of only the discriminators and non-discriminators
-        #respectively and add to the dict
-        discriminators = uni['data/OpDisc/nw/discriminators']
+        #the discriminators and non-discriminators are selected via the indices
+        #of the respective vertices
+        disc, nondisc = discriminator_indices(uni['data/OpDisc/nw/discriminators'])
         p_disc = uni['cfg']['OpDisc']['discriminators']
-        mask = np.empty(opinions.shape, dtype=bool)
-        mask[:,:] = (discriminators == 0)
-        ops_disc = np.ma.MaskedArray(opinions, mask)
-        ops_nondisc = np.ma.MaskedArray(opinions, ~mask)
 
-        to_plot['disc'] = {'data': ops_disc, 'axs_idx': 2,
+        to_plot['disc'] = {'idx': disc, 'axs_idx': 2,
             'color': 'teal', 'text': f'discriminators ($p_d$={p_disc})'}
 
-        to_plot['nondisc'] = {'data': ops_nondisc, 'axs_idx': 3,
+        to_plot['nondisc'] = {'idx': nondisc, 'axs_idx': 3,
             'color': 'mediumaquamarine',
             'text': f'discriminators ($1-p_d$={1-p_disc})'}
 
@@ -80,12 +82,17 @@ def opinion_animation(dm: DataManager, *,
 
         return counts, bin_edges, bin_pos
 
+    def get_slice(key: str, t: int) -> np.ndarray:
+        """Returns the opinions of the vertices to plot at time step t"""
+        ops = opinions[t]
+        return ops if to_plot[key]['idx'] is None else ops[to_plot[key]['idx']]
+
     bars = {}
-    t = time_idx if time_idx else range(time_steps)
+    t = time_idx if time_idx else 0
     #calculate histograms, set axis ranges, set axis descriptions in upper left
     #corners
     for key in to_plot.keys():
-        counts, bin_edges, pos = get_hist_data(to_plot[key]['data'][t, :])
+        counts, bin_edges, pos = get_hist_data(get_slice(key, t))
         hlpr.select_axis(0, to_plot[key]['axs_idx'])
         hlpr.ax.set_xlim(val_range)
         bars[key] = hlpr.ax.bar(pos, counts, width=np.diff(bin_edges),
@@ -97,45 +104,46 @@ def opinion_animation(dm: DataManager, *,
                                           transform=hlpr.ax.transAxes)
 
     #animate....................................................................
+    def draw_frame(t: int):
+        """Sets the bar heights to the histograms at time step t"""
+        for key in to_plot.keys():
+            hlpr.select_axis(0, to_plot[key]['axs_idx'])
+            counts_at_t, _, _ = get_hist_data(get_slice(key, t))
+            for idx, rect in enumerate(bars[key]):
+                rect.set_height(counts_at_t[idx])
+            if key == 'all':
+                to_plot[key]['text'].set_text(f'step {time[t]}')
+                hlpr.ax.relim()
+                hlpr.ax.autoscale_view(scalex=False)
+                y_max = hlpr.ax.get_ylim()
+            else:
+                #rescale ylim to same value for all plots
+                hlpr.ax.set_ylim(y_max)
+
     def update_data(stepsize: int=1):
         """Updates the data of the imshow objects"""
         if time_idx:
             log.info(f"Plotting distribution at time step {time[time_idx]} ...")
+            frames = [time_idx]
         else:
-            log.info(f"Plotting animation with {opinions.shape[0] // stepsize} "
+            log.info(f"Plotting animation with {time_steps // stepsize} "
                       "frames ...")
-        next_frame_idx = 0
-        if time_steps < stepsize:
-            log.warn("Stepsize is greater than number of steps. Continue by "
-                     "plotting fist and last frame.")
-            stepsize=time_steps-1
-        for t in range(time_steps):
-            if t < next_frame_idx:
-                continue
-            if time_idx:
-                t = time_idx
-            for key in to_plot.keys():
-                hlpr.select_axis(0, to_plot[key]['axs_idx'])
-                data = to_plot[key]['data'][t, :]
-                if key != 'all':
-                    #for disc/non-disc plots, the data is a masked array and needs
-                    #to be compressed (removing None values)
-                    data = data.compressed()
-                counts_at_t, _, _ = get_hist_data(data)
-                for idx, rect in enumerate(bars[key]):
-                    rect.set_height(counts_at_t[idx])
-                if key == 'all':
-                    to_plot[key]['text'].set_text(f'step {time[t]}')
-                    hlpr.ax.relim()
-                    hlpr.ax.autoscale_view(scalex=False)
-                    y_max = hlpr.ax.get_ylim()
-                else:
-                    #rescale ylim to same value for all plots
-                    hlpr.ax.set_ylim(y_max)
-            if time_idx:
+            if time_steps < stepsize:
+                log.warn("Stepsize is greater than number of steps. Continue by "
+                         "plotting fist and last frame.")
+                stepsize=time_steps-1
+            frames = list(range(0, time_steps, max(stepsize, 1)))
+        try:
+            #the parallel writer renders all frames at once
+            writer = parallel_writer(figure)
+            if writer is not None and len(frames)>1:
+                writer.render(draw_frame, frames, init_worker=opinions.reopen)
+                yield
+                return
+            for t in frames:
+                draw_frame(t)
                 yield
-                break
-            next_frame_idx = t + stepsize
-            yield
+        finally:
+            opinions.close()
 
     hlpr.register_animation_update(update_data)
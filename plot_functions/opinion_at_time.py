@@ -1,13 +1,13 @@
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from matplotlib import rc
 
 from utopya import DataManager, UniverseGroup
 from utopya.plotting import is_plot_func, UniversePlotCreator, PlotHelper
 
-from .data_analysis import data_by_group
+from .data_io import discriminator_indices, universe_dataset, universe_time
+from .grouped_stats import grouped_stats
 from .tools import setup_figure
 
 #matplotlib.rcParams['mathtext.fontset']='stix'
@@ -55,15 +55,15 @@ def opinion_at_time(dm: DataManager,
     #datasets...................................................................
     mode = uni['cfg']['OpDisc']['mode']
     ageing = True if mode=='ageing' else False
-    time_idx = int(time_step*(uni['data/OpDisc/nw/opinion']['time'].size-1))
-    opinions = uni['data/OpDisc/nw/opinion']
-    if ageing:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'], dtype=int)
-    else:
-        groups = np.asarray(uni['data/OpDisc/nw/group_label'][0, :], dtype=int)
+    time = universe_time(uni)
+    time_idx = int(time_step*(time.size-1))
+    #only the selected time step is read
+    with universe_dataset(uni, 'opinion') as data:
+        opinions = data[time_idx]
+    with universe_dataset(uni, 'group_label') as data:
+        groups = np.asarray(data[time_idx if ageing else 0], dtype=int)
     num_groups = len(age_groups)-1 if ageing else uni['cfg']['OpDisc']['number_of_groups']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
-    time = uni['data/OpDisc/nw/opinion'].coords['time'].data
 
     #figure setup ..............................................................
     figure, axs = setup_figure(uni['cfg'], plot_name='opinion')
@@ -72,16 +72,10 @@ def opinion_at_time(dm: DataManager,
 
     # data analysis and plotting................................................
     if to_plot == 'by_group':
-        #get opinions by group
-        to_plot = np.zeros((num_bins, num_groups))
-        data_by_groups = data_by_group(opinions, groups, group_list, val_range,
-                                       num_bins, ageing=ageing)
-
-        #calculate a histogram of the opinion distribution at each time step
-        for k in range(num_groups):
-            counts, _ = np.histogram(data_by_groups[k][time_idx], bins=num_bins,
-                                         range=val_range)
-            to_plot[:, k] = counts[:]
+        #calculate a histogram of the opinion distribution of each group at the
+        #time step
+        to_plot = grouped_stats(opinions, groups, group_list, ageing=ageing,
+                                num_bins=num_bins, val_range=val_range)['hist'][0]
 
         #get pretty labels
         if ageing:
@@ -91,6 +85,7 @@ def opinion_at_time(dm: DataManager,
                 labels[-1]=f"Ages {group_list[-2]}+"
         else:
             labels = [f"Group {_+1}" for _ in group_list]
+        import pandas as pd
         X = pd.DataFrame(to_plot[:, :], columns=labels)
         X.plot.bar(stacked=True, ax=hlpr.ax, legend=False, rot=0, **plot_kwargs)
         hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
@@ -100,17 +95,13 @@ def opinion_at_time(dm: DataManager,
 
 
     elif to_plot == 'overall':
-        hlpr.ax.hist(opinions[time_idx][:], bins=num_bins, alpha=1, **plot_kwargs)
+        hlpr.ax.hist(opinions, bins=num_bins, alpha=1, **plot_kwargs)
 
     elif to_plot == 'discriminators':
-        discriminators = uni['data/OpDisc/nw/discriminators']
-        mask = np.empty(opinions.shape, dtype=bool)
-        mask[:,:] = (discriminators == 0)
-        ops_disc = np.ma.MaskedArray(opinions, mask)
-        ops_nondisc = np.ma.MaskedArray(opinions, ~mask)
-        hlpr.ax.hist(ops_disc[time_idx].compressed()[:], bins=num_bins, alpha=0.5, **plot_kwargs, label='disc')
-        hlpr.ax.hist(ops_nondisc[time_idx].compressed()[:], bins=num_bins, alpha=0.5, **plot_kwargs, label='non-disc')
-        hlpr.ax.hist(opinions[time_idx][:], bins=num_bins, alpha=1, **plot_kwargs, histtype='step')
+        disc, nondisc = discriminator_indices(uni['data/OpDisc/nw/discriminators'])
+        hlpr.ax.hist(opinions[disc], bins=num_bins, alpha=0.5, **plot_kwargs, label='disc')
+        hlpr.ax.hist(opinions[nondisc], bins=num_bins, alpha=0.5, **plot_kwargs, label='non-disc')
+        hlpr.ax.hist(opinions, bins=num_bins, alpha=1, **plot_kwargs, histtype='step')
         hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
                        ncol=num_groups, fontsize='xx-small')
         hlpr.ax.set_xlim(val_range[0], val_range[1])
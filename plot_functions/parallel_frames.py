@@ -0,0 +1,149 @@
+"""Parallel rendering of animation frames for the OpDisc plots.
+
+The 'ffmpeg_parallel' movie writer is selected like any other writer through
+the ``animation`` configuration of a plot, e.g.::
+
+    animation:
+      writer: ffmpeg_parallel
+      writer_kwargs:
+        ffmpeg_parallel:
+          init: {fps: 8, num_workers: 8}
+          saving: {dpi: 300}
+
+Animations supporting it (see ``parallel_writer``) hand their frames to the
+writer, which splits them into contiguous blocks that are rendered by a pool of
+worker processes. The workers are forked from the plotting process and thus
+share its figure and data; open files are reopened by each worker through an
+initializer. The rendered frames are streamed to ffmpeg in order, so that the
+wall time of the animation scales with the number of cores. Animations that
+do not support it are written frame by frame, as with the 'ffmpeg' writer.
+"""
+import io
+import logging
+import multiprocessing
+import os
+from matplotlib.animation import FFMpegWriter, writers
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+#the number of blocks per worker; more blocks reduce the memory held by the
+#rendered frames waiting to be written
+BLOCKS_PER_WORKER = 4
+
+#the figure and frame drawing function, shared with the worker processes
+_FIGURE = None
+_DRAW_FRAME = None
+_SAVEFIG_KWARGS = None
+
+#the writers of the figures currently being saved, keyed by the figure ids
+_WRITERS = {}
+
+## -----------------------------------------------------------------------------
+def frame_blocks(frames: list, num_blocks: int) -> list:
+    """Splits a list of frames into contiguous blocks of (almost) equal size.
+
+    Arguments:
+        frames (list): the frames
+        num_blocks (int): the number of blocks
+
+    Returns:
+        blocks (list): the list of non-empty blocks
+    """
+    num_blocks = max(1, min(num_blocks, len(frames)))
+    size, rest = divmod(len(frames), num_blocks)
+    blocks, start = [], 0
+    for i in range(num_blocks):
+        stop = start+size+(1 if i<rest else 0)
+        blocks.append(frames[start:stop])
+        start = stop
+
+    return blocks
+
+## -----------------------------------------------------------------------------
+def _render_block(block: list) -> list:
+    """Renders a block of frames of the shared figure to buffers"""
+    buffers = []
+    for frame in block:
+        _DRAW_FRAME(frame)
+        buf = io.BytesIO()
+        _FIGURE.savefig(buf, **_SAVEFIG_KWARGS)
+        buffers.append(buf.getvalue())
+
+    return buffers
+
+## -----------------------------------------------------------------------------
+def parallel_writer(figure):
+    """Returns the 'ffmpeg_parallel' writer currently saving a figure, or None
+    if the figure is not saved by one. Called by the animation update
+    generators, which are iterated while the writer is saving."""
+    return _WRITERS.get(id(figure))
+
+## -----------------------------------------------------------------------------
+@writers.register('ffmpeg_parallel')
+class ParallelFFMpegWriter(FFMpegWriter):
+    """An ffmpeg pipe writer rendering the frames of an animation in parallel.
+
+    The frames grabbed from the figure are written as by the 'ffmpeg' writer;
+    frames passed to ``render`` are rendered by a pool of worker processes.
+    """
+    def __init__(self, *args, num_workers: int=None, **kwargs):
+        """Initializes the writer.
+
+        Arguments:
+            *args: passed to FFMpegWriter, e.g. the fps
+            num_workers (int, optional): the number of worker processes.
+                Defaults to the number of cores.
+            **kwargs: passed to FFMpegWriter, e.g. the codec
+        """
+        super().__init__(*args, **kwargs)
+        self.num_workers = num_workers if num_workers else os.cpu_count()
+        self._rendered = False
+
+    def setup(self, fig, outfile, dpi=None):
+        """Starts ffmpeg and marks the figure as saved by this writer"""
+        super().setup(fig, outfile, dpi=dpi)
+        _WRITERS[id(fig)] = self
+
+    def finish(self):
+        """Finishes the video and releases the figure"""
+        _WRITERS.pop(id(self.fig), None)
+        super().finish()
+
+    def grab_frame(self, **savefig_kwargs):
+        """Grabs the current frame of the figure, unless the animation was
+        rendered in parallel"""
+        if not self._rendered:
+            super().grab_frame(**savefig_kwargs)
+
+    def render(self, draw_frame: Callable, frames: list, *,
+               init_worker: Callable=None):
+        """Renders the frames of the animation in parallel and writes them to
+        the video. The frames grabbed afterwards are discarded.
+
+        Arguments:
+            draw_frame (Callable): updates the figure to show the given frame
+            frames (list): the frames, in order, each passed to draw_frame
+            init_worker (Callable, optional): called once in each worker
+                process before rendering, eg. to reopen the files read by
+                draw_frame
+        """
+        global _FIGURE, _DRAW_FRAME, _SAVEFIG_KWARGS
+        #all frames must have the size the video was set up with
+        self.fig.set_size_inches(self._w, self._h)
+        _FIGURE, _DRAW_FRAME = self.fig, draw_frame
+        _SAVEFIG_KWARGS = dict(format=self.frame_format, dpi=self.dpi)
+        blocks = frame_blocks(list(frames), self.num_workers*BLOCKS_PER_WORKER)
+
+        log.info(f"Rendering {len(frames)} frames with {self.num_workers} "
+                 "workers ...")
+        try:
+            with multiprocessing.get_context('fork').Pool(
+                    self.num_workers, initializer=init_worker) as pool:
+                #imap returns the blocks in order while the workers render ahead
+                for buffers in pool.imap(_render_block, blocks):
+                    for buf in buffers:
+                        self._proc.stdin.write(buf)
+        finally:
+            _FIGURE, _DRAW_FRAME, _SAVEFIG_KWARGS = None, None, None
+        self._rendered = True
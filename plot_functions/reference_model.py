@@ -0,0 +1,469 @@
+"""A NumPy reference implementation of the OpDisc model.
+
+The model dynamics are reimplemented with NumPy, vectorized over many
+independent replicas of the users: in each step, every replica draws a random
+pair of users, whose revision is computed for all replicas at once. The
+parameters may differ between the replicas, so that a whole parameter sweep
+runs as a single vectorized simulation in one process (see
+``parameter_grid``). This allows quick explorations of small systems without
+building the C++ model, and serves as a reference for cross-checking it.
+
+The update rules follow ``utils::update_opinion``, ``update_opinion_disc`` and
+``reject_opinion``, the mode dispatch of ``revision::user_revision`` and the
+ageing rules of ``aging::user_revision`` in the sequential update scheme. The
+random number streams differ from those of the model, so that single runs are
+only comparable statistically.
+
+The opinions are returned in the (time, seed, vertex) layout of the model's
+datasets with several replicas, so that ``run['opinion'][:, r]`` is the
+(time, vertex) opinion dataset of replica r, as consumed by the data analysis
+functions.
+"""
+import logging
+import numpy as np
+from typing import Tuple
+
+log = logging.getLogger(__name__)
+
+#the model modes
+MODES = ('ageing', 'conflict_dir', 'conflict_undir', 'isolated_1',
+         'isolated_2', 'reduced_int_prob', 'reduced_s')
+
+#the parameters that may differ between the replicas
+REPLICA_PARAMS = ('discriminators', 'homophily_parameter', 'tolerance',
+                  'susceptibility', 'life_expectancy', 'peer_radius',
+                  'time_scale')
+
+#the age of reinitialised users, and the age band of their parents
+CHILD_AGE = 10.
+PARENT_AGES = (20., 40.)
+
+## -----------------------------------------------------------------------------
+def tolerance_func(opinion, tolerance):
+    """Returns the tolerance as a function of the opinion: users with extreme
+    opinions have a reduced tolerance."""
+    return tolerance*(1-2*(opinion-0.5)**2)
+
+## -----------------------------------------------------------------------------
+def rejection_func(op_1, op_2, susc) -> np.ndarray:
+    """Returns the new opinions op_1 after rejecting the opinions op_2.
+
+    Arguments:
+        op_1 (array): the opinions of the revising users
+        op_2 (array): the opinions of their partners
+        susc (array): the susceptibilities of the revising users
+
+    Returns:
+        opinion (ndarray): the new opinions
+    """
+    op_1, op_2 = np.asarray(op_1, dtype=float), np.asarray(op_2, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        down = op_1*(1.-susc*((op_2-op_1)/(1.-op_1)))
+        up = op_1 + susc*((1.-op_1)*(op_1-op_2)/op_1)
+    opinion = np.where(op_1<op_2, down, up)
+
+    #the special cases, in reverse order of precedence
+    opinion = np.where(op_2==1., op_1*(1.-susc), opinion)
+    opinion = np.where(op_2==0., op_1 + susc*(1.-op_1), opinion)
+
+    return np.where((op_1==0.) | (op_1==1.), op_1, opinion)
+
+## -----------------------------------------------------------------------------
+def update_opinion(op, nb_op, tolerance, susc) -> np.ndarray:
+    """Returns the opinions op after the attraction towards the opinions nb_op,
+    for the users whose tolerance range includes nb_op."""
+    return np.where(np.fabs(op-nb_op)<=tolerance, op + susc*(nb_op-op), op)
+
+## -----------------------------------------------------------------------------
+def reject_opinion(op, nb_op, tolerance, susc) -> np.ndarray:
+    """Returns the opinions op after the rejection of the opinions nb_op, for
+    the users whose tolerance range includes nb_op."""
+    return np.where(np.fabs(op-nb_op)<=tolerance,
+                    rejection_func(op, nb_op, susc), op)
+
+## -----------------------------------------------------------------------------
+def revise_pairs(mode: str, v: dict, nb: dict, *,
+                 susceptibility, homophily_parameter,
+                 peer_radius=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Applies the interaction rules of a model mode to pairs of users.
+
+    Arguments:
+        mode (str): the model mode
+        v (dict): the 'opinion', 'group', 'discriminates' and 'tolerance' of
+            the first user of each pair
+        nb (dict): the same for the second user of each pair
+        susceptibility (array): the susceptibility of each pair
+        homophily_parameter (array): the homophily parameter of each pair
+        peer_radius (array, optional): the peer radius of each pair, for the
+            ageing mode
+
+    Returns:
+        opinions (Tuple[ndarray, ndarray]): the new opinions of the users
+    """
+    s_1 = susceptibility
+    s_2 = susceptibility*(1-homophily_parameter)
+    op_v, op_nb = v['opinion'], nb['opinion']
+    tol_v, tol_nb = v['tolerance'], nb['tolerance']
+
+    #the interaction between members of the same group is always the same
+    if mode=='ageing':
+        same = np.fabs(v['group']-nb['group'])<peer_radius
+    else:
+        same = v['group']==nb['group']
+    same_v = update_opinion(op_v, op_nb, tol_v, s_1)
+    same_nb = update_opinion(op_nb, op_v, tol_nb, s_1)
+
+    #the inter-group interaction of the mode
+    if mode in ('ageing', 'conflict_dir'):
+        lower = v['group']<nb['group']
+        new_v = np.where(lower, reject_opinion(op_v, op_nb, tol_v, s_1),
+                         update_opinion(op_v, op_nb, tol_v, s_2))
+        new_nb = np.where(lower, update_opinion(op_nb, op_v, tol_nb, s_2),
+                          reject_opinion(op_nb, op_v, tol_nb, s_1))
+    elif mode=='conflict_undir':
+        new_v = np.where(v['discriminates'],
+                         reject_opinion(op_v, op_nb, tol_v, s_1),
+                         update_opinion(op_v, op_nb, tol_v, s_2))
+        new_nb = np.where(nb['discriminates'],
+                          reject_opinion(op_nb, op_v, tol_nb, s_1),
+                          update_opinion(op_nb, op_v, tol_nb, s_2))
+    elif mode=='isolated_1':
+        new_v = np.where(v['discriminates'], op_v, same_v)
+        new_nb = np.where(nb['discriminates'], op_nb, same_nb)
+    elif mode=='isolated_2':
+        interact = ~(v['discriminates'] | nb['discriminates'])
+        new_v = np.where(interact, same_v, op_v)
+        new_nb = np.where(interact, same_nb, op_nb)
+    elif mode=='reduced_int_prob':
+        #the homophilic choice of partners happens before the revision
+        new_v, new_nb = same_v, same_nb
+    elif mode=='reduced_s':
+        new_v = update_opinion(op_v, op_nb, tol_v, s_2)
+        new_nb = update_opinion(op_nb, op_v, tol_nb, s_2)
+    else:
+        raise ValueError(f"Invalid model mode '{mode}'! Choose from: "
+                         f"{', '.join(MODES)}.")
+
+    return np.where(same, same_v, new_v), np.where(same, same_nb, new_nb)
+
+## -----------------------------------------------------------------------------
+def initialize(mode: str, rng, *, num_replicas: int, num_users: int,
+               number_of_groups: int, extremism: bool, **params) -> dict:
+    """Initialises the users of all replicas as ``utils::initialize`` does.
+
+    Arguments:
+        mode (str): the model mode
+        rng (np.random.Generator): the random number generator
+        num_replicas (int): the number of replicas
+        num_users (int): the number of users per replica
+        number_of_groups (int): the number of groups
+        extremism (bool): whether the tolerance depends on the opinion
+        **params: the per-replica parameters (see ``REPLICA_PARAMS``), as
+            arrays of shape (num_replicas,)
+
+    Returns:
+        users (dict): the (replica, vertex) arrays of the 'opinion', 'group',
+            'discriminates' and 'tolerance' of the users
+    """
+    shape = (num_replicas, num_users)
+    column = lambda name: params[name][:, np.newaxis]
+
+    #the groups or ages
+    if mode=='ageing':
+        group = rng.uniform(10., column('life_expectancy'), shape)
+    elif mode in ('conflict_dir', 'conflict_undir'):
+        group = rng.integers(0, number_of_groups, shape)
+    else:
+        #distribute the users equally among the groups (the groups at the
+        #edges only have half as many users)
+        q = number_of_groups-1 if number_of_groups>2 else number_of_groups
+        group = np.arange(num_users)%q
+        if number_of_groups>2:
+            zeros = group==0
+            group[zeros] = q*((np.cumsum(zeros)[zeros]-1)%2)
+        group = np.repeat(group[np.newaxis, :], num_replicas, axis=0)
+
+    #the opinions: uniform, or normally distributed around the group mean and
+    #truncated to [0, 1]
+    if (mode in ('ageing', 'conflict_dir', 'conflict_undir')
+        or number_of_groups==1):
+        opinion = rng.uniform(0., 1., shape)
+    else:
+        mean = group/(number_of_groups-1)
+        stddev = 1./(2*(number_of_groups-1))
+        opinion = rng.normal(mean, stddev)
+        outside = (opinion<0) | (opinion>1)
+        while outside.any():
+            opinion[outside] = rng.normal(mean[outside], stddev)
+            outside = (opinion<0) | (opinion>1)
+
+    if extremism:
+        tolerance = tolerance_func(opinion, column('tolerance'))
+    else:
+        tolerance = np.repeat(column('tolerance'), num_users, axis=1)
+
+    discriminates = np.zeros(shape, dtype=bool)
+    if mode in ('isolated_1', 'isolated_2'):
+        discriminates = rng.random(shape)<column('homophily_parameter')
+    elif mode=='conflict_undir':
+        discriminates = rng.random(shape)<column('discriminators')
+
+    return dict(opinion=opinion, group=group, discriminates=discriminates,
+                tolerance=tolerance)
+
+## -----------------------------------------------------------------------------
+def parameter_grid(num_seeds: int=1, **params) -> Tuple[dict, tuple]:
+    """Returns the per-replica parameters of a sweep over the Cartesian product
+    of the given parameter values, with num_seeds replicas per point. The seeds
+    are the fastest-varying axis, so that a (time, replica, vertex) dataset of
+    the sweep is reshaped into (time, *shape, vertex) by
+    ``data.reshape(-1, *shape, data.shape[-1])``.
+
+    Arguments:
+        num_seeds (int, optional): the number of replicas per parameter point
+        **params: the values of each swept parameter
+
+    Returns:
+        params (dict): the per-replica parameter arrays, which are passed to
+            ``simulate`` together with num_replicas=np.prod(shape)
+        shape (tuple): the shape of the sweep, i.e. the number of values of
+            each parameter, followed by num_seeds
+    """
+    values = [np.asarray(vals, dtype=float) for vals in params.values()]
+    shape = tuple(len(vals) for vals in values)+(num_seeds,)
+    grids = np.meshgrid(*values, np.arange(num_seeds), indexing='ij')
+
+    return {name: grid.ravel() for name, grid in zip(params, grids)}, shape
+
+## -----------------------------------------------------------------------------
+def simulate(mode: str, *, num_users: int, num_steps: int,
+             num_replicas: int=1, write_every: int=1, write_start: int=0,
+             seed: int=None, number_of_groups: int=2,
+             discriminators=0.3, homophily_parameter=0.4, tolerance=0.4,
+             susceptibility=0.4, extremism: bool=False,
+             life_expectancy=80., peer_radius=10., time_scale=1.,
+             block_size: int=1000) -> dict:
+    """Simulates independent replicas of the users in the sequential update
+    scheme: in each step, a random pair of users of every replica has a
+    revision opportunity. The data is recorded at the write times of the
+    model, i.e. at the steps write_start, write_start+write_every, ... up to
+    num_steps, where step 0 is the initial state.
+
+    The parameters listed in ``REPLICA_PARAMS`` are either scalars or arrays
+    of shape (num_replicas,), giving the parameters of each replica.
+
+    Arguments:
+        mode (str): the model mode
+        num_users (int): the number of users per replica
+        num_steps (int): the number of steps
+        num_replicas (int, optional): the number of replicas
+        write_every (int, optional): the number of steps between the writes
+        write_start (int, optional): the first write time
+        seed (int, optional): the seed of the random number generator
+        number_of_groups (int, optional): the number of groups
+        discriminators (optional): the proportion of discriminators
+            (conflict_undir)
+        homophily_parameter (optional): the homophily parameter
+        tolerance (optional): the tolerance
+        susceptibility (optional): the susceptibility
+        extremism (bool, optional): whether users with extreme opinions have
+            a reduced tolerance
+        life_expectancy (optional): the life expectancy (ageing)
+        peer_radius (optional): the peer radius (ageing)
+        time_scale (optional): the ageing per revision (ageing)
+        block_size (int, optional): the number of steps for which the random
+            pairs are drawn at once
+
+    Returns:
+        run (dict): the 'time' of the writes; the 'opinion' at each write
+            time, of shape (time, seed, vertex); the 'group_label' of the
+            users, of shape (seed, vertex), or (time, seed, vertex) for the
+            ages of the ageing mode; and the 'discriminators' of shape
+            (seed, vertex)
+
+    Raises:
+        ValueError: on an invalid mode, or parameters of the wrong shape
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid model mode '{mode}'! Choose from: "
+                         f"{', '.join(MODES)}.")
+    if num_users<2:
+        raise ValueError("At least two users are needed for the revisions!")
+
+    #the parameters of each replica
+    values = dict(discriminators=discriminators,
+                  homophily_parameter=homophily_parameter,
+                  tolerance=tolerance, susceptibility=susceptibility,
+                  life_expectancy=life_expectancy, peer_radius=peer_radius,
+                  time_scale=time_scale)
+    params = {}
+    for name, val in values.items():
+        val = np.asarray(val, dtype=float)
+        if val.ndim and val.shape!=(num_replicas,):
+            raise ValueError(f"The parameter '{name}' must be a scalar or of "
+                             f"shape ({num_replicas},), but has shape "
+                             f"{val.shape}!")
+        params[name] = np.broadcast_to(val, (num_replicas,))
+
+    rng = np.random.default_rng(seed)
+    users = initialize(mode, rng, num_replicas=num_replicas,
+                       num_users=num_users, number_of_groups=number_of_groups,
+                       extremism=extremism, **params)
+    replicas = np.arange(num_replicas)
+
+    #the members of each group, for the homophilic choice of partners
+    if mode=='reduced_int_prob':
+        members = np.argsort(users['group'], axis=1, kind='stable')
+        group_size = np.stack([np.bincount(groups, minlength=number_of_groups)
+                               for groups in users['group']])
+        group_start = np.cumsum(group_size, axis=1)-group_size
+
+    #the write times and the recorded data
+    times = np.arange(write_start, num_steps+1, write_every)
+    opinions = np.empty((times.size, num_replicas, num_users))
+    ages = (np.empty((times.size, num_replicas, num_users))
+            if mode=='ageing' else None)
+    num_writes = 0
+
+    def write():
+        nonlocal num_writes
+        opinions[num_writes] = users['opinion']
+        if ages is not None:
+            ages[num_writes] = users['group']
+        num_writes += 1
+
+    def user_attrs(vertices) -> dict:
+        return {key: vals[replicas, vertices] for key, vals in users.items()}
+
+    def age_users(vertices, u_parent, u_opinion):
+        """Ages the users, reinitialising those older than the life expectancy
+        as children with the opinion of a random parent"""
+        age = users['group'][replicas, vertices]
+        dead = age>params['life_expectancy']
+        users['group'][replicas, vertices] = np.where(dead, CHILD_AGE,
+                                                      age+params['time_scale'])
+        if not dead.any():
+            return
+
+        #draw a parent other than the child from the parent age band
+        reps, children = replicas[dead], vertices[dead]
+        parents = ((users['group'][reps]>=PARENT_AGES[0])
+                   & (users['group'][reps]<=PARENT_AGES[1]))
+        parents[np.arange(reps.size), children] = False
+        num_parents = parents.sum(axis=1)
+        k = np.floor(u_parent[dead]*num_parents)
+        parent = np.argmax(np.cumsum(parents, axis=1)>k[:, np.newaxis], axis=1)
+        opinion = np.where(num_parents>0, users['opinion'][reps, parent],
+                           u_opinion[dead])
+        users['opinion'][reps, children] = opinion
+        if extremism:
+            users['tolerance'][reps, children] = tolerance_func(
+                                                    opinion,
+                                                    params['tolerance'][dead])
+
+    if write_start==0:
+        write()
+
+    for block_start in range(1, num_steps+1, block_size):
+        block = min(block_size, num_steps+1-block_start)
+
+        #draw the random pairs and the random numbers of the block at once
+        shape = (block, num_replicas)
+        v_block = rng.integers(0, num_users, shape)
+        nb_block = rng.integers(0, num_users-1, shape)
+        nb_block += nb_block>=v_block
+        if mode in ('reduced_int_prob', 'ageing'):
+            u_block = rng.random((4,)+shape)
+
+        for i in range(block):
+            v, nb = v_block[i], nb_block[i]
+
+            #users of different groups interact with probability
+            #1-homophily_parameter; otherwise, a partner from the same group is
+            #chosen, if there is any
+            if mode=='reduced_int_prob':
+                group = users['group'][replicas, v]
+                size = group_size[replicas, group]
+                start = group_start[replicas, group]
+                choose = ((group!=users['group'][replicas, nb])
+                          & (u_block[0, i]<=params['homophily_parameter'])
+                          & (size>1))
+                peer = members[replicas,
+                               start + np.floor(u_block[1, i]*(size-1)).astype(int)]
+                peer = np.where(peer==v, members[replicas, start+size-1], peer)
+                nb = np.where(choose, peer, nb)
+
+            attrs_v, attrs_nb = user_attrs(v), user_attrs(nb)
+            op_v, op_nb = revise_pairs(mode, attrs_v, attrs_nb,
+                                   susceptibility=params['susceptibility'],
+                                   homophily_parameter=params['homophily_parameter'],
+                                   peer_radius=params['peer_radius'])
+            users['opinion'][replicas, v] = op_v
+            users['opinion'][replicas, nb] = op_nb
+            if extremism:
+                users['tolerance'][replicas, v] = tolerance_func(
+                                                    op_v, params['tolerance'])
+                users['tolerance'][replicas, nb] = tolerance_func(
+                                                    op_nb, params['tolerance'])
+
+            if mode=='ageing':
+                age_users(v, u_block[0, i], u_block[1, i])
+                age_users(nb, u_block[2, i], u_block[3, i])
+
+            time = block_start+i
+            if time>=write_start and (time-write_start)%write_every==0:
+                write()
+
+    group_label = ages if mode=='ageing' else users['group']
+
+    return dict(time=times, opinion=opinions, group_label=group_label,
+                discriminators=users['discriminates'])
+
+## -----------------------------------------------------------------------------
+def simulate_cfg(cfg: dict, *, num_replicas: int=None, seed: int=None,
+                 **kwargs) -> dict:
+    """Simulates a universe configuration of the model, e.g. ``uni['cfg']``,
+    for cross-checks against the model. All write times are recorded,
+    regardless of the write schedule.
+
+    Arguments:
+        cfg (dict): the universe configuration, with the model configuration
+            under 'OpDisc' and the num_steps, write_every, write_start and
+            seed entries
+        num_replicas (int, optional): the number of replicas; defaults to the
+            num_replicas of the model configuration
+        seed (int, optional): the seed; defaults to the seed of the universe
+        **kwargs: passed on to ``simulate``, overriding the configuration
+
+    Returns:
+        run (dict): the simulated run (see ``simulate``)
+
+    Raises:
+        ValueError: for the parallel_matching update scheme, which is not
+            implemented
+    """
+    model_cfg = cfg['OpDisc']
+    if model_cfg.get('update_scheme', 'sequential')!='sequential':
+        raise ValueError("Only the sequential update scheme is implemented!")
+    ageing_cfg = model_cfg.get('ageing', {})
+
+    run_kwargs = dict(
+        num_users=model_cfg['nw']['num_vertices'],
+        num_steps=cfg['num_steps'],
+        num_replicas=(num_replicas if num_replicas is not None
+                      else model_cfg.get('num_replicas', 1)),
+        write_every=cfg.get('write_every', 1),
+        write_start=cfg.get('write_start', 0),
+        seed=seed if seed is not None else cfg.get('seed'),
+        number_of_groups=model_cfg['number_of_groups'],
+        discriminators=model_cfg['discriminators'],
+        homophily_parameter=model_cfg['homophily_parameter'],
+        tolerance=model_cfg['tolerance'],
+        susceptibility=model_cfg['susceptibility'],
+        extremism=model_cfg.get('extremism', False),
+        life_expectancy=ageing_cfg.get('life_expectancy', 80.),
+        peer_radius=ageing_cfg.get('peer_radius', 10.),
+        time_scale=ageing_cfg.get('time_scale', 1.))
+    run_kwargs.update(kwargs)
+
+    return simulate(model_cfg['mode'], **run_kwargs)
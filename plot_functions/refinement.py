@@ -0,0 +1,214 @@
+"""Adaptive refinement of two-dimensional parameter sweeps.
+
+Instead of a uniform grid, the parameter plane is covered by a quadtree of
+cells. A coarse grid of points is evaluated first. Then, in each round, the
+cells across which the observable changes most are split into four, and the
+new corner points are evaluated, until the budget of points is spent or no
+cell changes by more than the tolerance. For continuous observables, the
+change across a cell is the range of the values at its corners, relative to
+the range of all values. For classifying observables (e.g. the number of
+extrema of the mean opinion), a cell is split whenever its corners differ.
+
+The points live on the integer lattice of the finest possible cells, so that
+points shared by neighbouring cells are only evaluated once. The results are
+stored in a ``.npz`` file, which ``sweep2d`` plots via the ``points`` key.
+"""
+import logging
+import numpy as np
+from typing import Callable, Tuple
+
+from .metrics_store import SCALARS
+
+log = logging.getLogger(__name__)
+
+#the observables of a universe (see metrics_store.universe_metrics), and those
+#of them which classify the universe
+OBSERVABLES = SCALARS
+CLASSIFIERS = ('num_extrema',)
+
+## -----------------------------------------------------------------------------
+def _corners(cells: np.ndarray) -> np.ndarray:
+    """Returns the (cell, corner, coordinate) lattice points of (i, j, size)
+    cells"""
+    offsets = np.array([[0, 0], [1, 0], [0, 1], [1, 1]])
+
+    return cells[:, np.newaxis, :2]+offsets*cells[:, np.newaxis, 2:]
+
+## -----------------------------------------------------------------------------
+def _children(cells: np.ndarray) -> np.ndarray:
+    """Returns the four children of each of the (i, j, size) cells"""
+    offsets = np.array([[0, 0], [1, 0], [0, 1], [1, 1]])
+    half = cells[:, np.newaxis, 2:]//2
+    corners = cells[:, np.newaxis, :2]+offsets*half
+
+    return np.concatenate([corners, np.broadcast_to(half, corners.shape[:2]+(1,))],
+                          axis=2).reshape(-1, 3)
+
+## -----------------------------------------------------------------------------
+def cell_scores(cells: np.ndarray, values: dict, *, classify: bool) -> np.ndarray:
+    """Returns the change of the observable across each cell.
+
+    Arguments:
+        cells (ndarray): the (cell, (i, j, size)) lattice cells
+        values (dict): the values of the evaluated lattice points
+        classify (bool): whether the observable classifies the points. If so,
+            the score is 1 for cells with differing corners, and 0 otherwise.
+
+    Returns:
+        scores (ndarray): the score of each cell; NaN if a corner is NaN
+    """
+    corners = np.array([[values[tuple(p)] for p in c] for c in _corners(cells)],
+                       dtype=float).reshape(-1, 4)
+    if classify:
+        scores = (np.ptp(corners, axis=1)>0).astype(float)
+    else:
+        vals = np.array(list(values.values()), dtype=float)
+        span = np.nanmax(vals)-np.nanmin(vals) if np.isfinite(vals).any() else 0.
+        scores = np.ptp(corners, axis=1)/span if span>0 else np.zeros(len(cells))
+    scores[np.isnan(corners).any(axis=1)] = np.nan
+
+    return scores
+
+## -----------------------------------------------------------------------------
+def select_cells(cells: np.ndarray, scores: np.ndarray, values: dict, *,
+                 tolerance: float, budget: int) -> Tuple[np.ndarray, list]:
+    """Selects the cells to be split, in the order of decreasing score (and,
+    for equal scores, size), as long as their new points fit the budget.
+
+    Arguments:
+        cells (ndarray): the (cell, (i, j, size)) lattice cells
+        scores (ndarray): the score of each cell
+        values (dict): the values of the evaluated lattice points
+        tolerance (float): the score above which a cell is split
+        budget (int): the number of points that may still be evaluated
+
+    Returns:
+        split (ndarray): the boolean mask of the cells to be split
+        points (list): the new lattice points
+    """
+    split = np.zeros(len(cells), dtype=bool)
+    new = {}
+    candidates = np.flatnonzero((scores>tolerance) & (cells[:, 2]>1))
+    for c in candidates[np.lexsort((-cells[candidates, 2], -scores[candidates]))]:
+        points = [tuple(p) for p in _corners(_children(cells[c:c+1])).reshape(-1, 2)]
+        points = [p for p in dict.fromkeys(points) if p not in values and p not in new]
+        if len(new)+len(points)>budget:
+            continue
+        split[c] = True
+        new.update(dict.fromkeys(points))
+
+    return split, list(new)
+
+## -----------------------------------------------------------------------------
+def adaptive_sweep(evaluate: Callable, *, x_range: tuple, y_range: tuple,
+                   num_coarse: int=5, budget: int=200, max_depth: int=4,
+                   tolerance: float=0.1, classify: bool=False,
+                   output: str=None, **names) -> dict:
+    """Runs an adaptive sweep over two parameters.
+
+    Arguments:
+        evaluate (Callable): returns the (point,) values of the observable for
+            an array of (point, (x, y)) parameter values
+        x_range (tuple): the range of the first parameter
+        y_range (tuple): the range of the second parameter
+        num_coarse (int, optional): the number of points of the coarse grid
+            along each dimension
+        budget (int, optional): the maximum number of points evaluated,
+            including the coarse grid
+        max_depth (int, optional): the maximum number of times a coarse cell
+            is split
+        tolerance (float, optional): the score above which a cell is split
+            (see ``cell_scores``)
+        classify (bool, optional): whether the observable classifies the points
+        output (str, optional): if given, the results are saved to this file
+            after each round
+        **names: the names of the parameters ('x', 'y') and of the observable
+            ('observable'), stored with the results
+
+    Returns:
+        results (dict): the (point, (x, y)) parameter values 'points', their
+            'values' and the refinement 'round' in which they were evaluated,
+            together with the leaf 'cells' in lattice coordinates and the names
+
+    Raises:
+        ValueError: if the coarse grid exceeds the budget
+    """
+    if num_coarse<2 or num_coarse**2>budget:
+        raise ValueError(f"The coarse grid of {num_coarse}x{num_coarse} points "
+                         f"must have at least 2 points per dimension and fit the "
+                         f"budget of {budget} points!")
+
+    size = 2**max_depth
+    extent = (num_coarse-1)*size
+    lo = np.array([x_range[0], y_range[0]], dtype=float)
+    step = (np.array([x_range[1], y_range[1]], dtype=float)-lo)/extent
+
+    idx = np.arange(num_coarse-1)*size
+    cells = np.stack([np.repeat(idx, len(idx)), np.tile(idx, len(idx)),
+                      np.full(len(idx)**2, size)], axis=1)
+    new = [(i*size, j*size) for i in range(num_coarse) for j in range(num_coarse)]
+    values, rounds = {}, {}
+    r = 0
+    while True:
+        #cells whose new points are all known are split without evaluation
+        if new:
+            vals = np.asarray(evaluate(lo+np.array(new)*step), dtype=float)
+            values.update(zip(new, vals))
+            rounds.update(dict.fromkeys(new, r))
+            log.info(f"Round {r}: evaluated {len(new)} points, {len(values)} "
+                     f"of {budget} in total.")
+
+        results = dict(points=lo+np.array(list(values))*step,
+                       values=np.array(list(values.values())),
+                       round=np.array(list(rounds.values())), cells=cells,
+                       **names)
+        if output is not None and new:
+            save_points(output, results)
+
+        split, new = select_cells(cells, cell_scores(cells, values, classify=classify),
+                                  values, tolerance=tolerance,
+                                  budget=budget-len(values))
+        if not split.any():
+            break
+        cells = np.concatenate([cells[~split], _children(cells[split])])
+        r += 1
+
+    return results
+
+## -----------------------------------------------------------------------------
+def save_points(path: str, results: dict):
+    """Saves the results of an adaptive sweep to an ``.npz`` file"""
+    np.savez(path, **{key: np.asarray(val) for key, val in results.items()})
+
+## -----------------------------------------------------------------------------
+def load_points(path: str, *, x: str, y: str,
+                observable: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Loads the points of an adaptive sweep over x and y.
+
+    Arguments:
+        path (str): the results file
+        x (str): the first parameter
+        y (str): the second parameter
+        observable (str): the observable
+
+    Returns:
+        x (ndarray): the values of the first parameter
+        y (ndarray): the values of the second parameter
+        values (ndarray): the values of the observable
+
+    Raises:
+        ValueError: if the file holds another observable or parameters
+    """
+    with np.load(path) as file:
+        names = [str(file[key]) if key in file else None
+                 for key in ['x', 'y', 'observable']]
+        points, values = file['points'], file['values']
+
+    if names[2]!=observable or sorted(names[:2])!=sorted([x, y]):
+        raise ValueError(f"The adaptive sweep '{path}' holds the observable "
+                         f"'{names[2]}' over ({names[0]}, {names[1]}), not "
+                         f"'{observable}' over ({x}, {y})!")
+    if names[0]!=x:
+        points = points[:, ::-1]
+
+    return points[:, 0], points[:, 1], values
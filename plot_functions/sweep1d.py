@@ -1,24 +1,28 @@
 import logging
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
+import os
 
 from utopya import DataManager
 from utopya.plotting import is_plot_func, PlotHelper, MultiversePlotCreator
 
-from .data_analysis import get_absolute_area, get_area, means_stddevs_by_group
-from .tools import convert_to_label, deduce_sweep_dimension, get_keys_cfg, setup_figure
+from .data_analysis import chunk_mv_data, out_of_core, get_absolute_area, get_area, means_stddevs_by_group
+from .data_io import decode_mv_data
+from .tools import deduce_sweep_dimension, get_keys_cfg, group_labels, plot_sweep1d, setup_figure
 
 log = logging.getLogger(__name__)
 
 #-------------------------------------------------------------------------------
 @is_plot_func(creator_type=MultiversePlotCreator)
+@out_of_core
 def sweep1d(dm: DataManager,
                 *,
                 hlpr: PlotHelper,
                 mv_data,
                 age_groups: list=[10, 20, 40, 60, 80],
                 dim: str=None,
+                memory_budget=None,
+                metrics_store: bool=False,
                 plot_by_groups: bool=True,
                 plot_kwargs: dict={},
                 to_plot: str):
@@ -31,6 +35,9 @@ def sweep1d(dm: DataManager,
         - choose the dimension `dim` in which the sweep was performed. For a single
           sweep dimension, the sweep parameter is automatically deduced
         - use the `select/subspace` key to set values for all other parameters
+        - for the areas, the global mean recorded by the model can be selected
+          instead of the opinions (see `.global_mean` in the base config), so
+          that only the cached or recorded global means are read
 
     Arguments:
         dm (DataManager): the data manager from which to retrieve the data
@@ -41,6 +48,15 @@ def sweep1d(dm: DataManager,
         dim (str, optional): the parameter dimension of the diagram. If none is
             provided, an attempt will be made to automatically deduce the sweep
             parameter
+        memory_budget (int or str, optional): if given, the multiverse data is
+            evaluated out-of-core in chunks fitting this memory budget (in
+            bytes, or as a string such as '4GB'). Requires dask.
+        metrics_store (bool, optional): whether to read the areas and the
+            final group statistics of the universes from the metrics store
+            (see ``metrics_store.py``) rather than from their data. The metrics
+            of the run are extracted into the store on first use. Only the
+            coordinates of the selected data are used then, so that any
+            (small) field can be selected instead of the opinions.
         plot_kwargs (dict): kwargs passed to the errorbar plot function
         to_plot (str): the data to be plotted. Can be:
             - absolute_area: the area (unsigned) of the mean minus 0.5 of the
@@ -60,29 +76,37 @@ def sweep1d(dm: DataManager,
     if to_plot not in ['absolute_area', 'area', 'area_comp', 'area_diff', 'means', 'stddevs']:
         raise ValueError(f"Unknown statistical variable {to_plot}!")
 
-    if dim is None:
-        dim = deduce_sweep_dimension(mv_data)
-    else:
-        if not dim in mv_data.dims:
-            raise ValueError(f"Dimension '{dim}' not available in multiverse data."
-                             f" Available: {mv_data.coords}")
-
-
     #get datasets and cfg ......................................................
-    keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
-                             keys_to_ignore=[dim, 'time'])
+    #from the store, only the coordinates of the multiverse data are used
+    if metrics_store:
+        #the store needs pandas, which is only imported when it is used
+        from .metrics_store import grid_stats, index_run, store_grid, sweep_dim
+        df = index_run(dm, age_groups=age_groups)
+        coords, cfg = store_grid(dm, df, mv_data)
+        dim = sweep_dim(coords, dim)
+    else:
+        if dim is None:
+            dim = deduce_sweep_dimension(mv_data)
+        else:
+            if not dim in mv_data.dims:
+                raise ValueError(f"Dimension '{dim}' not available in multiverse data."
+                                 f" Available: {mv_data.coords}")
+        mv_data = decode_mv_data(chunk_mv_data(mv_data, memory_budget=memory_budget))
+        keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
+                                 keys_to_ignore=[dim, 'time'])
+        coords = {dim: mv_data.coords[dim].data}
+    x = coords[dim]
     mode = cfg['OpDisc']['mode']
     ageing = True if mode=='ageing' else False
     num_groups = len(age_groups)-1 if ageing else cfg['OpDisc']['number_of_groups']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
     #get pretty labels
-    if ageing:
-        labels = [f"Ages {group_list[_]}-{group_list[_+1]}" for _ in range(num_groups)]
+    max_age = None
+    if ageing and metrics_store:
+        max_age = np.nanmax(df['max_group'])
+    elif ageing and 'group_label' in mv_data:
         max_age = np.amax(mv_data[keys]['group_label'])
-        if (age_groups[-1]>=max_age):
-            labels[-1]=f"Ages {group_list[-2]}+"
-    else:
-        labels = [f"Group {_+1}" for _ in group_list]
+    labels = group_labels(age_groups, num_groups, ageing=ageing, max_age=max_age)
 
     #figure setup ..............................................................
     figure, axs = setup_figure(cfg, plot_name=to_plot, dim1=dim)
@@ -91,53 +115,58 @@ def sweep1d(dm: DataManager,
 
     #data analysis and plotting ................................................
     log.info("Commencing data analytics ...")
+    if metrics_store:
+        get_abs_area = lambda: grid_stats(df, df['absolute_area'], coords, dims=[dim])[:2]
+        get_signed_area = lambda: grid_stats(df, df['area'], coords, dims=[dim])[:2]
+    else:
+        get_abs_area = lambda: get_absolute_area(mv_data, keys, dim=dim, dm=dm)
+        get_signed_area = lambda: get_area(mv_data, keys, dim=dim, dm=dm)
 
     if to_plot == 'absolute_area':
-        data_to_plot, err = get_absolute_area(mv_data, keys, dim=dim)
-        hlpr.ax.errorbar(mv_data.coords[dim].data, data_to_plot, yerr=err, **plot_kwargs)
+        data_to_plot, err = get_abs_area()
 
     elif to_plot == 'area':
-        data_to_plot, err = get_area(mv_data, keys, dim=dim)
-        hlpr.ax.errorbar(mv_data.coords[dim].data, data_to_plot, yerr=err, **plot_kwargs)
+        data_to_plot, err = get_signed_area()
 
     elif to_plot == 'area_comp':
-        data_to_plot_0, err_0 = get_absolute_area(mv_data, keys, dim=dim)
-        # hlpr.ax.errorbar(mv_data.coords[dim].data, data_to_plot_0, yerr=err_0, **plot_kwargs, label=r'$\vert A \vert$')
-        data_to_plot_1, err_1 = get_area(mv_data, keys, dim=dim)
-        # hlpr.ax.errorbar(mv_data.coords[dim].data, data_to_plot_1, yerr=err_1, **plot_kwargs, label=r'$A$')
+        data_to_plot_0, err_0 = get_abs_area()
+        # hlpr.ax.errorbar(x, data_to_plot_0, yerr=err_0, **plot_kwargs, label=r'$\vert A \vert$')
+        data_to_plot_1, err_1 = get_signed_area()
+        # hlpr.ax.errorbar(x, data_to_plot_1, yerr=err_1, **plot_kwargs, label=r'$A$')
         # hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
         #                ncol=2, fontsize='xx-small')
         #write data values for further evaluation....................................
 
         res = np.vstack((data_to_plot_0, err_0, data_to_plot_1, err_1))
         idx = ['abs_area', 'abs_area_err', 'area', 'area_err']
-        df = pd.DataFrame(res, idx, mv_data.coords[dim].data)
+        import pandas as pd
+        df = pd.DataFrame(res, idx, x)
         phom = cfg['OpDisc']['homophily_parameter']
-        df.to_csv(hlpr.out_path.replace('area.pdf', f'area_N_{num_groups}_phom_{phom}.csv'))
+        df.to_csv(os.path.join(os.path.dirname(hlpr.out_path),
+                               f'area_N_{num_groups}_phom_{phom}.csv'))
         log.info("Finished writing files")
 
     elif to_plot == 'area_diff':
-        data_to_plot_0, err_0 = get_absolute_area(mv_data, keys, dim=dim)
-        data_to_plot_1, err_1 = get_area(mv_data, keys, dim=dim)
-        hlpr.ax.plot(mv_data.coords[dim].data, np.subtract(data_to_plot_0, data_to_plot_1), **plot_kwargs)
+        data_to_plot_0, err_0 = get_abs_area()
+        data_to_plot_1, err_1 = get_signed_area()
+        data_to_plot, err = np.subtract(data_to_plot_0, data_to_plot_1), None
 
 
     elif to_plot == 'means' or to_plot=='stddevs':
-        keys['time']=-1
-        data_to_plot, err = means_stddevs_by_group(mv_data, group_list, dim, keys,
-                          mode=mode, ageing=ageing, num_groups=num_groups, which=to_plot, time_step=-1)
-        if plot_by_groups:
-            for i in range(len(err)):
-                hlpr.ax.errorbar(mv_data.coords[dim].data, data_to_plot[i], yerr=err[i],
-                                 label=labels[i], **plot_kwargs)
-            hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
-                           ncol=num_groups+1, fontsize='xx-small')
+        if metrics_store:
+            vals = ([np.abs(np.asarray(m)-0.5) for m in df['final_means']]
+                    if to_plot=='means' else df['final_stddevs'])
+            data_to_plot, err = [a.T for a in grid_stats(df, vals, coords,
+                                                         dims=[dim])[:2]]
         else:
-            hlpr.ax.errorbar(mv_data.coords[dim].data, np.mean(data_to_plot, axis=0),
-                            yerr=np.mean(err, axis=0), **plot_kwargs)
+            keys['time']=-1
+            data_to_plot, err = means_stddevs_by_group(mv_data, group_list, dim, keys,
+                              mode=mode, ageing=ageing, num_groups=num_groups, which=to_plot, time_step=-1)
 
     log.info("Data analysis complete.")
 
-    #set axis lables etc .......................................................
-    hlpr.ax.set_xlabel(convert_to_label(dim))
-    hlpr.ax.set_ylabel(convert_to_label(to_plot))
+    #plotting ..................................................................
+    if to_plot != 'area_comp':
+        plot_sweep1d(hlpr.ax, x, data_to_plot, err, dim=dim, to_plot=to_plot,
+                     labels=labels if plot_by_groups else None,
+                     plot_kwargs=plot_kwargs)
@@ -1,7 +1,6 @@
 import logging
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
 from matplotlib import rc
 from matplotlib.lines import Line2D
@@ -9,21 +8,66 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 from utopya import DataManager
 from utopya.plotting import is_plot_func, PlotHelper, MultiversePlotCreator
 
-from .data_analysis import get_absolute_area, get_area, avg_of_means_stddevs, difference_of_extreme_means
-from .tools import convert_to_label, get_keys_cfg, parameters, R_p, setup_figure
+from .data_analysis import chunk_mv_data, out_of_core, get_areas, avg_of_means_stddevs, difference_of_extreme_means
+from .data_io import decode_mv_data
+from .tools import convert_to_label, get_keys_cfg, parameters, plot_heatmap, R_p, setup_figure
 
 log = logging.getLogger(__name__)
 
+#-------------------------------------------------------------------------------
+def _plot_points(dm: DataManager, *, hlpr: PlotHelper, points: str, x: str,
+                 y: str, plot_kwargs: dict, to_plot: str):
+    """Plots the scattered points of an adaptive sweep as a heatmap on their
+    Delaunay triangulation, marking the points themselves."""
+    #the points are read with pandas, which is only imported when it is used
+    from .refinement import load_points
+    x_vals, y_vals, data_to_plot = load_points(points, x=x, y=y,
+                                               observable=to_plot)
+    figure, axs = setup_figure(dm['multiverse'].pspace.default,
+                               plot_name=to_plot, dim1=x, dim2=y)
+    hlpr.attach_figure_and_axes(fig=figure, axes=axs)
+    hlpr.select_axis(0, 1)
+
+    im = hlpr.ax.tripcolor(x_vals, y_vals, data_to_plot, **plot_kwargs)
+    hlpr.ax.scatter(x_vals, y_vals, s=1, color='black', alpha=0.3)
+    hlpr.ax.set_xlabel(parameters[x])
+    hlpr.ax.set_ylabel(parameters[y], rotation=0)
+
+    divider = make_axes_locatable(hlpr.ax)
+    cax = divider.append_axes("right", size="5%", pad=0.2)
+    cbar = figure.colorbar(im, cax=cax)
+
+    cbar.set_label(convert_to_label(to_plot))
+
+#-------------------------------------------------------------------------------
+def _mean_field_data(dm: DataManager, mv_data, *, x: str, y: str, **kwargs):
+    """Returns the mean-field solution for the points of the selected x and y
+    coordinates, solved for the default configuration of the run with the
+    values of the subspace selection (see ``mean_field.mean_field_mv_data``)."""
+    #the solver needs xarray, which is only imported when it is used
+    from .mean_field import mean_field_mv_data
+    cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
+                       keys_to_ignore=[x, y])[1]
+    sweep = {dim: mv_data.coords[dim].data for dim in [x, y]}
+    log.info(f"Solving the mean-field equations for the {x}-{y} sweep ...")
+
+    return mean_field_mv_data(cfg, sweep, **kwargs)
+
 #-------------------------------------------------------------------------------
 @is_plot_func(creator_type=MultiversePlotCreator)
+@out_of_core
 def sweep2d(dm: DataManager,
           *,
           hlpr: PlotHelper,
           mv_data,
           age_groups: list=[10, 20, 40, 60, 80],
+          memory_budget=None,
+          metrics_store: bool=False,
+          mean_field: dict=None,
           x: str,
           y: str,
           plot_kwargs: dict={},
+          points: str=None,
           stacked: bool=False,
           to_plot: str):
 
@@ -35,6 +79,11 @@ def sweep2d(dm: DataManager,
         - choose the dimension `dim` in which the sweep was performed. For a single
           sweep dimension, the sweep parameter is automatically deduced
         - use the `select/subspace` key to set values for all other parameters
+        - for the areas, the global mean recorded by the model can be selected
+          instead of the opinions (see `.global_mean` in the base config), so
+          that only the cached or recorded global means are read
+        - set `mean_field` (e.g. to `{}`) to plot the mean-field solution for
+          the selected x and y values instead of the universes
 
     Arguments:
         dm (DataManager): the data manager from which to retrieve the data
@@ -42,13 +91,34 @@ def sweep2d(dm: DataManager,
         mv_data (xr.Dataset): the extracted multidimensional dataset
         age_groups (list): The age intervals to be plotted in the final_ax
             distribution plot for the 'ageing' mode.
+        memory_budget (int or str, optional): if given, the multiverse data is
+            evaluated out-of-core in chunks fitting this memory budget (in
+            bytes, or as a string such as '4GB'). Requires dask.
+        metrics_store (bool, optional): whether to read the values of the
+            universes from the metrics store (see ``metrics_store.py``) rather
+            than from their data. The metrics of the run are extracted into
+            the store on first use. Only the coordinates of the selected data
+            are used then, so that any (small) field can be selected instead
+            of the opinions.
+        mean_field (dict, optional): if given, the mean-field solution (see
+            ``mean_field.py``) for the selected x and y values is plotted in
+            place of the universes, solved for the default configuration of
+            the run with the subspace selection. The entries are passed on to
+            ``mean_field_mv_data``, e.g. num_users. The caches and summary
+            statistics of the universes are not used then, and x and y must
+            be parameters of the solver.
         x (str): the first parameter dimension of the diagram.
         y (str): the first parameter dimension of the diagram.
         plot_kwargs (dict, optional): kwargs passed to the scatter plot function
+        points (str, optional): the results file of an adaptive sweep over x
+            and y (see ``adaptive_sweep.py``). If given, its scattered points
+            are plotted as a triangulated heatmap instead of the multiverse
+            data; the results must hold the to_plot observable.
         stacked (bool): whether to plot a 2d heatmap or a stacked line plot
         to_plot (str): the data to be plotted. Can be:
             - extreme_means_diff: the difference between the means of the outer
-              groups at the final time step. not compatible with a seed sweep.
+              groups at the final time step. not compatible with a seed sweep,
+              unless read from the metrics store.
             - avg_of_means_diff_to_05: the average of the absolute distance of
               each group to 0.5 at the final time step
             - absolute_area: the area (unsigned) of the mean minus 0.5 of the
@@ -57,34 +127,71 @@ def sweep2d(dm: DataManager,
               population. can be positive or negative.
             - area_diff: the difference of the absolute area und the signed
               area under the means curve.
+            - num_extrema: the number of maxima of the mean opinion; only
+              for the points of an adaptive sweep.
 
     Raises:
         ValueError: if a sweep over 'seed' is performed and to_plot is
-        'extreme_means_diff'.
+        'extreme_means_diff', without the metrics store.
+        ValueError: if points are passed for a stacked plot
+        ValueError: if the mean-field solution is combined with the points of
+            an adaptive sweep or the metrics store
     """
-    if ((to_plot == 'extreme_means_diff') and ('seed' in mv_data.coords) and
+    if mean_field is not None and (points is not None or metrics_store):
+        raise ValueError("The mean-field solution cannot be plotted from the "
+                         "points of an adaptive sweep or the metrics store!")
+    if points is not None:
+        if stacked:
+            raise ValueError("The points of an adaptive sweep cannot be "
+                             "plotted as a stacked line plot!")
+        return _plot_points(dm, hlpr=hlpr, points=points, x=x, y=y,
+                            plot_kwargs=plot_kwargs, to_plot=to_plot)
+
+    if metrics_store:
+        #the store needs pandas, which is only imported when it is used
+        from .metrics_store import (SCALARS, grid_stats, index_run, store_grid,
+                                    sweep_dim)
+    from_store = metrics_store and to_plot in SCALARS
+    if ((to_plot == 'extreme_means_diff') and not from_store and
+         ('seed' in mv_data.coords) and
          (len(mv_data.coords['seed'].data)>1)):
         raise ValueError("Plotting does not support 'seed' at this time. Select"
                          " a single value using the 'subspace' key")
 
     #get datasets and cfg ......................................................
-    keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
-                                                          keys_to_ignore=[x, y])
+    #from the store, only the coordinates of the multiverse data are used
+    if from_store:
+        df = index_run(dm, age_groups=age_groups)
+        coords, cfg = store_grid(dm, df, mv_data)
+        x, y = sweep_dim(coords, x), sweep_dim(coords, y)
+    elif mean_field is not None:
+        #the solution replaces the universes, so that their caches must not be
+        #consulted; its configuration is that of the plot
+        mv_data = _mean_field_data(dm, mv_data, x=x, y=y, **mean_field)
+        keys, cfg = get_keys_cfg(mv_data, mv_data.attrs['cfg'],
+                                 keys_to_ignore=[x, y])
+        coords = {dim: mv_data.coords[dim].data for dim in [x, y]}
+        dm = None
+    else:
+        mv_data = decode_mv_data(chunk_mv_data(mv_data, memory_budget=memory_budget))
+        keys, cfg = get_keys_cfg(mv_data, dm['multiverse'].pspace.default,
+                                                              keys_to_ignore=[x, y])
+        coords = {dim: mv_data.coords[dim].data for dim in [x, y]}
     mode = cfg['OpDisc']['mode']
     ageing = True if mode == 'ageing' else False
     num_groups = len(age_groups)-1 if ageing else cfg['OpDisc']['number_of_groups']
     group_list = age_groups if ageing else [_ for _ in range(num_groups)]
 
     requires_group_label = ['extreme_means_diff', 'avg_of_means_diff_to_05', 'avg_of_stddevs']
-    #get group labels
-    if ageing:
+    #get group labels (the metrics of the store do not need them)
+    if ageing and not from_store:
         #group labels change over time
         keys.update({x: 0, y: 0})
         if to_plot in requires_group_label:
             groups = np.asarray(mv_data['group_label'][keys], dtype=int)
         for ele in [x, y]:
             keys.pop(ele)
-    else:
+    elif not from_store:
         #group labels do not change over time
         keys.update({'time':0, x: 0, y: 0})
         if to_plot in requires_group_label:
@@ -98,7 +205,10 @@ def sweep2d(dm: DataManager,
     hlpr.select_axis(0, 1)
 
     #data analysis .............................................................
-    if to_plot == 'extreme_means_diff':
+    if from_store:
+        data_to_plot = grid_stats(df, df[to_plot], coords, dims=[y, x])[0]
+
+    elif to_plot == 'extreme_means_diff':
         data_to_plot = difference_of_extreme_means(mv_data, x, y, groups, group_list,
                              ageing=ageing, group_1=0, group_2=-1, time_step=-1)
 
@@ -111,50 +221,27 @@ def sweep2d(dm: DataManager,
            keys, mode, num_groups, which='stddevs', ageing=ageing, time_step=-1)
 
     elif to_plot == 'absolute_area':
-        data_to_plot = np.zeros((len(mv_data.coords[y]), len(mv_data.coords[x])))
-        for param1 in range(len(mv_data.coords[x])):
-            keys[x] = param1
-            data_to_plot[:, param1] = get_absolute_area(mv_data, keys, dim=y)[0]
+        data_to_plot = get_areas(mv_data, keys, dims=[y, x], absolute=True,
+                                 dm=dm)[0]
 
     elif to_plot == 'area':
-        data_to_plot = np.zeros((len(mv_data.coords[y]), len(mv_data.coords[x])))
-        for param1 in range(len(mv_data.coords[x])):
-            keys[x] = param1
-            data_to_plot[:, param1] = get_area(mv_data, keys, dim=y)[0]
+        data_to_plot = get_areas(mv_data, keys, dims=[y, x], absolute=False,
+                                 dm=dm)[0]
 
     elif to_plot == 'area_diff':
-        data_to_plot = np.zeros((len(mv_data.coords[y]), len(mv_data.coords[x])))
-        for param1 in range(len(mv_data.coords[x])):
-            keys[x] = param1
-            val_1 = get_absolute_area(mv_data, keys, dim=y)[0]
-            val_2 = get_area(mv_data, keys, dim=y)[0]
-            data_to_plot[:, param1] = np.subtract(val_1, val_2)
+        val_1 = get_areas(mv_data, keys, dims=[y, x], absolute=True, dm=dm)[0]
+        val_2 = get_areas(mv_data, keys, dims=[y, x], absolute=False, dm=dm)[0]
+        data_to_plot = np.subtract(val_1, val_2)
 
     #plotting ..................................................................
     if stacked:
-        for i in range(len(mv_data.coords[y])):
+        for i in range(len(coords[y])):
             hlpr.ax.plot(data_to_plot[i, :],
-                    label=f'{convert_to_label(y)}={mv_data.coords[y].data[i]}',
+                    label=f'{convert_to_label(y)}={coords[y][i]}',
                     **plot_kwargs)
         hlpr.ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
-                       ncol=len(mv_data.coords[y])+1, fontsize='xx-small')
+                       ncol=len(coords[y])+1, fontsize='xx-small')
 
     else:
-        df = pd.DataFrame(data_to_plot, index=mv_data.coords[y].data,
-                                                     columns=mv_data.coords[x].data)
-        im = hlpr.ax.pcolor(df, **plot_kwargs)
-        hlpr.ax.set_ylabel(parameters[y], rotation=0)
-        hlpr.ax.set_yticks([i for i in np.linspace(0.5,
-                     len(mv_data.coords[y].data)-0.5, len(mv_data.coords[y].data))])
-        hlpr.ax.set_yticklabels([np.around(i, 3) for i in mv_data.coords[y].data])
-
-        hlpr.ax.set_xlabel(parameters[x])
-        hlpr.ax.set_xticks([i for i in np.linspace(0.5,
-                     len(mv_data.coords[x].data)-0.5, len(mv_data.coords[x].data))])
-        hlpr.ax.set_xticklabels([np.around(i, 3) for i in mv_data.coords[x].data])
-
-        divider = make_axes_locatable(hlpr.ax)
-        cax = divider.append_axes("right", size="5%", pad=0.2)
-        cbar = figure.colorbar(im, cax=cax)
-
-        cbar.set_label(convert_to_label(to_plot))
+        plot_heatmap(hlpr.ax, data_to_plot, x=x, y=y, x_coords=coords[x],
+                     y_coords=coords[y], to_plot=to_plot, plot_kwargs=plot_kwargs)
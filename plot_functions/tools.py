@@ -3,15 +3,12 @@ import logging
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.lines import Line2D
+from mpl_toolkits.axes_grid1 import make_axes_locatable
 from typing import Tuple
-from matplotlib import rc
 
 log = logging.getLogger(__name__)
 
-matplotlib.rcParams['mathtext.fontset']='stix'
-matplotlib.rcParams['font.family']='serif'
-rc('text', usetex=True)
-
 #formatting ....................................................................
 model_modes = {
     'ageing': 'directed conflict with ageing',
@@ -35,6 +32,7 @@ parameters = {
     'life_expectancy': 'Life expectancy',
     'mean_degree': r'$\bar{k}$',
     'means': r'$\langle \vert \bar{\sigma}-0.5 \vert \rangle$',
+    'num_extrema': r'$\#\{\bar{\sigma}^\prime = 0\}$',
     'number_of_groups': 'N',
     'peer_radius': 'Peer radius',
     'stddevs': r'$\langle \mathrm{var}(\bar{\sigma}) \rangle$',
@@ -44,22 +42,23 @@ parameters = {
 }
 
 titles = {
-    'absolute_area': r'\bf Absolute area under means curve',
-    'area': r'\bf Area under means curve',
-    'area_comp': r'\bf Comparison of areas under means curve',
-    'area_diff': r'\bf Difference of areas under means curve',
-    'avg_of_means_diff_to_05': r'\bf Average of difference of means to 0.5',
-    'avg_of_stddevs': r'\bf Average of standard deviations',
-    'bifurcation': r'\bf Bifurcation diagramme',
-    'densities' : r'\bf Opinion clusters over time',
-    'extreme_means_diff': r'\bf Difference of means of groups 1 and N',
-    'group_avg': r'\bf Average opinion by group',
-    'group_avgs_anim': r'\bf Average opinion by group',
-    'means': r'\bf Distribution means over time',
-    'opinion': r'\bf Opinion distribution at single time step',
-    'opinion_anim': r'\bf Opinion distribution over time',
-    'op_groups' : r'\bf Opinion evolution by group',
-    'stddevs': r'\bf Distribution variances over time',
+    'absolute_area': 'Absolute area under means curve',
+    'area': 'Area under means curve',
+    'area_comp': 'Comparison of areas under means curve',
+    'area_diff': 'Difference of areas under means curve',
+    'avg_of_means_diff_to_05': 'Average of difference of means to 0.5',
+    'avg_of_stddevs': 'Average of standard deviations',
+    'bifurcation': 'Bifurcation diagramme',
+    'densities' : 'Opinion clusters over time',
+    'extreme_means_diff': 'Difference of means of groups 1 and N',
+    'group_avg': 'Average opinion by group',
+    'group_avgs_anim': 'Average opinion by group',
+    'means': 'Distribution means over time',
+    'num_extrema': 'Number of maxima of the mean opinion',
+    'opinion': 'Opinion distribution at single time step',
+    'opinion_anim': 'Opinion distribution over time',
+    'op_groups' : 'Opinion evolution by group',
+    'stddevs': 'Distribution variances over time',
 }
 
 def convert_to_label(input) -> str:
@@ -78,7 +77,8 @@ def mode(input) -> str:
         log.warn(f"unrecognised model mode {input}!")
         return 'unrecognised mode'
 
-def title_box(ax, cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2: str=None):
+def title_box(ax, cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2: str=None,
+              usetex: bool=None):
     """Returns a uniformly formatted title box
 
     Arguments:
@@ -87,7 +87,11 @@ def title_box(ax, cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2:
         plot_name (str, optional)
         title (str, optional): the user-specified title
         dim (str, optional): the sweep dimension, if applicable
+        usetex (bool, optional): whether the text is rendered using LaTeX.
+            Defaults to the 'text.usetex' rc parameter.
     """
+    if usetex is None:
+        usetex = matplotlib.rcParams['text.usetex']
     ax.axis('off')
     info = {'num_users': f"{cfg['OpDisc']['nw']['num_vertices']}",
             'num_steps': f"{cfg['num_steps']}"}
@@ -100,7 +104,9 @@ def title_box(ax, cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2:
         else:
             info[key] = cfg['OpDisc'][key] if key not in [dim1, dim2] else 'sweep'
     #title
-    t = r'\bf {}'.format(title) if title else titles[plot_name]
+    t = title if title else titles[plot_name]
+    if usetex:
+        t = r'\bf {}'.format(t)
     #subtitle
     st = f"Model: {mode(info['mode'])}"
     #model information
@@ -119,15 +125,18 @@ def title_box(ax, cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2:
         sst += f"\n Discriminators: {info['discriminators']}"
 
     ax.text(0, 1.3, t, fontweight='bold', fontsize=20, verticalalignment='top',
-                       horizontalalignment = 'left')
-    ax.text(0, 1., st, fontsize=14, verticalalignment='top', horizontalalignment='left')
-    ax.text(0, 0.0, sst, fontsize=10)
+                       horizontalalignment = 'left', usetex=usetex)
+    ax.text(0, 1., st, fontsize=14, verticalalignment='top', horizontalalignment='left',
+            usetex=usetex)
+    ax.text(0, 0.0, sst, fontsize=10, usetex=usetex)
 
 def setup_figure(cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2: str=None,
                  figsize: tuple=(8, 10), ncols: int=1, nrows: int=2,
                  height_ratios: list=[1, 6], width_ratios: list=[1],
-                 gridspec: list=[(0, 0), (1, 0)]):
-    """Sets up the figure and plots the title axis
+                 gridspec: list=[(0, 0), (1, 0)], usetex: bool=None):
+    """Sets up the figure and plots the title axis. The text rendering
+    parameters (fonts, LaTeX) are not set here but taken from the plot's
+    'style' configuration, which is only applied while the plot is created.
 
     Arguments:
         cfg: the model cfg
@@ -140,6 +149,11 @@ def setup_figure(cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2:
         height_ratios (list)
         width_ratios (list)
         gridspec (list): the gridspec layout; list of tuples of ints or slices
+        usetex (bool, optional): whether to render the title box using LaTeX
+            (slow, as every text is passed through the external LaTeX
+            toolchain). If None, the 'text.usetex' rc parameter is used
+            (mathtext by default; all text of a plot is rendered using LaTeX
+            via its 'style' configuration).
     """
     figure = plt.figure(figsize=figsize)
     gs = figure.add_gridspec(ncols=ncols, nrows=nrows, height_ratios=height_ratios, width_ratios=width_ratios, hspace=0.2)
@@ -147,10 +161,130 @@ def setup_figure(cfg, *, plot_name: str, title: str=None, dim1: str=None, dim2:
     axs = []
     for item in gridspec:
         axs.append([figure.add_subplot(gs[item])])
-    title_box(axs[0][0], cfg, plot_name=plot_name, title=title, dim1=dim1, dim2=dim2)
+    title_box(axs[0][0], cfg, plot_name=plot_name, title=title, dim1=dim1, dim2=dim2,
+              usetex=usetex)
 
     return figure, axs
 
+#sweep plots ...................................................................
+def group_labels(age_groups: list, num_groups: int, *, ageing: bool,
+                 max_age=None) -> list:
+    """Returns the legend labels of the groups
+
+    Arguments:
+        age_groups (list): the age intervals of the 'ageing' mode
+        num_groups (int): the number of groups
+        ageing (bool): whether the groups are age groups
+        max_age (optional): the maximum age; if it does not exceed the last
+            age interval, the last group is labelled as open-ended
+    """
+    if not ageing:
+        return [f"Group {_+1}" for _ in range(num_groups)]
+    labels = [f"Ages {age_groups[_]}-{age_groups[_+1]}" for _ in range(num_groups)]
+    if max_age is not None and age_groups[-1]>=max_age:
+        labels[-1] = f"Ages {age_groups[-2]}+"
+    return labels
+
+def plot_sweep1d(ax, x, data_to_plot, err=None, *, dim: str, to_plot: str,
+                 labels: list=None, plot_kwargs: dict={}):
+    """Plots the values of a sweep over one parameter, with the axis labels and
+    the legend of the sweep1d plot
+
+    Arguments:
+        ax: the axis to plot on
+        x: the parameter values
+        data_to_plot: the values; either one per parameter value, or one row
+            of values per group
+        err (optional): the errors of the values. If None, a line is plotted.
+        dim (str): the parameter dimension
+        to_plot (str): the plotted variable
+        labels (list, optional): the group labels. If given, the groups are
+            plotted separately, else their values are averaged.
+        plot_kwargs (dict, optional): kwargs passed to the plot function
+    """
+    if np.ndim(data_to_plot)>1:
+        if labels is not None:
+            for i in range(len(data_to_plot)):
+                ax.errorbar(x, data_to_plot[i], yerr=err[i], label=labels[i],
+                            **plot_kwargs)
+        else:
+            ax.errorbar(x, np.mean(data_to_plot, axis=0),
+                        yerr=np.mean(err, axis=0), **plot_kwargs)
+    elif err is None:
+        ax.plot(x, data_to_plot, **plot_kwargs)
+    else:
+        ax.errorbar(x, data_to_plot, yerr=err, **plot_kwargs)
+
+    ax.set_xlabel(convert_to_label(dim))
+    ax.set_ylabel(convert_to_label(to_plot))
+    handles = ax.get_legend_handles_labels()[0]
+    if handles:
+        ax.legend(bbox_to_anchor=(1, 1.01), loc='lower right',
+                  ncol=len(handles)+1, fontsize='xx-small')
+
+def plot_heatmap(ax, data_to_plot, *, x: str, y: str, x_coords, y_coords,
+                 to_plot: str, plot_kwargs: dict={}):
+    """Plots the values of a sweep over two parameters as a heatmap, with the
+    ticks, axis labels and colorbar of the sweep2d plot. Missing values are
+    left blank.
+
+    Arguments:
+        ax: the axis to plot on
+        data_to_plot: the values, of shape (len(y_coords), len(x_coords))
+        x (str): the parameter of the x axis
+        y (str): the parameter of the y axis
+        x_coords: the values of x
+        y_coords: the values of y
+        to_plot (str): the plotted variable
+        plot_kwargs (dict, optional): kwargs passed to the pcolor function
+
+    Returns:
+        the heatmap
+    """
+    im = ax.pcolor(np.ma.masked_invalid(np.asarray(data_to_plot, dtype=float)),
+                   **plot_kwargs)
+    ax.set_ylabel(parameters[y], rotation=0)
+    ax.set_yticks([i for i in np.linspace(0.5, len(y_coords)-0.5, len(y_coords))])
+    ax.set_yticklabels([np.around(i, 3) for i in y_coords])
+
+    ax.set_xlabel(parameters[x])
+    ax.set_xticks([i for i in np.linspace(0.5, len(x_coords)-0.5, len(x_coords))])
+    ax.set_xticklabels([np.around(i, 3) for i in x_coords])
+
+    divider = make_axes_locatable(ax)
+    cax = divider.append_axes("right", size="5%", pad=0.2)
+    cbar = ax.figure.colorbar(im, cax=cax)
+    cbar.set_label(convert_to_label(to_plot))
+
+    return im
+
+def plot_extrema(ax, extrema: list, *, dim: str, plot_kwargs: dict=None):
+    """Scatters the maxima of the mean opinion over the sweep parameter, with
+    the axis labels and the legend of the bifurcation plot. Entries already in
+    the legend of the axis are kept.
+
+    Arguments:
+        ax: the axis to plot on
+        extrema (list): tuples of a parameter value and its list of maxima
+        dim (str): the parameter dimension
+        plot_kwargs (dict, optional): kwargs passed to the scatter function
+    """
+    plot_kwargs = plot_kwargs if plot_kwargs is not None else {}
+    for p, maxima in extrema:
+        ax.scatter([p] * len(maxima), maxima, **plot_kwargs)
+
+    ax.set_xlabel(convert_to_label(dim))
+    ax.set_ylabel(r'mean opinion $\bar{\sigma}$')
+    color = plot_kwargs.get('color', 'navy')
+    legend_elements = [Line2D([0], [0],
+                       label=(r'$\bar{\sigma}^\prime = 0$,'+
+                              r'$\bar{\sigma}^{\prime \prime} < 0$'),
+                       lw=0, marker='o', color=color, markerfacecolor=color,
+                       markersize=5)]
+    legend_elements += ax.get_legend_handles_labels()[0]
+    ax.legend(handles=legend_elements, bbox_to_anchor=(1, 1.01),
+              loc='lower right', ncol=2, fontsize='xx-small')
+
 #utility functions .............................................................
 def R_p(p_hom, n, mode, *, P: float=1., Q: float=1.) -> list:
     """Calculates the R_p values for a given list of homophily parameters.
@@ -250,7 +384,7 @@ def get_keys_cfg(mv_data, config, *, keys_to_ignore: list) -> Tuple[dict, dict]:
     #vertex and the selected dimension will never be subspace selections,
     #and should not be fixed to a single entry
     for key in set(['vertex', 'time']+keys_to_ignore):
-        keys.pop(key)
+        keys.pop(key, None)
 
     #assert correct parameterspace dimensionality;
     #manually set any subspace selection parameters in the cfg;
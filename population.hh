@@ -0,0 +1,218 @@
+#ifndef UTOPIA_MODELS_OPDISC_POPULATION
+#define UTOPIA_MODELS_OPDISC_POPULATION
+
+#include <cmath>
+#include <random>
+#include <vector>
+
+#include <boost/range/irange.hpp>
+
+namespace Utopia::Models::OpDisc {
+
+/** The users of the OpDisc model, stored as a structure of arrays. Since the
+  * interaction partners are drawn uniformly at random, no network is needed:
+  * each user attribute is held in a contiguous array, and the discriminator
+  * flags in a bitset.
+  *
+  * Users are indexed by 0, ..., size()-1. Indexing returns a lightweight view
+  * of a single user, so that the attributes are accessed as nw[v].opinion,
+  * nw[v].group, etc., as for the bundled vertex properties of a graph.
+  *
+  * \tparam GroupType   The type of the group label, e.g. a compact integer,
+  *                     or a floating point type for the ages of the ageing
+  *                     mode
+  * \tparam OpinionType The floating point type of the opinions
+  */
+template<typename GroupType=double, typename OpinionType=double>
+class Population {
+public:
+    /// The index of a user
+    using VertexDesc = std::size_t;
+
+    /// A mutable view of a single user
+    struct UserRef {
+        GroupType& group;
+        std::vector<bool>::reference discriminates;
+        OpinionType& opinion;
+        double& tolerance;
+        double& susceptibility_1;  //same group interactions
+        double& susceptibility_2;  //inter-group interactions
+    };
+
+    /// A read-only view of a single user
+    struct ConstUserRef {
+        const GroupType& group;
+        bool discriminates;
+        const OpinionType& opinion;
+        const double& tolerance;
+        const double& susceptibility_1;
+        const double& susceptibility_2;
+    };
+
+private:
+    std::vector<GroupType> _group;
+    std::vector<bool> _discriminates;
+    std::vector<OpinionType> _opinion;
+    std::vector<double> _tolerance;
+    std::vector<double> _susceptibility_1;
+    std::vector<double> _susceptibility_2;
+
+public:
+    /// Creates a population of num_users users with zero-initialised attributes
+    explicit Population (const std::size_t num_users = 0)
+    :
+        _group(num_users, GroupType{}),
+        _discriminates(num_users, false),
+        _opinion(num_users, OpinionType{}),
+        _tolerance(num_users, 0.),
+        _susceptibility_1(num_users, 0.),
+        _susceptibility_2(num_users, 0.)
+    { }
+
+    /// The number of users
+    std::size_t size () const { return _opinion.size(); }
+
+    /// The range of user indices, for use in range-based for loops
+    auto vertices () const {
+        return boost::irange<VertexDesc>(0, this->size());
+    }
+
+    UserRef operator[] (const VertexDesc v) {
+        return {_group[v], _discriminates[v], _opinion[v],
+                _tolerance[v], _susceptibility_1[v], _susceptibility_2[v]};
+    }
+
+    ConstUserRef operator[] (const VertexDesc v) const {
+        return {_group[v], _discriminates[v], _opinion[v],
+                _tolerance[v], _susceptibility_1[v], _susceptibility_2[v]};
+    }
+};
+
+/// The number of users of a population
+template<typename GroupType, typename OpinionType>
+std::size_t num_vertices (const Population<GroupType, OpinionType>& nw) {
+    return nw.size();
+}
+
+/// Returns a user of the population chosen uniformly at random
+template<typename GroupType, typename OpinionType, typename RNGType>
+std::size_t random_vertex (const Population<GroupType, OpinionType>& nw,
+                           RNGType& rng)
+{
+    std::uniform_int_distribution<std::size_t> distr(0, nw.size()-1);
+    return distr(rng);
+}
+
+/** A contiguous slice of the users of a population, which behaves as a
+  * population of its own: the users of the slice are indexed 0, ..., size()-1.
+  * Several independent replicas of the users are held in one population in
+  * this way, so that the attributes of all replicas remain contiguous.
+  */
+template<typename PopulationType>
+class PopulationView {
+    PopulationType* _population;
+    std::size_t _offset;
+    std::size_t _size;
+
+public:
+    /// The index of a user within the slice
+    using VertexDesc = std::size_t;
+
+    /// A view of num_users users of the population, starting at offset
+    PopulationView (PopulationType& population,
+                    const std::size_t offset,
+                    const std::size_t num_users)
+    :
+        _population(&population),
+        _offset(offset),
+        _size(num_users)
+    { }
+
+    /// The number of users in the slice
+    std::size_t size () const { return _size; }
+
+    /// The index of the first user of the slice in the population
+    std::size_t offset () const { return _offset; }
+
+    /// The range of user indices, for use in range-based for loops
+    auto vertices () const {
+        return boost::irange<VertexDesc>(0, this->size());
+    }
+
+    auto operator[] (const VertexDesc v) {
+        return (*_population)[_offset+v];
+    }
+
+    auto operator[] (const VertexDesc v) const {
+        return static_cast<const PopulationType&>(*_population)[_offset+v];
+    }
+};
+
+/// The number of users of a slice of a population
+template<typename PopulationType>
+std::size_t num_vertices (const PopulationView<PopulationType>& nw) {
+    return nw.size();
+}
+
+/// Returns a user of the slice chosen uniformly at random
+template<typename PopulationType, typename RNGType>
+std::size_t random_vertex (const PopulationView<PopulationType>& nw,
+                           RNGType& rng)
+{
+    std::uniform_int_distribution<std::size_t> distr(0, nw.size()-1);
+    return distr(rng);
+}
+
+/** An index of the members of each group, for sampling a partner from the
+  * same group in constant time. The group labels must be non-negative integers
+  * and must not change after the index has been built.
+  */
+class GroupIndex {
+    std::vector<std::vector<std::size_t>> _members;
+
+public:
+    GroupIndex () = default;
+
+    /// Builds the index of the current group labels of the users
+    template<typename NWType>
+    explicit GroupIndex (const NWType& nw)
+    :
+        _members{}
+    {
+        for (auto v : nw.vertices()) {
+            const std::size_t group = std::lround(nw[v].group);
+            if (group>=_members.size()) {
+                _members.resize(group+1);
+            }
+            _members[group].push_back(v);
+        }
+    }
+
+    /// The number of members of a group
+    std::size_t group_size (const double group) const {
+        const std::size_t g = std::lround(group);
+        return g<_members.size() ? _members[g].size() : 0;
+    }
+
+    /** Returns a member of v's group other than v, chosen uniformly at random,
+      * or v itself if it is the only member of its group
+      */
+    template<typename RNGType>
+    std::size_t random_peer (const double group, const std::size_t v,
+                             RNGType& rng) const
+    {
+        const auto& members = _members[std::lround(group)];
+        if (members.size()<2) {
+            return v;
+        }
+        // draw from all members but the last; if v is drawn, the last member
+        // takes its place
+        std::uniform_int_distribution<std::size_t> distr(0, members.size()-2);
+        const std::size_t peer = members[distr(rng)];
+        return peer==v ? members.back() : peer;
+    }
+};
+
+} // namespace
+
+#endif // UTOPIA_MODELS_OPDISC_POPULATION
@@ -2,26 +2,23 @@
 #define UTOPIA_MODELS_OPDISC_REVISION
 
 #include "modes.hh"
+#include "population.hh"
 #include "utils.hh"
 
 namespace Utopia::Models::OpDisc::revision {
 
 using modes::Mode;
 
-template<Mode model_mode, typename NWType, typename RNGType>
-void user_revision( NWType& nw,
-                    const bool extremism,
-                    const double homophily_param,
-                    const double t,
-                    std::uniform_real_distribution<double> prob_distr,
-                    RNGType& rng ){
-    /** Checks the model mode, chooses interaction partners and selects
-      * the opinion update function */
-
-    // choose random vertex pair that gets a revision opportunity
-    auto v = random_vertex(nw, rng);
-    auto nb = random_vertex(nw, rng);
-    while (nb==v){ nb = random_vertex(nw, rng); }
+template<Mode model_mode, typename NWType, typename VertexDescType>
+void revise_pair( NWType& nw,
+                  const VertexDescType v,
+                  const VertexDescType nb,
+                  const bool extremism,
+                  const double t ){
+    /** Applies the interaction rules of the model mode to a pair of users.
+      * Only the two users are read and modified, so that disjoint pairs can
+      * be revised concurrently.
+      */
     const double op_v = nw[v].opinion;
 
     // The interaction between members of the same group is always the same
@@ -74,16 +71,10 @@ void user_revision( NWType& nw,
         }
     }
 
+    // the homophilic choice of partners happens before the revision
     else if constexpr (model_mode==Mode::reduced_int_prob) {
-        const double interaction_prob=prob_distr(rng);
-        if (interaction_prob<=homophily_param){
-            while(nw[v].group!=nw[nb].group or nb==v) {
-                nb = random_vertex(nw, rng);
-            }
-        }
         utils::update_opinion(v, nw[nb].opinion, nw);
         utils::update_opinion(nb, op_v, nw);
-
     }
 
     else if constexpr (model_mode==Mode::reduced_s) {
@@ -96,6 +87,51 @@ void user_revision( NWType& nw,
     }
 }
 
+template<Mode model_mode, typename NWType, typename RNGType>
+auto user_revision( NWType& nw,
+                    const bool extremism,
+                    const double homophily_param,
+                    const double t,
+                    std::uniform_real_distribution<double> prob_distr,
+                    RNGType& rng,
+                    const GroupIndex* group_index = nullptr ){
+    /** Checks the model mode, chooses interaction partners and selects
+      * the opinion update function
+      * \param group_index Optional index of the group members, used to draw
+      *        same-group partners in the reduced_int_prob mode in constant
+      *        time. Without it, partners are drawn by rejection sampling.
+      * \return The pair of users that had a revision opportunity; no other
+      *         user's opinion is changed
+      */
+
+    // choose random vertex pair that gets a revision opportunity
+    auto v = random_vertex(nw, rng);
+    auto nb = random_vertex(nw, rng);
+    while (nb==v){ nb = random_vertex(nw, rng); }
+
+    // users of different groups interact with probability 1-homophily_param;
+    // otherwise, a partner from the same group is chosen
+    if constexpr (model_mode==Mode::reduced_int_prob) {
+        if (nw[v].group!=nw[nb].group
+            and prob_distr(rng)<=homophily_param) {
+            if (group_index) {
+                // users without peers interact with the random partner
+                const auto peer = group_index->random_peer(nw[v].group, v, rng);
+                if (peer!=v) { nb = peer; }
+            }
+            else {
+                while(nw[v].group!=nw[nb].group or nb==v) {
+                    nb = random_vertex(nw, rng);
+                }
+            }
+        }
+    }
+
+    revise_pair<model_mode>(nw, v, nb, extremism, t);
+
+    return std::make_pair(v, nb);
+}
+
 } // namespace
 
 #endif // UTOPIA_MODELS_OPDISC_REVISION
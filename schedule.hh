@@ -0,0 +1,148 @@
+#ifndef UTOPIA_MODELS_OPDISC_SCHEDULE
+#define UTOPIA_MODELS_OPDISC_SCHEDULE
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+namespace Utopia::Models::OpDisc::schedule {
+
+/** Decides at which of the write times of the model (given by write_start and
+  * write_every) the data is actually written.
+  *
+  * In the 'fixed' mode, the data is written at every write time. In the 'log'
+  * and 'list' modes, it is written at the first write time at or after each
+  * of the scheduled times, which are logarithmically spaced or given
+  * explicitly. In the 'adaptive' mode, it is written whenever the opinion
+  * distribution of a replica has changed by more than a threshold since the
+  * last write, measured as the total variation distance of the opinion
+  * histograms. Except in the fixed mode, the first and the last write time
+  * are always written.
+  */
+class WriteSchedule {
+public:
+    enum class Mode { fixed, log, list, adaptive };
+
+private:
+    Mode _mode;
+    // the scheduled times (log, list), and the index of the next one
+    std::vector<std::size_t> _times;
+    std::size_t _next;
+    // the threshold and the histograms at the last write (adaptive)
+    double _threshold;
+    std::size_t _num_bins;
+    std::vector<std::vector<double>> _hists;
+    bool _started;
+
+public:
+    /// A schedule writing at every write time
+    WriteSchedule ()
+    :
+        WriteSchedule("fixed", {}, 0., 1)
+    { }
+
+    /** Sets up a schedule of the given mode ('fixed', 'log', 'list' or
+      * 'adaptive') with the scheduled times (log, list) or the threshold and
+      * the number of histogram bins (adaptive).
+      *
+      * \throw std::invalid_argument on an invalid mode
+      */
+    WriteSchedule (const std::string& mode,
+                   std::vector<std::size_t> times,
+                   const double threshold,
+                   const std::size_t num_bins)
+    :
+        _mode(parse_mode(mode)),
+        _times(std::move(times)),
+        _next(0),
+        _threshold(threshold),
+        _num_bins(std::max<std::size_t>(num_bins, 1)),
+        _hists{},
+        _started(false)
+    {
+        std::sort(_times.begin(), _times.end());
+    }
+
+    /// num_writes logarithmically spaced times in [start, end], rounded to
+    /// integers, preceded by start
+    static std::vector<std::size_t> log_times (const std::size_t start,
+                                               const std::size_t end,
+                                               const std::size_t num_writes)
+    {
+        const double log_start = std::log(std::max<std::size_t>(start, 1));
+        const double log_end = std::log(std::max<std::size_t>(end, 1));
+        std::vector<std::size_t> times = {start};
+        for (std::size_t i=0; i<num_writes; ++i) {
+            const double f = num_writes>1 ? (double)i/(num_writes-1) : 1.;
+            times.push_back(std::lround(std::exp(log_start+f*(log_end-log_start))));
+        }
+        times.erase(std::unique(times.begin(), times.end()), times.end());
+        return times;
+    }
+
+    /// Whether the data is written at every write time
+    bool fixed () const { return _mode==Mode::fixed; }
+
+    /** Decides whether the data is written at the given write time, and if
+      * so, records the opinion distribution of the users of each population
+      * for the adaptive mode. If force is set, the data is always written.
+      */
+    template<typename NWRange>
+    bool decide (const std::size_t time, const NWRange& nws, const bool force) {
+        bool write = force or not _started or _mode==Mode::fixed;
+        if (_mode==Mode::log or _mode==Mode::list) {
+            while (_next<_times.size() and _times[_next]<=time) {
+                write = true;
+                ++_next;
+            }
+        }
+        else if (_mode==Mode::adaptive) {
+            std::vector<std::vector<double>> hists;
+            for (const auto& nw : nws) {
+                hists.push_back(this->histogram(nw));
+            }
+            for (std::size_t r=0; r<_hists.size() and not write; ++r) {
+                double distance = 0.;
+                for (std::size_t b=0; b<_num_bins; ++b) {
+                    distance += std::fabs(hists[r][b]-_hists[r][b]);
+                }
+                write = 0.5*distance>_threshold;
+            }
+            if (write) {
+                _hists = std::move(hists);
+            }
+        }
+        _started = true;
+        return write;
+    }
+
+private:
+    static Mode parse_mode (const std::string& mode) {
+        if (mode=="fixed") { return Mode::fixed; }
+        if (mode=="log") { return Mode::log; }
+        if (mode=="list") { return Mode::list; }
+        if (mode=="adaptive") { return Mode::adaptive; }
+        throw std::invalid_argument("Invalid write schedule '"+mode+"'! "
+                                    "Choose from: fixed, log, list, adaptive.");
+    }
+
+    /// The normalised histogram of the opinions of a population on [0, 1]
+    template<typename NWType>
+    std::vector<double> histogram (const NWType& nw) const {
+        std::vector<double> hist(_num_bins, 0.);
+        for (auto v : nw.vertices()) {
+            const double op = std::clamp((double)nw[v].opinion, 0., 1.);
+            hist[std::min((std::size_t)(op*_num_bins), _num_bins-1)] += 1.;
+        }
+        for (auto& h : hist) {
+            h /= std::max<std::size_t>(nw.size(), 1);
+        }
+        return hist;
+    }
+};
+
+} // namespace
+
+#endif // UTOPIA_MODELS_OPDISC_SCHEDULE
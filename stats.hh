@@ -0,0 +1,173 @@
+#ifndef UTOPIA_MODELS_OPDISC_STATS
+#define UTOPIA_MODELS_OPDISC_STATS
+
+#include <algorithm>
+#include <cmath>
+#include <vector>
+
+namespace Utopia::Models::OpDisc::stats {
+
+/** Running summary statistics of the user opinions: the size, mean opinion
+  * and opinion variance of each group, and a fixed-bin opinion histogram of
+  * each group. The statistics are updated in O(1) for every user whose state
+  * has changed, so that the full opinion matrix need not be written. Means and
+  * variances are updated using Welford's algorithm (with removal), which
+  * remains accurate when the opinions of a group have converged.
+  *
+  * Groups are either the integer group labels 0, ..., num_groups-1, or, if age
+  * bin edges are given, age intervals. As in the plot functions, the age bins
+  * are closed on the right, with the lowest edge included in the first bin.
+  * The histogram has num_bins equally sized bins on [0, 1], the last one
+  * closed on the right.
+  */
+class GroupStats {
+    std::size_t _num_groups;
+    std::size_t _num_bins;
+    std::vector<double> _age_edges;
+
+    // per-group statistics; the histogram is stored group-major
+    std::vector<std::size_t> _counts;
+    std::vector<double> _means;
+    std::vector<double> _m2;
+    std::vector<std::size_t> _hist;
+    double _total_sum;
+
+    // the state of each user as last accounted for
+    std::vector<double> _opinion;
+    std::vector<int> _group;
+    std::vector<int> _bin;
+
+public:
+    GroupStats (const std::size_t num_groups,
+                const std::size_t num_bins,
+                const std::vector<double>& age_edges = {})
+    :
+        _num_groups(age_edges.empty() ? num_groups : age_edges.size()-1),
+        _num_bins(num_bins),
+        _age_edges(age_edges),
+        _counts(_num_groups, 0),
+        _means(_num_groups, 0.),
+        _m2(_num_groups, 0.),
+        _hist(_num_groups*num_bins, 0),
+        _total_sum(0.),
+        _opinion{},
+        _group{},
+        _bin{}
+    { }
+
+    /// The index of the group a user with the given label belongs to, or -1
+    int group_index (const double group) const {
+        if (_age_edges.empty()) {
+            const int idx = std::lround(group);
+            return (idx>=0 and idx<(int)_num_groups) ? idx : -1;
+        }
+        if (group<_age_edges.front() or group>_age_edges.back()) {
+            return -1;
+        }
+        const auto it = std::lower_bound(_age_edges.begin(), _age_edges.end(),
+                                         group);
+        return std::max(0, (int)(it-_age_edges.begin())-1);
+    }
+
+    /// The index of the histogram bin of an opinion, or -1 if outside [0, 1]
+    int bin_index (const double opinion) const {
+        if (opinion<0. or opinion>1.) {
+            return -1;
+        }
+        return std::min((int)(opinion*_num_bins), (int)_num_bins-1);
+    }
+
+    /// Recomputes all statistics from the current state of the users
+    template<typename NWType>
+    void reset (const NWType& nw) {
+        const std::size_t num_users = nw.size();
+        std::fill(_counts.begin(), _counts.end(), 0);
+        std::fill(_means.begin(), _means.end(), 0.);
+        std::fill(_m2.begin(), _m2.end(), 0.);
+        std::fill(_hist.begin(), _hist.end(), 0);
+        _total_sum = 0.;
+        _opinion.assign(num_users, 0.);
+        _group.assign(num_users, -1);
+        _bin.assign(num_users, -1);
+        for (std::size_t v=0; v<num_users; ++v) {
+            this->add(v, nw[v].opinion, nw[v].group);
+        }
+    }
+
+    /// Updates the statistics for a user whose state may have changed
+    template<typename NWType, typename VertexDescType>
+    void update (const NWType& nw, const VertexDescType v) {
+        this->remove(v);
+        this->add(v, nw[v].opinion, nw[v].group);
+    }
+
+    std::size_t num_groups () const { return _num_groups; }
+    std::size_t num_bins () const { return _num_bins; }
+    const std::vector<std::size_t>& counts () const { return _counts; }
+    const std::vector<std::size_t>& hist () const { return _hist; }
+
+    /// The mean opinion of each group (0 for empty groups)
+    const std::vector<double>& means () const { return _means; }
+
+    /// The standard deviation of the opinions of each group (0 for empty
+    /// groups)
+    std::vector<double> stddevs () const {
+        std::vector<double> stddevs(_num_groups, 0.);
+        for (std::size_t g=0; g<_num_groups; ++g) {
+            if (_counts[g]) {
+                stddevs[g] = std::sqrt(std::max(_m2[g]/_counts[g], 0.));
+            }
+        }
+        return stddevs;
+    }
+
+    /// The mean opinion of all users
+    double global_mean () const {
+        return _opinion.empty() ? 0. : _total_sum/_opinion.size();
+    }
+
+private:
+    void add (const std::size_t v, const double opinion, const double group) {
+        _opinion[v] = opinion;
+        _group[v] = this->group_index(group);
+        _bin[v] = this->bin_index(opinion);
+        _total_sum += opinion;
+        if (_group[v]<0) {
+            return;
+        }
+        const int g = _group[v];
+        _counts[g] += 1;
+        const double delta = opinion-_means[g];
+        _means[g] += delta/_counts[g];
+        _m2[g] += delta*(opinion-_means[g]);
+        if (_bin[v]>=0) {
+            _hist[g*_num_bins+_bin[v]] += 1;
+        }
+    }
+
+    void remove (const std::size_t v) {
+        const double opinion = _opinion[v];
+        _total_sum -= opinion;
+        if (_group[v]<0) {
+            return;
+        }
+        const int g = _group[v];
+        _counts[g] -= 1;
+        if (_counts[g]==0) {
+            _means[g] = 0.;
+            _m2[g] = 0.;
+        }
+        else {
+            const double delta = opinion-_means[g];
+            _means[g] -= delta/_counts[g];
+            _m2[g] -= delta*(opinion-_means[g]);
+        }
+        if (_bin[v]>=0) {
+            _hist[g*_num_bins+_bin[v]] -= 1;
+        }
+    }
+};
+
+} // namespace
+
+#endif // UTOPIA_MODELS_OPDISC_STATS
@@ -1,18 +1,95 @@
-import ruamel.yaml as yaml
-import os
+"""Plots a list of subspace selections of a sweep plot from a single run.
 
+The multiverse data is loaded only once. Each selection is then plotted from
+the loaded data, optionally distributed over a pool of worker processes which
+share the loaded data manager.
+
+Usage:
+    python sweep_script.py RUN_DIR [--plots_cfg OpDisc_plots.yml]
+        [--plot area] [--num_workers 4]
+"""
+import argparse
+import copy
+import logging
+import multiprocessing
+
+from ruamel.yaml import YAML
+
+from utopya import FrozenMultiverse
+
+log = logging.getLogger(__name__)
+
+#the (number_of_groups, homophily_parameter) selections to be plotted
 to_plot = [(5, 0.6), (5, 0.95), (7, 0.1), (7, 0.3), (7, 0.6), (7, 0.95), (9, 0.1), (9, 0.3), (9, 0.6), (9, 0.95)]
 
-with open('OpDisc_plots_backup.yml') as file:
-    A = yaml.safe_load(file)
+#the frozen multiverse, shared with the worker processes
+_MV = None
+
+## -----------------------------------------------------------------------------
+def selection_cfgs(plot_cfg: dict, selections: list, *, name: str) -> dict:
+    """Returns the plot configurations of all subspace selections.
+
+    Arguments:
+        plot_cfg (dict): the configuration of the plot to be selected from
+        selections (list): list of (number_of_groups, homophily_parameter)
+        name (str): the name of the plot
+
+    Returns:
+        cfgs (dict): the plot configurations, keyed by the plot names
+    """
+    cfgs = {}
+    for num_groups, phom in selections:
+        cfg = copy.deepcopy(plot_cfg)
+        subspace = cfg.setdefault('select', {}).setdefault('subspace', {})
+        subspace['number_of_groups'] = num_groups
+        subspace['homophily_parameter'] = phom
+        cfgs[f"{name}_N_{num_groups}_phom_{phom}"] = cfg
+
+    return cfgs
+
+## -----------------------------------------------------------------------------
+def _plot(args: tuple):
+    """Plots a single selection from the shared multiverse"""
+    name, cfg = args
+    _MV.pm.plot(name, **cfg)
+
+## -----------------------------------------------------------------------------
+def plot_selections(run_dir: str, cfgs: dict, *, num_workers: int=1):
+    """Loads the data of a run once and plots all given plot configurations.
+
+    Arguments:
+        run_dir (str): the run directory
+        cfgs (dict): the plot configurations, keyed by the plot names
+        num_workers (int, optional): the number of worker processes. The
+            workers are forked after loading the data and thus share the
+            loaded data manager.
+    """
+    global _MV
+    _MV = FrozenMultiverse(model_name='OpDisc', run_dir=run_dir)
+    _MV.dm.load_from_cfg(print_tree=False)
+
+    if num_workers<=1:
+        for item in cfgs.items():
+            _plot(item)
+        return
+
+    with multiprocessing.get_context('fork').Pool(num_workers) as pool:
+        pool.map(_plot, cfgs.items(), chunksize=1)
+
+## -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('run_dir', help="the run directory to be evaluated")
+    parser.add_argument('--plots_cfg', default='OpDisc_plots.yml',
+                        help="the plots configuration holding the plot")
+    parser.add_argument('--plot', default='area',
+                        help="the name of the plot to select from")
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help="the number of worker processes")
+    args = parser.parse_args()
 
-for item in to_plot:
-    
-    A['area']['select']['subspace']['number_of_groups']=item[0]
-    A['area']['select']['subspace']['homophily_parameter']=item[1]
+    with open(args.plots_cfg) as file:
+        plots_cfg = YAML(typ='safe').load(file)
 
-    with open(r'OpDisc_plots.yml', 'w') as file:
-        documents = yaml.dump(A, file)
-   
-    os.system('utopia eval OpDisc /Users/thomasgaskin/utopia_output/OpDisc/201009-143102 --plot-only area')
-        
+    cfgs = selection_cfgs(plots_cfg[args.plot], to_plot, name=args.plot)
+    plot_selections(args.run_dir, cfgs, num_workers=args.num_workers)
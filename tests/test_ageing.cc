@@ -18,12 +18,8 @@ Config cfg = YAML::LoadFile("test_config.yml")["test_ageing"];
 
 // ----------------------------- Fixtures --------------------------------------
 struct TestNetwork {
-    Network nw;
-    TestNetwork() : nw{}
-    {
-        const unsigned num_vertices = 2;
-        boost::generate_random_graph(nw, num_vertices, 0, rng, false, false);
-    }
+    Population<> nw;
+    TestNetwork() : nw(2) { }
 };
 
 // ------------------------ Helper functions -----------------------------------
@@ -52,7 +48,7 @@ void test_group_ops (NWType& nw, int group, vec_d opinions) {
     /* Checks if the opinions of the group correspond to the given list
      * of opinions
      */
-    for (auto v : range<IterateOver::vertices>(nw)) {
+    for (auto v : nw.vertices()) {
         if (nw[v].group==group) {
           BOOST_TEST (nw[v].opinion==opinions[v]);
         }
@@ -81,7 +77,7 @@ BOOST_FIXTURE_TEST_CASE (test_age_increase, TestNetwork) {
     }
 
     // check the ages have increased correctly
-    for (auto v : range<IterateOver::vertices>(nw)) {
+    for (auto v : nw.vertices()) {
         BOOST_TEST (nw[v].group==groups[v]+num_steps);
     }
 }
@@ -146,6 +142,61 @@ BOOST_FIXTURE_TEST_CASE (test_reinitialistion, TestNetwork) {
 }
 }
 
+//------------------------------------------------------------------------------
+// test the index of eligible parents is kept up to date
+BOOST_AUTO_TEST_CASE (test_parent_index) {
+{
+    Population<> nw(4);
+    setup_nw(nw, {15, 25, 39.5, 100}, {0.1, 0.2, 0.3, 0.4}, vec_d(4, 0.),
+             vec_d(4, 0.2), vec_d(4, 0.));
+    aging::ParentIndex parent_index(nw);
+    BOOST_TEST (parent_index.size()==2);
+    BOOST_TEST (parent_index.contains(1));
+    BOOST_TEST (parent_index.contains(2));
+
+    //parents other than the user itself are drawn uniformly
+    unsigned count_1 = 0;
+    for (unsigned i=0; i<10000; ++i) {
+        const auto parent = parent_index.random_parent(0, rng);
+        BOOST_REQUIRE (parent.has_value());
+        BOOST_REQUIRE ((*parent==1 or *parent==2));
+        count_1 += (*parent==1);
+    }
+    BOOST_TEST (count_1/10000.==0.5, boost::test_tools::tolerance(0.05));
+    BOOST_TEST (*parent_index.random_parent(1, rng)==2);
+
+    //users leaving and entering the age band are removed and added
+    nw[2].group = 41;
+    parent_index.update(nw, 2);
+    nw[0].group = 20;
+    parent_index.update(nw, 0);
+    BOOST_TEST (parent_index.size()==2);
+    BOOST_TEST (not parent_index.contains(2));
+    BOOST_TEST (parent_index.contains(0));
+
+    //the index is updated during the revisions
+    for (unsigned i=0; i<50; ++i) {
+        aging::user_revision(nw, false, life_expectancy, peer_radius,
+                             time_scale, 0., rng, &parent_index);
+        BOOST_TEST (parent_index.size()==aging::ParentIndex(nw).size());
+        for (auto v : nw.vertices()) {
+            BOOST_TEST (parent_index.contains(v)
+                        ==(nw[v].group>=20 and nw[v].group<=40));
+        }
+    }
+
+    //without eligible parents, children are given a random opinion
+    setup_nw(nw, {10, 50, 60, 101}, {0.1, 0.2, 0.3, 2.}, vec_d(4, 0.),
+             vec_d(4, 0.2), vec_d(4, 0.));
+    parent_index = aging::ParentIndex(nw);
+    BOOST_TEST (parent_index.size()==0);
+    BOOST_TEST (not parent_index.random_parent(3, rng).has_value());
+    aging::reinitialise_as_child(nw, 3, false, 0., rng, &parent_index);
+    BOOST_TEST (nw[3].group==10);
+    BOOST_TEST ((nw[3].opinion>=0. and nw[3].opinion<=1.));
+}
+}
+
 //------------------------------------------------------------------------------
 // test the opinion interaction process
 BOOST_FIXTURE_TEST_CASE (test_interaction,
@@ -0,0 +1,98 @@
+#define BOOST_TEST_MODULE test convergence
+
+#include <boost/test/unit_test.hpp>
+
+#include <utopia/core/model.hh>
+
+#include "../OpDisc.hh"
+#include "../convergence.hh"
+#include "../revision.hh"
+#include "../utils.hh"
+
+namespace Utopia::Models::OpDisc {
+
+// --------------------------- Type definitions --------------------------------
+std::mt19937 rng{};
+std::uniform_real_distribution<double> uniform_prob_distr;
+
+// ------------------------------ Fixtures -------------------------------------
+//two clusters at 0.2 and 0.8 of two groups each, with tolerance 0.3
+struct TestClusters {
+    Population<> nw;
+    TestClusters() : nw(100) {
+        for (auto v : nw.vertices()) {
+            nw[v].group = v%2;
+            nw[v].opinion = (v<50 ? 0.2 : 0.8) + 1e-6*(v%5);
+            nw[v].tolerance = 0.3;
+            nw[v].susceptibility_1 = 0.3;
+            nw[v].susceptibility_2 = 0.3;
+        }
+    }
+};
+
+// ---------------------------- Tests ------------------------------------------
+//test the cluster criterion
+BOOST_FIXTURE_TEST_CASE (test_clusters, TestClusters)
+{
+    BOOST_TEST (convergence::is_frozen<reduced_s>(nw, 1e-4));
+    //the clusters are not converged to the precision
+    BOOST_TEST (not convergence::is_frozen<reduced_s>(nw, 1e-7));
+
+    //a user within the tolerance of the other cluster
+    nw[0].tolerance = 0.7;
+    BOOST_TEST (not convergence::is_frozen<reduced_s>(nw, 1e-4));
+    nw[0].tolerance = 0.3;
+
+    //a user between the clusters
+    nw[0].opinion = 0.5;
+    BOOST_TEST (not convergence::is_frozen<reduced_s>(nw, 1e-4));
+}
+
+//test that clusters of rejecting users are not frozen
+BOOST_FIXTURE_TEST_CASE (test_conflict, TestClusters)
+{
+    BOOST_TEST (not convergence::is_frozen<conflict_dir>(nw, 1e-4));
+    //without discriminators, the groups of the undirected mode agree
+    BOOST_TEST (convergence::is_frozen<conflict_undir>(nw, 1e-4));
+    nw[3].discriminates = true;
+    BOOST_TEST (not convergence::is_frozen<conflict_undir>(nw, 1e-4));
+
+    //single-group clusters are frozen
+    for (auto v : nw.vertices()) {
+        nw[v].group = v<50;
+    }
+    BOOST_TEST (convergence::is_frozen<conflict_dir>(nw, 1e-4));
+    BOOST_TEST (convergence::is_frozen<conflict_undir>(nw, 1e-4));
+}
+
+//test that further revisions do not change a frozen configuration
+BOOST_AUTO_TEST_CASE (test_revisions)
+{
+    Population<> nw(200);
+    utils::initialize<reduced_s>(nw, 0., false, 0.5, 80, 2, 0.3, 0.2,
+                                 uniform_prob_distr, rng);
+    unsigned steps = 0;
+    while (not convergence::is_frozen<reduced_s>(nw, 1e-4)) {
+        for (unsigned i=0; i<1000; ++i) {
+            revision::user_revision<reduced_s>(nw, false, 0.5, 0.2,
+                                               uniform_prob_distr, rng);
+        }
+        steps += 1000;
+        BOOST_REQUIRE (steps<10000000);
+    }
+
+    std::vector<double> opinions;
+    for (auto v : nw.vertices()) {
+        opinions.push_back(nw[v].opinion);
+    }
+    for (unsigned i=0; i<100000; ++i) {
+        revision::user_revision<reduced_s>(nw, false, 0.5, 0.2,
+                                           uniform_prob_distr, rng);
+    }
+    for (auto v : nw.vertices()) {
+        BOOST_TEST (std::fabs(nw[v].opinion-opinions[v])<=1e-4);
+    }
+    BOOST_TEST (convergence::is_frozen<reduced_s>(nw, 1e-4));
+}
+
+} // namespace
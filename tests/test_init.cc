@@ -20,16 +20,13 @@ Config config = YAML::LoadFile("test_config.yml")["test_init"];
 // ----------------------------- Fixtures --------------------------------------
 struct TestNetwork {
     Config cfg;
-    Network nw;
+    Population<> nw;
 
     TestNetwork()
     :
     cfg(config),
-    nw{}
-    {
-        const unsigned num_vertices = get_as<int>("num_users", cfg);
-        boost::generate_random_graph(nw, num_vertices, 0, rng, false, false);
-    }
+    nw(get_as<int>("num_users", cfg))
+    { }
 };
 
 // --------------------------- Helper function ---------------------------------
@@ -77,7 +74,7 @@ BOOST_FIXTURE_TEST_CASE (test_general_and_ageing, TestNetwork,
         //test discriminators initialisation by default
         BOOST_TEST_CHECKPOINT ("Testing general initialisation ...");
         double avg_op = 0;
-        for (auto v : range<IterateOver::vertices>(nw)) {
+        for (auto v : nw.vertices()) {
             BOOST_TEST (nw[v].opinion>=0);
             BOOST_TEST (nw[v].opinion<=1);
             BOOST_TEST (nw[v].tolerance
@@ -94,18 +91,18 @@ BOOST_FIXTURE_TEST_CASE (test_general_and_ageing, TestNetwork,
                        );
             avg_op+=nw[v].opinion;
         }
-        avg_op/=boost::num_vertices(nw);
+        avg_op/=nw.size();
         BOOST_TEST (avg_op == 0.5);
 
         //test group initialisation in the ageing case
         BOOST_TEST_CHECKPOINT ("Testing ageing-specific properties ...");
         double avg_age = 0;
-        for (auto v : range<IterateOver::vertices>(nw)) {
+        for (auto v : nw.vertices()) {
             BOOST_TEST (nw[v].group>=10);
             BOOST_TEST (nw[v].group<=life_expectancy);
             avg_age+=nw[v].group;
         }
-        avg_age/=boost::num_vertices(nw);
+        avg_age/=nw.size();
         BOOST_TEST (avg_age == (life_expectancy+10)/2.);
     }
 }
@@ -124,7 +121,7 @@ BOOST_FIXTURE_TEST_CASE (test_conflict_dir, TestNetwork,
         BOOST_TEST_CHECKPOINT ("Testing mode conflict_dir ...");
         std::vector<unsigned> groups(num_groups[n], 0);
         std::vector<double> group_op(num_groups[n], 0.);
-        for (auto v : range<IterateOver::vertices>(nw)) {
+        for (auto v : nw.vertices()) {
             BOOST_TEST (nw[v].susceptibility_1
                      == susceptibility
                        );
@@ -141,7 +138,7 @@ BOOST_FIXTURE_TEST_CASE (test_conflict_dir, TestNetwork,
         // centered around 0.5
         for (unsigned i=0; i<groups.size(); ++i) {
             BOOST_TEST (1.*groups[i]
-                     == boost::num_vertices(nw)/num_groups[n],
+                     == nw.size()/num_groups[n],
                         boost::test_tools::tolerance(0.025)
                        );
             double avg_op = group_op[i]/groups[i];
@@ -167,10 +164,10 @@ BOOST_FIXTURE_TEST_CASE (test_conflict_undir, TestNetwork,
 
         // check proportion of discriminators
         double discriminator_prop = 0;
-        for (auto v : range<IterateOver::vertices>(nw)){
+        for (auto v : nw.vertices()){
             discriminator_prop+=nw[v].discriminates;
         }
-        BOOST_TEST (discriminator_prop/boost::num_vertices(nw)
+        BOOST_TEST (discriminator_prop/nw.size()
                  == discriminators
                    );
       }
@@ -191,7 +188,7 @@ BOOST_FIXTURE_TEST_CASE (test_reduced_s, TestNetwork,
         //collect group size and average opinion
         std::vector<unsigned> groups(num_groups[n], 0);
         std::vector<double> group_op(num_groups[n], 0.);
-        for (auto v : range<IterateOver::vertices>(nw)) {
+        for (auto v : nw.vertices()) {
             BOOST_TEST (nw[v].group>=0);
             BOOST_TEST (nw[v].group<=num_groups[n]-1);
             groups[nw[v].group]+=1;
@@ -201,7 +198,7 @@ BOOST_FIXTURE_TEST_CASE (test_reduced_s, TestNetwork,
         //check groups are evenly distributed and check group sizes
         for (unsigned i=1; i<groups.size()-1; ++i) {
             BOOST_TEST (1.*groups[i]
-                     == boost::num_vertices(nw)/(num_groups[n]-1),
+                     == nw.size()/(num_groups[n]-1),
                         boost::test_tools::tolerance(0.04)
                        );
             double avg_op = group_op[i]/groups[i];
@@ -241,7 +238,7 @@ BOOST_FIXTURE_TEST_CASE (test_extremism, TestNetwork) {
 
     BOOST_TEST_CHECKPOINT ("Testing model with extremism on ...");
 
-    for (auto v : range<IterateOver::vertices>(nw)) {
+    for (auto v : nw.vertices()) {
             BOOST_TEST (nw[v].tolerance
                      == utils::tolerance_func(nw[v].opinion, tolerance));
         }
@@ -0,0 +1,156 @@
+#define BOOST_TEST_MODULE test parallel
+
+#include <atomic>
+#include <stdexcept>
+
+#include <boost/test/unit_test.hpp>
+
+#include <utopia/core/model.hh>
+
+#include "../OpDisc.hh"
+#include "../parallel.hh"
+#include "../revision.hh"
+#include "../utils.hh"
+
+namespace Utopia::Models::OpDisc {
+
+// --------------------------- Type definitions --------------------------------
+using vec_u = std::vector<unsigned>;
+std::mt19937 rng{};
+std::uniform_real_distribution<double> uniform_prob_distr;
+
+// ------------------------- Helper functions ----------------------------------
+//check that the matching is a valid matching of the users within their classes
+template<typename MatchingType>
+void test_matching (const MatchingType& matching, const vec_u& classes,
+                    const unsigned num_classes)
+{
+    vec_u matched(classes.size(), 0);
+    vec_u class_size(num_classes, 0);
+    for (auto c : classes) { ++class_size[c]; }
+
+    unsigned expected_pairs = 0;
+    for (auto size : class_size) { expected_pairs += size/2; }
+    BOOST_TEST (matching.num_pairs()==expected_pairs);
+
+    for (std::size_t p=0; p<matching.num_pairs(); ++p) {
+        const auto [v, nb] = matching.pair(p);
+        BOOST_REQUIRE (v!=nb);
+        BOOST_TEST (classes[v]==classes[nb]);
+        ++matched[v];
+        ++matched[nb];
+    }
+    for (auto count : matched) {
+        BOOST_REQUIRE (count<=1);
+    }
+}
+
+// ---------------------------- Tests ------------------------------------------
+//test the thread pool covers each range exactly once and is reusable
+BOOST_AUTO_TEST_CASE (test_thread_pool)
+{
+    for (std::size_t num_threads : {1, 4}) {
+        BOOST_TEST_CHECKPOINT ("Threads: " << num_threads);
+        parallel::ThreadPool pool(num_threads);
+        BOOST_TEST (pool.num_threads()==num_threads);
+
+        //the same threads are reused for many ranges, including empty ones
+        for (std::size_t n : {0, 1, 3, 1000, 1001}) {
+            for (unsigned i=0; i<100; ++i) {
+                vec_u count(n, 0);
+                std::vector<unsigned> used(num_threads, 0);
+                pool.for_blocks(n, [&](const std::size_t thread,
+                                       const std::size_t begin,
+                                       const std::size_t end)
+                {
+                    ++used[thread];
+                    for (std::size_t j=begin; j<end; ++j) { ++count[j]; }
+                });
+                for (auto c : count) { BOOST_REQUIRE (c==1); }
+                for (auto u : used) { BOOST_REQUIRE (u==1); }
+            }
+        }
+
+        //exceptions thrown by a block are passed on to the caller
+        BOOST_CHECK_THROW (pool.for_blocks(10,
+            [num_threads](const std::size_t thread, auto, auto) {
+                if (thread+1==num_threads) {
+                    throw std::runtime_error("block failed");
+                }
+            }), std::runtime_error);
+        //and the pool remains usable
+        std::atomic<std::size_t> sum{0};
+        pool.for_blocks(100, [&](auto, const std::size_t begin,
+                                 const std::size_t end) { sum += end-begin; });
+        BOOST_TEST (sum==100);
+    }
+}
+
+//test the random matchings are valid and uniform
+BOOST_AUTO_TEST_CASE (test_random_matching)
+{
+    for (std::size_t num_threads : {1, 3}) {
+        BOOST_TEST_CHECKPOINT ("Threads: " << num_threads);
+
+        //a single class
+        const std::size_t num_users = 101;
+        auto pool = std::make_shared<parallel::ThreadPool>(num_threads);
+        parallel::RandomMatching<std::mt19937> matching(num_users, 1, pool, rng);
+        BOOST_TEST (matching.num_threads()==num_threads);
+        std::vector<unsigned> partner_of_0(num_users, 0);
+        for (unsigned i=0; i<20000; ++i) {
+            matching.draw();
+            if (i<100) {
+                test_matching(matching, vec_u(num_users, 0), 1);
+            }
+            for (std::size_t p=0; p<matching.num_pairs(); ++p) {
+                const auto [v, nb] = matching.pair(p);
+                if (v==0) { ++partner_of_0[nb]; }
+                if (nb==0) { ++partner_of_0[v]; }
+            }
+        }
+        //user 0 is matched to each other user with equal probability
+        for (std::size_t v=1; v<num_users; ++v) {
+            BOOST_TEST (partner_of_0[v]/20000.==1./num_users,
+                        boost::test_tools::tolerance(0.25));
+        }
+
+        //users are only matched within their classes
+        vec_u classes(num_users);
+        for (std::size_t v=0; v<num_users; ++v) { classes[v] = v%4; }
+        parallel::RandomMatching<std::mt19937> class_matching(num_users, 4,
+                                                              pool, rng);
+        for (unsigned i=0; i<100; ++i) {
+            class_matching.draw([&classes](const std::size_t v, auto&) {
+                return (std::size_t)classes[v];
+            });
+            test_matching(class_matching, classes, 4);
+        }
+    }
+}
+
+//test a parallel sweep revises each matched user exactly once
+BOOST_AUTO_TEST_CASE (test_parallel_sweep)
+{
+    Population<> nw(1000);
+    utils::initialize<conflict_undir>(nw, 0.3, false, 0.5, 80, 3, 0.3, 0.3,
+                                      uniform_prob_distr, rng);
+    parallel::RandomMatching<std::mt19937> matching(nw.size(), 1,
+                        std::make_shared<parallel::ThreadPool>(4), rng);
+
+    std::vector<unsigned> revisions(nw.size(), 0);
+    matching.draw();
+    matching.for_each_pair([&](const auto v, const auto nb) {
+        ++revisions[v];
+        ++revisions[nb];
+        revision::revise_pair<conflict_undir>(nw, v, nb, false, 0.3);
+    });
+    for (auto count : revisions) {
+        BOOST_TEST (count==1);
+    }
+    for (auto v : nw.vertices()) {
+        BOOST_TEST ((nw[v].opinion>=0. and nw[v].opinion<=1.));
+    }
+}
+
+} // namespace
@@ -20,21 +20,13 @@ std::uniform_real_distribution<double> uniform_prob_distr;
 
 // ------------------------------ Fixtures -------------------------------------
 struct Large_TestNetwork {
-    Network nw;
-    Large_TestNetwork() : nw{}
-    {
-        const unsigned num_vertices = 4;
-        boost::generate_random_graph(nw, num_vertices, 0, rng, false, false);
-    }
+    Population<> nw;
+    Large_TestNetwork() : nw(4) { }
 };
 
 struct Small_TestNetwork {
-    Network nw;
-    Small_TestNetwork() : nw{}
-    {
-        const unsigned num_vertices = 2;
-        boost::generate_random_graph(nw, num_vertices, 0, rng, false, false);
-    }
+    Population<> nw;
+    Small_TestNetwork() : nw(2) { }
 };
 
 // ------------------------- Helper functions ----------------------------------
@@ -59,7 +51,7 @@ void setup_nw (NWType& nw,
 
 template<typename NWType>
 void test_group_ops (NWType& nw, int group, vec_d opinions) {
-    for (auto v : range<IterateOver::vertices>(nw)) {
+    for (auto v : nw.vertices()) {
         if (nw[v].group==group) {
             BOOST_TEST (nw[v].opinion==opinions[v]);
         }
@@ -148,19 +140,64 @@ BOOST_FIXTURE_TEST_CASE (test_reduced_int_prob_op_update,
     p_hom = 0;
     setup_nw(nw, groups, ops, susc_1, tol);
 
-    BOOST_TEST (op_sum(nw, boost::num_vertices(nw))==1.99);
+    BOOST_TEST (op_sum(nw, nw.size())==1.99);
 
     revision::user_revision<reduced_int_prob>(nw, false, p_hom, 0,
                                               uniform_prob_distr, rng);
 
     //check an interaction took place
-    BOOST_TEST (op_sum(nw, boost::num_vertices(nw))!=1.99);
+    BOOST_TEST (op_sum(nw, nw.size())!=1.99);
 
-    const double& opsum = op_sum(nw, boost::num_vertices(nw));
+    const double& opsum = op_sum(nw, nw.size());
     revision::user_revision<reduced_int_prob>(nw, false, p_hom, 0,
                                               uniform_prob_distr, rng);
     //check an interaction took place
-    BOOST_TEST (opsum!=op_sum(nw, boost::num_vertices(nw)));
+    BOOST_TEST (opsum!=op_sum(nw, nw.size()));
+}
+}
+
+// -----------------------------------------------------------------------------
+// test the same-group partner sampling using the group index
+BOOST_AUTO_TEST_CASE (test_group_index) {
+{
+    Population<> nw(10);
+    //groups 0 and 2 at the edges are half as large as group 1
+    vec_u groups = {0, 0, 1, 1, 1, 1, 2, 2, 1, 3};
+    for (auto v : nw.vertices()) {
+        nw[v].group = groups[v];
+        nw[v].opinion = 0.1*v;
+        nw[v].susceptibility_1 = 0.5;
+        nw[v].tolerance = 1.;
+    }
+    const GroupIndex group_index(nw);
+    BOOST_TEST (group_index.group_size(0)==2);
+    BOOST_TEST (group_index.group_size(1)==5);
+    BOOST_TEST (group_index.group_size(4)==0);
+
+    //peers are drawn uniformly from the other group members
+    std::vector<unsigned> counts(nw.size(), 0);
+    for (unsigned i=0; i<40000; ++i) {
+        const auto peer = group_index.random_peer(1., 2, rng);
+        BOOST_REQUIRE (peer!=2);
+        BOOST_REQUIRE (groups[peer]==1);
+        ++counts[peer];
+    }
+    for (auto v : {3, 4, 5, 8}) {
+        BOOST_TEST (counts[v]/40000.==0.25, boost::test_tools::tolerance(0.05));
+    }
+    BOOST_TEST (group_index.random_peer(0., 0, rng)==1);
+    BOOST_TEST (group_index.random_peer(3., 9, rng)==9);
+
+    //with p_hom=1, only members of the same group interact
+    for (unsigned i=0; i<100; ++i) {
+        auto [v, nb] = revision::user_revision<reduced_int_prob>(nw, false, 1., 1.,
+                                                                uniform_prob_distr,
+                                                                rng, &group_index);
+        BOOST_TEST (v!=nb);
+        if (nw[v].group!=3) {
+            BOOST_TEST (nw[v].group==nw[nb].group);
+        }
+    }
 }
 }
 
@@ -359,4 +396,29 @@ BOOST_FIXTURE_TEST_CASE (test_extremism,
 }
 }
 
+// -----------------------------------------------------------------------------
+// test that only the returned pair of users is changed by a revision, as
+// assumed by the 'events' write mode
+BOOST_FIXTURE_TEST_CASE (test_revised_users,
+                         Large_TestNetwork) {
+{
+    vec_u groups = {0, 0, 1, 1};
+    vec_d opinions = {0.1, 0.4, 0.6, 0.9};
+    vec_d susc_1(4, 0.5);
+    vec_d tol(4, 1.);
+
+    for (unsigned i=0; i<20; ++i) {
+        setup_nw(nw, groups, opinions, susc_1, tol);
+        auto [v, nb] = revision::user_revision<reduced_int_prob>(nw, false, 0.5, 1.,
+                                                                uniform_prob_distr, rng);
+        BOOST_TEST (v!=nb);
+        for (auto w : nw.vertices()) {
+            if (w!=v and w!=nb) {
+                BOOST_TEST (nw[w].opinion==opinions[w]);
+            }
+        }
+    }
+}
+}
+
 } // namespace
@@ -0,0 +1,97 @@
+#define BOOST_TEST_MODULE test schedule
+
+#include <boost/test/unit_test.hpp>
+
+#include <utopia/core/model.hh>
+
+#include "../OpDisc.hh"
+#include "../schedule.hh"
+
+namespace Utopia::Models::OpDisc {
+
+// --------------------------- Type definitions --------------------------------
+using schedule::WriteSchedule;
+using times_vec = std::vector<std::size_t>;
+
+// ------------------------------ Fixtures -------------------------------------
+//a population with all opinions at 0.5
+struct TestPopulations {
+    Population<> users;
+    std::vector<PopulationView<Population<>>> nws;
+    TestPopulations() : users(200), nws{} {
+        for (auto v : users.vertices()) {
+            users[v].opinion = 0.5;
+        }
+        nws.emplace_back(users, 0, 100);
+        nws.emplace_back(users, 100, 100);
+    }
+};
+
+// ---------------------------- Tests ------------------------------------------
+//test the logarithmically spaced times
+BOOST_AUTO_TEST_CASE (test_log_times)
+{
+    const auto times = WriteSchedule::log_times(0, 1000, 4);
+    BOOST_TEST (times==(times_vec{0, 1, 10, 100, 1000}),
+                boost::test_tools::per_element());
+
+    //coinciding times are only written once
+    const auto early = WriteSchedule::log_times(1, 10, 20);
+    BOOST_TEST (early.front()==1);
+    BOOST_TEST (early.back()==10);
+    BOOST_TEST (std::is_sorted(early.begin(), early.end()));
+    BOOST_TEST ((std::adjacent_find(early.begin(), early.end())==early.end()));
+}
+
+//test the fixed and list schedules
+BOOST_FIXTURE_TEST_CASE (test_list, TestPopulations)
+{
+    WriteSchedule fixed;
+    BOOST_TEST (fixed.fixed());
+    for (std::size_t t=0; t<10; ++t) {
+        BOOST_TEST (fixed.decide(t, nws, false));
+    }
+
+    //the times are written at the next write time at or after them
+    WriteSchedule list("list", {25, 3, 4}, 0., 1);
+    BOOST_TEST (not list.fixed());
+    times_vec written;
+    for (std::size_t t=0; t<=40; t+=5) {
+        if (list.decide(t, nws, t==40)) {
+            written.push_back(t);
+        }
+    }
+    BOOST_TEST (written==(times_vec{0, 5, 25, 40}),
+                boost::test_tools::per_element());
+
+    BOOST_CHECK_THROW (WriteSchedule("sometimes", {}, 0., 1),
+                       std::invalid_argument);
+}
+
+//test the adaptive schedule
+BOOST_FIXTURE_TEST_CASE (test_adaptive, TestPopulations)
+{
+    WriteSchedule adaptive("adaptive", {}, 0.1, 10);
+    BOOST_TEST (adaptive.decide(0, nws, false));
+    BOOST_TEST (not adaptive.decide(1, nws, false));
+
+    //moving 5% of the users of the second replica is below the threshold
+    for (std::size_t v=0; v<5; ++v) {
+        nws[1][v].opinion = 0.9;
+    }
+    BOOST_TEST (not adaptive.decide(2, nws, false));
+    BOOST_TEST (adaptive.decide(3, nws, true));
+
+    //changes accumulate until the distribution is written
+    for (std::size_t v=5; v<10; ++v) {
+        nws[1][v].opinion = 0.9;
+    }
+    BOOST_TEST (not adaptive.decide(4, nws, false));
+    for (std::size_t v=10; v<16; ++v) {
+        nws[1][v].opinion = 0.9;
+    }
+    BOOST_TEST (adaptive.decide(5, nws, false));
+    BOOST_TEST (not adaptive.decide(6, nws, false));
+}
+
+} //namespace
@@ -0,0 +1,126 @@
+#define BOOST_TEST_MODULE test stats
+
+#include <boost/test/unit_test.hpp>
+#include <boost/test/tools/floating_point_comparison.hpp>
+
+#include <utopia/core/model.hh>
+
+#include "../OpDisc.hh"
+#include "../aging.hh"
+#include "../revision.hh"
+#include "../stats.hh"
+#include "../utils.hh"
+
+namespace Utopia::Models::OpDisc {
+
+// --------------------------- Type definitions --------------------------------
+using vec_d = std::vector<double>;
+std::mt19937 rng{};
+std::uniform_real_distribution<double> uniform_prob_distr;
+
+
+// ------------------------------ Fixtures -------------------------------------
+struct TestNetwork {
+    Population<> nw;
+    TestNetwork() : nw(1000) { }
+};
+
+// ------------------------- Helper functions ----------------------------------
+//compare the incrementally updated statistics to the recomputed ones
+void test_equal (const stats::GroupStats& s, const stats::GroupStats& r) {
+    BOOST_TEST (s.counts()==r.counts(), boost::test_tools::per_element());
+    BOOST_TEST (s.hist()==r.hist(), boost::test_tools::per_element());
+    const auto stddevs_s = s.stddevs();
+    const auto stddevs_r = r.stddevs();
+    for (std::size_t g=0; g<s.num_groups(); ++g) {
+        BOOST_TEST (s.means()[g]==r.means()[g],
+                    boost::test_tools::tolerance(1e-9));
+        BOOST_TEST (std::fabs(stddevs_s[g]-stddevs_r[g])<1e-9);
+    }
+    BOOST_TEST (s.global_mean()==r.global_mean(),
+                boost::test_tools::tolerance(1e-9));
+}
+
+// ---------------------------- Tests ------------------------------------------
+//test the group and bin assignment
+BOOST_AUTO_TEST_CASE (test_indices)
+{
+    stats::GroupStats s(3, 10);
+    BOOST_TEST (s.num_groups()==3);
+    BOOST_TEST (s.group_index(0)==0);
+    BOOST_TEST (s.group_index(2)==2);
+    BOOST_TEST (s.group_index(3)==-1);
+    BOOST_TEST (s.bin_index(0.)==0);
+    BOOST_TEST (s.bin_index(0.55)==5);
+    BOOST_TEST (s.bin_index(1.)==9);
+    BOOST_TEST (s.bin_index(1.1)==-1);
+
+    //age bins are closed on the right, the lowest edge is included
+    stats::GroupStats a(3, 10, {10, 20, 40, 80});
+    BOOST_TEST (a.num_groups()==3);
+    BOOST_TEST (a.group_index(10)==0);
+    BOOST_TEST (a.group_index(20)==0);
+    BOOST_TEST (a.group_index(20.5)==1);
+    BOOST_TEST (a.group_index(80)==2);
+    BOOST_TEST (a.group_index(81)==-1);
+}
+
+//test the statistics of a fixed network
+BOOST_FIXTURE_TEST_CASE (test_reset, TestNetwork)
+{
+    for (auto v : nw.vertices()) {
+        nw[v].group = v%2;
+        nw[v].opinion = (v%2) ? 0.75 : 0.25;
+    }
+    stats::GroupStats s(2, 4);
+    s.reset(nw);
+
+    BOOST_TEST (s.counts()==std::vector<std::size_t>({500, 500}),
+                boost::test_tools::per_element());
+    BOOST_TEST (s.means()==vec_d({0.25, 0.75}),
+                boost::test_tools::per_element());
+    BOOST_TEST (s.stddevs()==vec_d({0., 0.}),
+                boost::test_tools::per_element());
+    BOOST_TEST (s.hist()==std::vector<std::size_t>({0, 500, 0, 0,
+                                                    0, 0, 0, 500}),
+                boost::test_tools::per_element());
+    BOOST_TEST (s.global_mean()==0.5);
+}
+
+//test that the incremental updates agree with the recomputed statistics
+BOOST_FIXTURE_TEST_CASE (test_updates, TestNetwork)
+{
+    utils::initialize<conflict_undir>(nw, 0., false, 0.5, 80, 3, 0.3, 0.3,
+                                      uniform_prob_distr, rng);
+    stats::GroupStats s(3, 20);
+    s.reset(nw);
+    for (unsigned i=0; i<100000; ++i) {
+        auto [v, nb] = revision::user_revision<conflict_undir>(nw, false, 0.5, 0.3,
+                                                            uniform_prob_distr, rng);
+        s.update(nw, v);
+        s.update(nw, nb);
+    }
+    stats::GroupStats r(3, 20);
+    r.reset(nw);
+    test_equal(s, r);
+}
+
+//test the incremental updates in the ageing mode, where the groups change
+BOOST_FIXTURE_TEST_CASE (test_updates_ageing, TestNetwork)
+{
+    utils::initialize<ageing>(nw, 0., false, 0.5, 80, 3, 0.3, 0.3,
+                              uniform_prob_distr, rng);
+    const vec_d age_groups = {10, 20, 40, 60, 80};
+    stats::GroupStats s(0, 20, age_groups);
+    s.reset(nw);
+    for (unsigned i=0; i<100000; ++i) {
+        auto [v, nb] = aging::user_revision(nw, false, 80., 10., 1., 0.3, rng);
+        s.update(nw, v);
+        s.update(nw, nb);
+    }
+    stats::GroupStats r(0, 20, age_groups);
+    r.reset(nw);
+    test_equal(s, r);
+}
+
+} // namespace
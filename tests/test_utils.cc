@@ -19,18 +19,16 @@ Config cfg = YAML::LoadFile("test_config.yml")["test_utils"];
 
 // ----------------------------- Fixtures --------------------------------------
 struct TestNetwork {
-    using vertex = boost::graph_traits<Network>::vertex_descriptor;
-    Network nw;
+    using vertex = Population<>::VertexDesc;
+    Population<> nw;
     TestNetwork()
     :
-    nw{}
+    nw(get_as<int>("num_users", cfg["params"]))
     {
-        const unsigned num_vertices = get_as<int>("num_users", cfg["params"]);
-        boost::generate_random_graph(nw, num_vertices, 0, rng, false, false);
         const double susc = get_as<double>("susceptibility", cfg["params"]);
         const double tol = get_as<double>("tolerance", cfg["params"]);
         const double p_hom = get_as<double>("homophily_parameter", cfg["params"]);
-        for (auto v : range<IterateOver::vertices>(nw)) {
+        for (auto v : nw.vertices()) {
             nw[v].susceptibility_1 = susc;
             nw[v].susceptibility_2 = susc*p_hom;
             nw[v].tolerance = tol;
@@ -89,6 +87,92 @@ BOOST_AUTO_TEST_CASE (test_tolerance_func,
     }
 }
 
+// tests the user views and the random user selection of the population
+BOOST_AUTO_TEST_CASE (test_population) {
+{
+    Population<std::uint16_t> users(10);
+    BOOST_TEST (users.size()==10);
+    for (auto v : users.vertices()) {
+        BOOST_TEST (users[v].opinion==0.);
+        users[v].group = v%3;
+        users[v].opinion = 0.1*v;
+        users[v].discriminates = (v%2==0);
+    }
+    const auto& const_users = users;
+    for (auto v : const_users.vertices()) {
+        BOOST_TEST (const_users[v].group==v%3);
+        BOOST_TEST (const_users[v].opinion==0.1*v);
+        BOOST_TEST (const_users[v].discriminates==(v%2==0));
+    }
+
+    std::vector<unsigned> counts(users.size(), 0);
+    for (unsigned i=0; i<10000; ++i) {
+        const auto v = random_vertex(users, rng);
+        BOOST_REQUIRE (v<users.size());
+        ++counts[v];
+    }
+    for (auto count : counts) {
+        BOOST_TEST (count>0);
+    }
+}
+}
+
+// tests the views of the replicas of a population
+BOOST_AUTO_TEST_CASE (test_population_view) {
+{
+    Population<std::uint16_t> users(30);
+    std::vector<PopulationView<Population<std::uint16_t>>> replicas;
+    for (std::size_t r=0; r<3; ++r) {
+        replicas.emplace_back(users, r*10, 10);
+    }
+    for (std::size_t r=0; r<3; ++r) {
+        auto& replica = replicas[r];
+        BOOST_TEST (replica.size()==10);
+        BOOST_TEST (num_vertices(replica)==10);
+        BOOST_TEST (replica.offset()==r*10);
+        for (auto v : replica.vertices()) {
+            replica[v].group = r;
+            replica[v].opinion = 0.1*v;
+        }
+    }
+    // the replicas are contiguous slices of the population
+    for (auto v : users.vertices()) {
+        BOOST_TEST (users[v].group==v/10);
+        BOOST_TEST (users[v].opinion==0.1*(v%10));
+    }
+
+    // an initialised replica does not affect the other ones
+    utils::initialize<conflict_undir>(replicas[1], 0.5, false, 0.5, 80, 3,
+                                      0.3, 0.3, uniform_prob_distr, rng);
+    for (auto v : replicas[0].vertices()) {
+        BOOST_TEST (replicas[0][v].group==0);
+        BOOST_TEST (replicas[2][v].group==2);
+    }
+
+    const auto& replica = replicas[2];
+    for (unsigned i=0; i<1000; ++i) {
+        const auto v = random_vertex(replica, rng);
+        BOOST_REQUIRE (v<replica.size());
+        BOOST_TEST (replica[v].group==2);
+    }
+}
+}
+
+// tests the fixed-point storage of the opinions
+BOOST_AUTO_TEST_CASE (test_quantize_opinion) {
+{
+    BOOST_TEST (utils::quantize_opinion(0.)==0);
+    BOOST_TEST (utils::quantize_opinion(1.)==65535);
+    BOOST_TEST (utils::quantize_opinion(-0.1)==0);
+    BOOST_TEST (utils::quantize_opinion(1.1)==65535);
+    for (unsigned i=0; i<1000; ++i) {
+        const double op = utils::rand_double(0, 1, rng);
+        const double decoded = utils::quantize_opinion(op)*utils::opinion_scale;
+        BOOST_TEST (std::fabs(decoded-op)<=0.5*utils::opinion_scale);
+    }
+}
+}
+
 // -------------------------------- FIXTURE TESTS ------------------------------
 // tests the opinion rejection function, used in the conflict and ageing modes
 BOOST_FIXTURE_TEST_CASE (test_reject_op,
@@ -1,9 +1,13 @@
 #ifndef UTOPIA_MODELS_OPDISC_UTILS
 #define UTOPIA_MODELS_OPDISC_UTILS
 
-#include <utopia/core/graph.hh>
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <random>
 
 #include "modes.hh"
+#include "population.hh"
 
 namespace Utopia::Models::OpDisc::utils{
 
@@ -90,7 +94,7 @@ void initialize ( NWType & nw,
     /** Initialises the user attributes. */
     unsigned i = 0;
     unsigned j = 0;
-    for (auto v : range<IterateOver::vertices>(nw)) {
+    for (auto v : nw.vertices()) {
         if constexpr (model_mode==ageing) {
             //assign random age from 10 to the life expectancy
             nw[v].group = rand_double(10, life_expectancy, rng);
@@ -186,6 +190,18 @@ void update_opinion_disc( VertexDescType v, const double nb_op, NWType& nw ){
     }
 }
 
+// STORAGE .....................................................................
+/// The resolution of the opinions stored as 16-bit fixed-point numbers
+constexpr double opinion_scale = 1./65535;
+
+inline std::uint16_t quantize_opinion( const double opinion ){
+    /** Returns the opinion as a 16-bit fixed-point number on [0, 1], which
+      * is decoded by multiplying with opinion_scale. Opinions outside [0, 1]
+      * are clipped.
+      */
+    return (std::uint16_t)std::lround(std::clamp(opinion, 0., 1.)/opinion_scale);
+}
+
 } // namespace
 
 #endif // UTOPIA_MODELS_OPDISC_UTILS